@@ -0,0 +1,125 @@
+"""Cache des images décodées (RGBA) et déjà redimensionnées.
+
+Une image est décodée une seule fois par (chemin, taille, mtime) puis gardée
+en mémoire dans la limite de ASSETS_CACHE_MO. Les images renvoyées sont
+partagées : les appelants qui dessinent dessus doivent faire un .copy().
+
+Quand le manifeste de build_assets.py existe, les chemins sources (ceux des
+JSON, ex. images/fin/fin.png) sont remplacés par leur version construite, déjà
+à la bonne taille, et la présence d'une image est lue dans le manifeste au lieu
+d'interroger le disque à chaque requête.
+"""
+import json
+import os
+import time
+
+from PIL import Image
+
+from cache import CacheLRU, ABSENT
+
+# ===== CONFIGURATION =====
+# Mémoire maximale occupée par les images décodées (Mo)
+ASSETS_CACHE_MO = int(os.getenv("ASSETS_CACHE_MO", "256"))
+# Délai (secondes) avant de revérifier la date de modification d'un fichier
+ASSETS_MTIME_TTL = float(os.getenv("ASSETS_MTIME_TTL", "60"))
+# Dossier des images construites par build_assets.py et manifeste correspondant
+ASSETS_BUILD_DIR = os.getenv("ASSETS_BUILD_DIR", "images_build")
+ASSETS_MANIFEST = os.getenv("ASSETS_MANIFEST", os.path.join(ASSETS_BUILD_DIR, "manifest.json"))
+# =========================
+
+# (chemin, taille, mtime) -> Image RGBA ; coût = octets décodés
+_cache = CacheLRU(
+    taille_max=10000,
+    cout_max=ASSETS_CACHE_MO * 1024 * 1024,
+    cout=lambda image: image.width * image.height * 4,
+)
+# chemin -> (mtime, instant de la vérification)
+_mtimes = {}
+# chemin source -> entrée du manifeste ; None tant qu'il n'a pas été lu, {} s'il n'existe pas
+_manifeste = None
+
+
+def manifeste():
+    """Retourne les entrées du manifeste des images construites ({} si build_assets.py n'a pas été lancé)."""
+    global _manifeste
+    if _manifeste is None:
+        try:
+            with open(ASSETS_MANIFEST, "r", encoding="utf-8") as f:
+                _manifeste = json.load(f)["images"]
+        except FileNotFoundError:
+            print(f"Info: pas de manifeste {ASSETS_MANIFEST}, images lues dans images/ (lancer build_assets.py)")
+            _manifeste = {}
+    return _manifeste
+
+
+def fichier(chemin):
+    """Fichier à envoyer ou à charger pour une image source, ou None si elle n'existe pas."""
+    if not chemin:
+        return None
+    entrees = manifeste()
+    if entrees:
+        entree = entrees.get(chemin)
+        return entree["fichier"] if entree is not None else None
+    return chemin if os.path.exists(chemin) else None
+
+
+def miniature(chemin):
+    """Miniature d'embed d'une image (l'image elle-même sans manifeste), ou None."""
+    entree = manifeste().get(chemin)
+    if entree is not None and "miniature" in entree:
+        return entree["miniature"]
+    return fichier(chemin)
+
+
+def empreinte(chemin):
+    """Empreinte SHA-256 du fichier construit pour une image source (None sans manifeste)."""
+    entree = manifeste().get(chemin)
+    return entree["sha256"] if entree is not None else None
+
+
+def nom_piece_jointe(nom, chemin_fichier):
+    """Nom de pièce jointe Discord avec l'extension du fichier réellement envoyé (ex. "fin.jpg")."""
+    return nom + os.path.splitext(chemin_fichier)[1]
+
+
+def mtime(chemin):
+    """Date de modification du fichier, revérifiée au plus toutes les ASSETS_MTIME_TTL secondes."""
+    maintenant = time.monotonic()
+    connu = _mtimes.get(chemin)
+    if connu is not None and maintenant - connu[1] < ASSETS_MTIME_TTL:
+        return connu[0]
+    valeur = os.stat(chemin).st_mtime_ns
+    _mtimes[chemin] = (valeur, maintenant)
+    return valeur
+
+
+def charger_image(chemin, taille=None):
+    """Retourne l'image RGBA (redimensionnée si `taille` est donnée), depuis le cache si possible."""
+    # Version construite (déjà à la bonne taille) si le manifeste la connaît
+    chemin = fichier(chemin) or chemin
+    cle = (chemin, taille, mtime(chemin))
+    image = _cache.get(cle)
+    if image is ABSENT:
+        with Image.open(chemin) as source:
+            image = source.convert("RGBA")
+        if taille is not None and image.size != tuple(taille):
+            image = image.resize(taille)
+        _cache.set(cle, image)
+    return image
+
+
+def prechauffer(demandes):
+    """Charge à l'avance une liste de (chemin, taille) ; retourne le nombre d'images chargées."""
+    charges = 0
+    for chemin, taille in demandes:
+        if fichier(chemin) is None:
+            print(f"Info: image introuvable pour le préchauffage : {chemin}")
+            continue
+        charger_image(chemin, taille)
+        charges += 1
+    return charges
+
+
+def stats():
+    """Retourne les compteurs du cache d'images (hits, misses, évictions, octets)."""
+    return _cache.stats()
@@ -0,0 +1,181 @@
+"""Banc d'essai du rendu des images de combat.
+
+    python bench_rendu.py run        # mesure et affiche chaque image
+    python bench_rendu.py baseline   # mesure et enregistre la référence (BENCH_BASELINE)
+    python bench_rendu.py compare    # mesure et compare à la référence (code de sortie 1 si régression)
+
+Une image est rendue pour chaque région (son fond), chaque ennemi de la région
+et chaque personnage de json/personnages.json, avec le profil d'encodage
+courant (RENDU_PROFIL, RENDU_ECHELLE). Pour chaque image : temps du premier
+rendu (images à décoder), temps médian des rendus suivants, pic de mémoire et
+taille de l'image encodée.
+"""
+import glob
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+import PIL
+
+from combat_image import creer_image_combat, RENDU_PROFIL, RENDU_ECHELLE
+
+# ===== CONFIGURATION =====
+# Nombre de rendus mesurés par image (après le premier)
+BENCH_REPETITIONS = int(os.getenv("BENCH_REPETITIONS", "5"))
+# Fichier de référence lu par "compare" et écrit par "baseline"
+BENCH_BASELINE = os.getenv("BENCH_BASELINE", "bench_rendu_baseline.json")
+# Écarts tolérés avant de signaler une régression (0.25 = +25 %)
+BENCH_TOLERANCE_TEMPS = float(os.getenv("BENCH_TOLERANCE_TEMPS", "0.25"))
+BENCH_TOLERANCE_OCTETS = float(os.getenv("BENCH_TOLERANCE_OCTETS", "0.05"))
+# =========================
+
+_STATUS = "/proc/self/status"
+
+
+def _memoire_ko(champ):
+    with open(_STATUS, "r") as f:
+        return int(re.search(rf"{champ}:\s+(\d+)", f.read()).group(1))
+
+
+class _PicMemoire:
+    """
+    Pic de mémoire pendant un bloc, en Ko. Sous Linux c'est le pic de RSS (remis à
+    zéro via /proc/self/clear_refs), qui compte aussi les tampons de Pillow ;
+    ailleurs seul le tas Python est mesuré (tracemalloc).
+    """
+
+    def __init__(self):
+        self.rss = os.path.exists("/proc/self/clear_refs")
+        self.ko = 0
+
+    def __enter__(self):
+        if self.rss:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            self._depart = _memoire_ko("VmRSS")
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.rss:
+            self.ko = max(0, _memoire_ko("VmHWM") - self._depart)
+        else:
+            self.ko = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+
+def lister_images():
+    """Retourne [(clé, joueur, ennemi, fond)] pour toutes les combinaisons région x ennemi x personnage."""
+    with open("json/personnages.json", "r", encoding="utf-8") as f:
+        personnages = json.load(f)
+    images = []
+    for fichier in sorted(glob.glob("json/ennemies/*.json")):
+        region = os.path.splitext(os.path.basename(fichier))[0]
+        with open(fichier, "r", encoding="utf-8") as f:
+            ennemis = json.load(f)
+        for ennemi in ennemis:
+            for joueur in personnages:
+                cle = f"{region}/{ennemi['nom']}/{joueur['nom']}"
+                images.append((cle, joueur, ennemi, f"images/fond/{region}.png"))
+    return images
+
+
+def mesurer(repetitions=BENCH_REPETITIONS):
+    """Rend chaque image et retourne le résultat (dict sérialisable en JSON)."""
+    resultats = {}
+    for cle, joueur, ennemi, fond in lister_images():
+        debut = time.perf_counter()
+        with _PicMemoire() as pic:
+            octets = len(creer_image_combat(joueur, ennemi, fond).getbuffer())
+        premier = time.perf_counter() - debut
+
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            creer_image_combat(joueur, ennemi, fond)
+            durees.append(time.perf_counter() - debut)
+
+        resultats[cle] = {
+            "premier_ms": round(premier * 1000, 2),
+            "temps_ms": round(statistics.median(durees) * 1000, 2) if durees else round(premier * 1000, 2),
+            "temps_min_ms": round(min(durees) * 1000, 2) if durees else round(premier * 1000, 2),
+            "pic_memoire_ko": pic.ko,
+            "octets": octets,
+        }
+        print(f"{cle:<50} {resultats[cle]['temps_ms']:>8.1f} ms {pic.ko:>8} Ko {octets / 1024:>8.1f} Ko")
+
+    return {
+        "meta": {
+            "profil": RENDU_PROFIL,
+            "echelle": RENDU_ECHELLE,
+            "repetitions": repetitions,
+            "memoire": "rss" if os.path.exists("/proc/self/clear_refs") else "tracemalloc",
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+        },
+        "images": resultats,
+    }
+
+
+def comparer(reference, actuel, tolerance_temps=BENCH_TOLERANCE_TEMPS, tolerance_octets=BENCH_TOLERANCE_OCTETS):
+    """Retourne la liste des régressions (textes) de `actuel` par rapport à `reference`."""
+    for champ in ("profil", "echelle"):
+        if reference["meta"].get(champ) != actuel["meta"].get(champ):
+            print(f"⚠️ {champ} différent de la référence : {reference['meta'].get(champ)} -> {actuel['meta'].get(champ)}")
+
+    regressions = []
+    for cle, ref in reference["images"].items():
+        mesure = actuel["images"].get(cle)
+        if mesure is None:
+            print(f"Info: {cle} n'existe plus")
+            continue
+        if mesure["temps_ms"] > ref["temps_ms"] * (1 + tolerance_temps):
+            regressions.append(f"{cle} : {ref['temps_ms']:.1f} ms -> {mesure['temps_ms']:.1f} ms")
+        if mesure["octets"] > ref["octets"] * (1 + tolerance_octets):
+            regressions.append(f"{cle} : {ref['octets']} octets -> {mesure['octets']} octets")
+    for cle in actuel["images"].keys() - reference["images"].keys():
+        print(f"Info: nouvelle image {cle} (absente de la référence)")
+    return regressions
+
+
+def _resume(resultat):
+    images = resultat["images"].values()
+    if images:
+        print(f"{len(images)} images | temps médian total {sum(i['temps_ms'] for i in images):.0f} ms | "
+              f"pic mémoire max {max(i['pic_memoire_ko'] for i in images)} Ko | "
+              f"{sum(i['octets'] for i in images) / len(images) / 1024:.1f} Ko par image")
+
+
+if __name__ == "__main__":
+    commande = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if commande not in ("run", "baseline", "compare"):
+        print("Usage : python bench_rendu.py [run|baseline|compare]")
+        sys.exit(2)
+
+    if commande == "compare" and not os.path.exists(BENCH_BASELINE):
+        print(f"❌ Référence introuvable : {BENCH_BASELINE} (lancer d'abord python bench_rendu.py baseline)")
+        sys.exit(2)
+
+    resultat = mesurer()
+    _resume(resultat)
+
+    if commande == "baseline":
+        with open(BENCH_BASELINE, "w", encoding="utf-8") as f:
+            json.dump(resultat, f, ensure_ascii=False, indent=2)
+        print(f"✅ Référence enregistrée : {BENCH_BASELINE}")
+    elif commande == "compare":
+        with open(BENCH_BASELINE, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        regressions = comparer(reference, resultat)
+        for regression in regressions:
+            print(f"🐢 Régression : {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ Aucune régression (tolérances : temps +{BENCH_TOLERANCE_TEMPS:.0%}, taille +{BENCH_TOLERANCE_OCTETS:.0%})")
@@ -2,9 +2,19 @@ import os
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-from combat import CombatView
+from combat import CombatView, rehydrater_combat
+from moteur_combat import modeles_ennemis, regions_disponibles, POLITIQUES
+from combat_image import prechauffer_images, comparer_profils, RENDU_PROFIL, RENDU_ECHELLE
+import assets
+import rendu_pool
+import pieces_jointes
 from selection_personnage import SelectionPersonnageView
-from personnage_db import personnage_existe, get_personnage, reset_personnage_pv
+from personnage_db_async import get_personnage, supprimer_personnage
+from sauvegarde_differee import sauvegarde
+from envois_discord import envois, metriques_envois
+from sessions_combat import registre
+from metriques import contexte
+import personnage_db
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
@@ -12,25 +22,54 @@ CHANNEL_ID = int(os.getenv("CHANNEL_ID_COPAING"))
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+
+class RPGBot(commands.Bot):
+    async def close(self):
+        """Écrit les personnages modifiés et les combats en cours avant de se déconnecter."""
+        await registre.arreter()
+        await sauvegarde.arreter()
+        rendu_pool.fermer()
+        await super().close()
+
+
+bot = RPGBot(command_prefix="!", intents=intents)
 
 @bot.event
 async def on_ready():
     print(f"✅ Bot connecté en tant que {bot.user}")
+    sauvegarde.demarrer()
+    registre.demarrer()
+    pieces_jointes.demarrer(bot)
+    # Décoder les images de combat une fois pour toutes (hors de la boucle d'événements).
+    # En mode "process", ce sont les workers qui rendent et ils préchauffent leur propre cache.
+    if rendu_pool.RENDU_EXECUTOR == "thread":
+        nb_images = await bot.loop.run_in_executor(None, prechauffer_images)
+        print(f"🖼️ {nb_images} images préchargées ({assets.stats()['cout_total'] / 1024 / 1024:.1f} Mo)")
     channel = bot.get_channel(CHANNEL_ID)
     if channel:
         await channel.send("🟢 **Le bot est connecté et prêt !** 🐊")
     else:
         print("❌ Salon introuvable (ID incorrect ou bot n'a pas les permissions)")
 
+@bot.before_invoke
+async def marquer_commande(ctx):
+    """Attribue les mesures (requêtes SQL...) à la commande en cours."""
+    contexte.set(ctx.command.name)
+
+@bot.listen("on_interaction")
+async def reprise_combat(interaction: discord.Interaction):
+    """Reconstruit un combat évincé de la mémoire quand son joueur clique à nouveau."""
+    await rehydrater_combat(interaction)
+
 @bot.command()
 async def choix_personnage(ctx):
     """Permet de choisir et créer son personnage."""
     user_id = str(ctx.author.id)
     
-    # Vérifier si l'utilisateur a déjà un personnage
-    if personnage_existe(user_id):
-        perso = get_personnage(user_id)
+    # Vérifier si l'utilisateur a déjà un personnage (une seule lecture : la ligne ou None)
+    perso = await get_personnage(user_id)
+    if perso:
         await ctx.send(
             f"❌ {ctx.author.mention} Vous avez déjà un personnage : **{perso['nom']}** ({perso['race']})\n"
             f"Utilisez `!reset_personnage` pour recommencer."
@@ -39,7 +78,7 @@ async def choix_personnage(ctx):
     
     # Afficher le menu de sélection
     view = SelectionPersonnageView(user_id)
-    embed, file = view.get_current_embed_and_file()
+    embed, file = await view.get_current_embed_and_file()
     
     content = f"🎮 **{ctx.author.mention} Choisissez votre personnage**\nUtilisez les boutons pour naviguer entre les personnages :"
     
@@ -53,12 +92,11 @@ async def mon_personnage(ctx):
     """Affiche les informations du personnage de l'utilisateur."""
     user_id = str(ctx.author.id)
     
-    if not personnage_existe(user_id):
+    perso = await get_personnage(user_id)
+    if not perso:
         await ctx.send(f"❌ {ctx.author.mention} Vous n'avez pas de personnage ! Utilisez `!choix_personnage` d'abord.")
         return
     
-    perso = get_personnage(user_id)
-    
     # Créer un embed avec les infos du personnage
     embed = discord.Embed(
         title=f"📋 {perso['nom']}",
@@ -67,11 +105,7 @@ async def mon_personnage(ctx):
     )
     
     # Attacher l'image du personnage en haut de l'embed
-    image_path = perso.get('image', '')
-    file = None
-    if image_path and os.path.exists(image_path):
-        file = discord.File(image_path, filename="personnage.png")
-        embed.set_thumbnail(url="attachment://personnage.png")
+    file = await pieces_jointes.illustrer(embed, perso.get('image', ''), "personnage", miniature=True)
     
     # Ajouter la description si elle existe
     if perso.get('description'):
@@ -124,18 +158,22 @@ async def mon_personnage(ctx):
 
 
 @bot.command()
-async def combat(ctx, nb_regions: int = 3, nb_ennemis: int = 10):
-    """Lance un combat avec des régions et des ennemis."""
+async def combat(ctx, nb_regions: int = 3, nb_ennemis: int = 10, mode: str = "", politique: str = "max"):
+    """Lance un combat avec des régions et des ennemis (`auto` : combat automatique, `pas_a_pas` : un affichage par coup)."""
     user_id = str(ctx.author.id)
+    if mode not in ("", "auto", "pas_a_pas"):
+        await ctx.send(f"❌ Mode inconnu : `{mode}` (`auto` ou `pas_a_pas`).")
+        return
+    if mode == "auto" and politique not in POLITIQUES:
+        await ctx.send(f"❌ Politique inconnue : `{politique}` ({', '.join(POLITIQUES)}).")
+        return
     
-    # Vérifier que l'utilisateur a un personnage
-    if not personnage_existe(user_id):
+    # Joueur d'un combat en cours (PV pas encore écrits compris), sinon chargé depuis la base
+    joueur = sauvegarde.joueur(user_id) or await get_personnage(user_id)
+    if not joueur:
         await ctx.send(f"❌ {ctx.author.mention} Vous n'avez pas de personnage ! Utilisez `!choix_personnage` d'abord.")
         return
     
-    # Charger le personnage
-    joueur = get_personnage(user_id)
-    
     # Vérifier que le joueur a des PV
     if joueur["pv"] <= 0:
         await ctx.send(f"❌ {ctx.author.mention} Votre personnage est KO ! Utilisez `!soigner` pour restaurer vos PV.")
@@ -145,10 +183,21 @@ async def combat(ctx, nb_regions: int = 3, nb_ennemis: int = 10):
     nb_regions = max(1, min(5, nb_regions))
     nb_ennemis = max(1, min(20, nb_ennemis))
     
+    # Combat automatique : chaque région est jouée d'un coup, un seul message par région
+    if mode == "auto":
+        view = CombatView(user_id, joueur, nb_regions=nb_regions, nb_ennemis_par_region=nb_ennemis, politique=politique)
+        await registre.enregistrer(view)
+        await view.jouer_region_auto(ctx.channel, entete=f"⚔️ {ctx.author.mention}\n")
+        return
+
     # Créer la vue de combat
     try:
-        view = CombatView(user_id, nb_regions=nb_regions, nb_ennemis_par_region=nb_ennemis)
-        file = view.get_combat_image()
+        view = CombatView(
+            user_id, joueur, nb_regions=nb_regions, nb_ennemis_par_region=nb_ennemis,
+            pas_a_pas=mode == "pas_a_pas"
+        )
+        await registre.enregistrer(view)
+        file = await view.get_combat_image()
         
         await ctx.send(
             content=f"⚔️ {ctx.author.mention}\n" + view.get_initial_message_content(),
@@ -162,22 +211,87 @@ async def combat(ctx, nb_regions: int = 3, nb_ennemis: int = 10):
 @bot.command()
 async def reset_personnage(ctx):
     """Supprime le personnage de l'utilisateur."""
-    from personnage_db import supprimer_personnage
-    
     user_id = str(ctx.author.id)
     
-    if not personnage_existe(user_id):
+    # DELETE ... RETURNING : suppression et nom du personnage en une seule requête
+    perso = await supprimer_personnage(user_id)
+    if not perso:
         await ctx.send(f"❌ {ctx.author.mention} Vous n'avez pas de personnage à supprimer.")
         return
-    
-    perso = get_personnage(user_id)
-    supprimer_personnage(user_id)
+    # Le combat en cours éventuel n'a plus de personnage
+    sauvegarde.oublier(user_id)
+    combat_en_cours = registre.get(user_id)
+    if combat_en_cours is not None:
+        combat_en_cours.stop()
+    registre.retirer(user_id)
     
     await ctx.send(
         f"🗑️ {ctx.author.mention} Votre personnage **{perso['nom']}** a été supprimé.\n"
         f"Utilisez `!creer_personnage` pour en créer un nouveau !"
     )
 
+@bot.command()
+async def stats_db(ctx):
+    """Affiche les requêtes SQL les plus coûteuses et l'état du cache des personnages."""
+    cache = personnage_db.stats_cache()
+    await ctx.send(
+        "📈 **Requêtes SQL** (temps total décroissant)\n"
+        f"```\n{personnage_db.metriques_db.rapport()}\n```"
+        f"🗃️ Cache personnages : {cache['hits']} hits / {cache['misses']} misses "
+        f"({cache['taux_hit']:.0%}), {cache['entrees']} entrées"
+    )
+
+@bot.command()
+async def stats_rendu(ctx):
+    """Affiche la file d'attente et les temps de rendu des images de combat."""
+    s = rendu_pool.stats()
+    await ctx.send(
+        f"🎨 **Rendu** ({s['executor']}, {s['workers']} workers) : "
+        f"{s['en_cours']} en cours, {s['file']} en attente (max {s['file_max']})\n"
+        f"♻️ Images déjà rendues : {s['cache']['hits']} hits / {s['cache']['misses']} misses "
+        f"({s['cache']['taux_hit']:.0%}), {s['cache']['cout_total'] / 1024 / 1024:.1f} Mo\n"
+        f"```\n{rendu_pool.metriques_rendu.rapport()}\n```"
+    )
+    pj = pieces_jointes.stats()
+    if pj["actif"]:
+        await ctx.send(
+            f"📎 Images statiques : {pj['reutilisations']} URL réutilisées, {pj['envois']} envois, {pj['entrees']} en registre"
+        )
+
+@bot.command()
+async def stats_envois(ctx):
+    """Affiche les files d'envoi par salon et le temps d'attente des messages de combat."""
+    s = envois.stats()
+    attente = s.get("attente")
+    await ctx.send(
+        f"📨 **Envois** : {s['en_attente']} en attente dans {s['salons']} salons (max {s['file_max']} par salon)\n"
+        f"♻️ {s['remplacees']} modifications remplacées par une plus récente, {s['annulees']} annulées par une suppression, "
+        f"{s['pauses']} pauses pour rester sous la limite du salon\n"
+        + (f"⏱️ Attente en file : p50 {attente['p50_ms']:.0f} ms | p95 {attente['p95_ms']:.0f} ms | max {attente['max_ms']:.0f} ms\n"
+           if attente else "")
+        + f"```\n{metriques_envois.rapport()}\n```"
+    )
+
+@bot.command()
+async def profils_image(ctx, echelle: float = RENDU_ECHELLE):
+    """Compare la taille et le temps d'encodage d'une image de combat pour chaque profil."""
+    if not 0.1 <= echelle <= 1:
+        await ctx.send("❌ L'échelle doit être comprise entre 0.1 et 1 !")
+        return
+    joueur = await get_personnage(str(ctx.author.id)) or personnage_db.charger_personnages_base()[0]
+    joueur.setdefault("pv_max", joueur["pv"])
+    region = regions_disponibles()[0]
+    ennemi = modeles_ennemis(region)[0]
+    resultats = await bot.loop.run_in_executor(
+        None, comparer_profils, joueur, ennemi, f"images/fond/{region}.png", echelle
+    )
+    lignes = [
+        f"{profil:<12} {octets / 1024:>8.1f} Ko {duree:>8.1f} ms" + ("  ← actuel" if profil == RENDU_PROFIL else "")
+        for profil, octets, duree in resultats
+    ]
+    await ctx.send(f"🖼️ **Profils d'encodage** (échelle {echelle:g})\n```\n" + "\n".join(lignes) + "\n```")
+
+
 @bot.command()
 async def aide(ctx):
     """Affiche la liste des commandes disponibles."""
@@ -200,11 +314,13 @@ async def aide(ctx):
     )
     
     embed.add_field(
-        name="!combat [regions] [ennemis]",
+        name="!combat [regions] [ennemis] [auto|pas_a_pas] [politique]",
         value="Lancer un combat !\n"
               "• `regions`: Nombre de régions (1-5, défaut: 3)\n"
               "• `ennemis`: Ennemis par région (1-20, défaut: 10)\n"
-              "Exemple: `!combat 2 5`",
+              f"• `auto`: Combat automatique, un bilan par région (politique : {', '.join(POLITIQUES)})\n"
+              "• `pas_a_pas`: Affiche votre coup avant la riposte de l'ennemi\n"
+              "Exemple: `!combat 2 5` ou `!combat 3 10 auto max`",
         inline=False
     )
     
@@ -225,4 +341,7 @@ async def aide(ctx):
     
     await ctx.send(embed=embed)
 
-bot.run(TOKEN)
\ No newline at end of file
+# Les workers de rendu (forkserver) réimportent ce module : ils ne doivent pas lancer le bot
+if __name__ == "__main__":
+    bot.run(TOKEN)
+    personnage_db.fermer()
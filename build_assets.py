@@ -0,0 +1,159 @@
+"""Préparation hors ligne des images du bot.
+
+    python build_assets.py           # reconstruit les images modifiées depuis la dernière fois
+    python build_assets.py --force   # reconstruit tout
+
+Chaque image de images/ est convertie une fois pour toutes à sa taille et à son
+format d'affichage dans ASSETS_BUILD_DIR. Elle n'est donc plus redimensionnée
+pendant les combats et pèse moins lourd à l'envoi. Les personnages reçoivent
+aussi une miniature pour les embeds. Le manifeste (source -> fichier construit,
+taille, empreinte SHA-256) est chargé par assets.py au démarrage du bot.
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+
+from PIL import Image
+
+from assets import ASSETS_BUILD_DIR, ASSETS_MANIFEST
+from combat_image import TAILLE_SPRITE
+
+# ===== CONFIGURATION =====
+# Largeur maximale des images affichées en grand dans Discord (shop, fin de partie)
+ASSETS_LARGEUR_EMBED = int(os.getenv("ASSETS_LARGEUR_EMBED", "800"))
+# Taille maximale des miniatures d'embed (!mon_personnage, sélection du personnage)
+ASSETS_TAILLE_MINIATURE = int(os.getenv("ASSETS_TAILLE_MINIATURE", "160"))
+# Qualité des images opaques enregistrées en JPEG
+ASSETS_QUALITE_JPEG = int(os.getenv("ASSETS_QUALITE_JPEG", "88"))
+# =========================
+
+EXTENSIONS_IMAGE = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+
+# (motif, règle) : "fond" garde sa taille (c'est le canevas du combat), "sprite" passe
+# à TAILLE_SPRITE, "embed" est limité à ASSETS_LARGEUR_EMBED
+REGLES = [
+    ("images/fond/*", "fond"),
+    ("images/personnages/*", "sprite"),
+    ("images/region/*/ennemies/**/*", "sprite"),
+    ("images/shops/*", "embed"),
+    ("images/fin/*", "embed"),
+]
+# Images qui ont aussi besoin d'une miniature
+MINIATURES = ("images/personnages/",)
+
+
+def empreinte(chemin):
+    """SHA-256 du contenu d'un fichier."""
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def lister_sources():
+    """Retourne [(chemin source, règle)] ; les fichiers qui ne sont pas des images (.DS_Store...) sont ignorés."""
+    sources = {}
+    for motif, regle in REGLES:
+        for chemin in glob.glob(motif, recursive=True):
+            if os.path.isfile(chemin) and chemin.lower().endswith(EXTENSIONS_IMAGE):
+                sources.setdefault(chemin.replace(os.sep, "/"), regle)
+    return sorted(sources.items())
+
+
+def _destination(source, extension, suffixe=""):
+    base = os.path.splitext(os.path.relpath(source, "images"))[0]
+    return os.path.join(ASSETS_BUILD_DIR, base + suffixe + extension).replace(os.sep, "/")
+
+
+def _enregistrer(image, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if destination.endswith(".jpg"):
+        image.save(destination, format="JPEG", quality=ASSETS_QUALITE_JPEG, optimize=True, progressive=True)
+    else:
+        image.save(destination, format="PNG", optimize=True)
+
+
+def construire_image(source, regle):
+    """Convertit une image selon sa règle ; retourne l'entrée du manifeste."""
+    with Image.open(source) as original:
+        image = original.convert("RGBA")
+
+    if regle == "sprite":
+        # Même redimensionnement que assets.charger_image : le rendu reste identique
+        image = image.resize(TAILLE_SPRITE)
+    elif regle == "embed" and image.width > ASSETS_LARGEUR_EMBED:
+        hauteur = round(image.height * ASSETS_LARGEUR_EMBED / image.width)
+        image = image.resize((ASSETS_LARGEUR_EMBED, hauteur), Image.Resampling.LANCZOS)
+
+    # Les images entièrement opaques n'ont pas besoin du canal alpha ; les grandes passent en JPEG
+    opaque = image.getchannel("A").getextrema() == (255, 255)
+    if opaque:
+        image = image.convert("RGB")
+    destination = _destination(source, ".jpg" if opaque and regle == "embed" else ".png")
+    _enregistrer(image, destination)
+
+    entree = {
+        "fichier": destination,
+        "taille": list(image.size),
+        "sha256": empreinte(destination),
+        "source_sha256": empreinte(source),
+        "regle": regle,
+    }
+    if source.startswith(MINIATURES):
+        miniature = image.copy()
+        miniature.thumbnail((ASSETS_TAILLE_MINIATURE, ASSETS_TAILLE_MINIATURE), Image.Resampling.LANCZOS)
+        chemin_miniature = _destination(source, ".png", "_miniature")
+        _enregistrer(miniature, chemin_miniature)
+        entree["miniature"] = chemin_miniature
+    return entree
+
+
+def construire(force=False):
+    """Construit les images modifiées et écrit le manifeste ; retourne (construites, inchangées)."""
+    ancien = {}
+    if os.path.exists(ASSETS_MANIFEST) and not force:
+        with open(ASSETS_MANIFEST, "r", encoding="utf-8") as f:
+            precedent = json.load(f)
+        # Les tailles d'affichage ont changé : tout est à refaire
+        if (precedent.get("taille_sprite") == list(TAILLE_SPRITE)
+                and precedent.get("largeur_embed") == ASSETS_LARGEUR_EMBED):
+            ancien = precedent.get("images", {})
+
+    images = {}
+    construites = inchangees = 0
+    for source, regle in lister_sources():
+        precedente = ancien.get(source)
+        if (
+            precedente is not None
+            and precedente["regle"] == regle
+            and precedente["source_sha256"] == empreinte(source)
+            and os.path.exists(precedente["fichier"])
+            and os.path.exists(precedente.get("miniature", precedente["fichier"]))
+        ):
+            images[source] = precedente
+            inchangees += 1
+            continue
+        images[source] = construire_image(source, regle)
+        construites += 1
+        print(f"🖼️ {source} -> {images[source]['fichier']} {tuple(images[source]['taille'])}")
+
+    manifeste = {
+        "taille_sprite": list(TAILLE_SPRITE),
+        "largeur_embed": ASSETS_LARGEUR_EMBED,
+        "images": images,
+    }
+    os.makedirs(os.path.dirname(ASSETS_MANIFEST) or ".", exist_ok=True)
+    with open(ASSETS_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    return construites, inchangees
+
+
+if __name__ == "__main__":
+    if any(arg not in ("--force",) for arg in sys.argv[1:]):
+        print("Usage : python build_assets.py [--force]")
+        sys.exit(2)
+    construites, inchangees = construire(force="--force" in sys.argv[1:])
+    print(f"✅ {construites} images construites, {inchangees} inchangées -> {ASSETS_MANIFEST}")
@@ -0,0 +1,95 @@
+"""Cache LRU borné, avec expiration optionnelle et compteurs de hits/misses."""
+import threading
+import time
+from collections import OrderedDict
+
+# Valeur renvoyée par get() quand la clé est absente ou expirée
+ABSENT = object()
+
+
+class CacheLRU:
+    """Cache LRU thread-safe.
+
+    - taille_max : nombre maximum d'entrées
+    - ttl : durée de vie d'une entrée en secondes (None = pas d'expiration)
+    - cout_max / cout : budget total (ex. octets) et fonction qui donne le coût d'une valeur
+    """
+
+    def __init__(self, taille_max=1000, ttl=None, cout_max=None, cout=None):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self.cout_max = cout_max
+        self.cout = cout or (lambda valeur: 0)
+        self._entrees = OrderedDict()  # cle -> (valeur, expiration, cout)
+        self._verrou = threading.Lock()
+        self.cout_total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def __contains__(self, cle):
+        return self.get(cle, compter=False) is not ABSENT
+
+    def get(self, cle, compter=True):
+        """Retourne la valeur associée à la clé, ou ABSENT."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[1] is not None and entree[1] < time.monotonic():
+                self._retirer(cle)
+                entree = None
+            if entree is None:
+                if compter:
+                    self.misses += 1
+                return ABSENT
+            self._entrees.move_to_end(cle)
+            if compter:
+                self.hits += 1
+            return entree[0]
+
+    def set(self, cle, valeur):
+        """Ajoute ou remplace une entrée, puis évince les plus anciennes si besoin."""
+        cout = self.cout(valeur)
+        expiration = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._verrou:
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = (valeur, expiration, cout)
+            self.cout_total += cout
+            while self._entrees and (
+                len(self._entrees) > self.taille_max
+                or (self.cout_max is not None and self.cout_total > self.cout_max)
+            ):
+                ancienne = next(iter(self._entrees))
+                self._retirer(ancienne)
+                self.evictions += 1
+
+    def invalider(self, cle):
+        """Retire une entrée du cache (sans erreur si elle est absente)."""
+        with self._verrou:
+            if cle in self._entrees:
+                self._retirer(cle)
+
+    def vider(self):
+        """Vide complètement le cache."""
+        with self._verrou:
+            self._entrees.clear()
+            self.cout_total = 0
+
+    def _retirer(self, cle):
+        _, _, cout = self._entrees.pop(cle)
+        self.cout_total -= cout
+
+    def stats(self):
+        """Retourne les compteurs du cache."""
+        total = self.hits + self.misses
+        return {
+            "entrees": len(self._entrees),
+            "cout_total": self.cout_total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "taux_hit": self.hits / total if total else 0.0,
+        }
@@ -1,81 +1,51 @@
 import discord
 from discord.ui import View, Select
-import json
-import random
-import os
+import io
+import secrets
 
-from combat_image import creer_image_combat
-from personnage_db import (
+import pieces_jointes
+from combat_image import extension_image
+from rendu_pool import rendre_combat
+from personnage_db_async import (
     get_personnage, 
-    update_personnage_pv, 
-    personnage_existe, 
     supprimer_personnage,
-    update_personnage_stats,
-    update_personnage_attaques
+    reprendre_session_combat
 )
+from sauvegarde_differee import sauvegarde
+from envois_discord import envois
+from sessions_combat import registre, custom_id_combat, lire_custom_id_combat
+from metriques import contexte
 from shop import afficher_shop
+import journal_combat
+from moteur_combat import MoteurCombat, ENNEMI_VAINCU, REGION_TERMINEE, VICTOIRE, DEFAITE
 
 
-# ===== CONFIGURATION DES RÉGIONS =====
-REGIONS_DISPONIBLES = [
-    "foret"
-]
-# =====================================
-
-def load_json(file):
-    with open(file, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def calcul_degats(attaque, attaquant, defenseur):
-    """Calcule les dégâts d'une attaque en prenant en compte les ratios force/magie et les armures."""
-    degats = attaque["degats"]
-    
-    ratio_attk = attaque.get("ratioattk", 0) / 100
-    ratio_magie = attaque.get("ratiomagie", 0) / 100
-    
-    degats += attaquant.get("force", 0) * ratio_attk
-    degats += attaquant.get("magie", 0) * ratio_magie
-    
-    if attaque["type"] == "magique":
-        degats *= (1 - defenseur.get("armure_magique", 0) / 100)
-    elif attaque["type"] == "physique":
-        degats *= (1 - defenseur.get("armure", 0) / 100)
-    elif attaque["type"] == "hybride":
-        reduction = (defenseur.get("armure", 0) + defenseur.get("armure_magique", 0)) / 2
-        degats *= (1 - reduction / 100)
-    
-    return max(1, int(degats))
-
 class CombatView(View):
-    def __init__(self, user_id, nb_regions=3, nb_ennemis_par_region=10):
+    def __init__(self, user_id, joueur, nb_regions=3, nb_ennemis_par_region=10, etat=None, politique=None,
+                 pas_a_pas=False):
         super().__init__(timeout=None)
 
         self.user_id = user_id
+        # Combat automatique : politique de choix des attaques (None = le joueur choisit)
+        self.politique = politique
         self.combat_message = None  # Référence au message de combat
+        self.en_shop = False  # Le combat attend la fin du shop (ne peut pas être évincé)
+        self.en_eviction = False  # État en cours d'écriture par le registre (clics refusés)
         
-        # Charger le personnage depuis la base de données
-        self.joueur = get_personnage(user_id)
-        if not self.joueur:
+        # Personnage déjà chargé depuis la base de données par l'appelant
+        if not joueur:
             raise ValueError("Personnage introuvable dans la base de données")
-        
-        # Configuration des régions
-        self.nb_ennemis_par_region = nb_ennemis_par_region
-        self.regions_queue = random.sample(REGIONS_DISPONIBLES, k=min(nb_regions, len(REGIONS_DISPONIBLES)))
-        
-        # Charger la première région
-        self.region = self.regions_queue.pop(0)
-        self.image_fond = f"images/fond/{self.region}.png"
-        
-        # Charger les ennemis de la région actuelle
-        region_enemies = load_json(f"json/ennemies/{self.region}.json")
-        self.ennemis_queue = random.sample(region_enemies, k=min(nb_ennemis_par_region, len(region_enemies)))
-        self.ennemi = self.ennemis_queue.pop(0)
+        # Règles et état du combat (régions, ennemis, tours) : voir moteur_combat.py
+        # Un combat évincé de la mémoire puis repris par le joueur repart de son état
+        self.moteur = MoteurCombat(joueur, nb_regions, nb_ennemis_par_region, etat=etat)
+        # Identifiant du combat, repris dans le custom_id persistant du menu d'attaque
+        self.session_id = etat["session_id"] if etat is not None else secrets.token_hex(4)
+        # Pas à pas : le coup du joueur est affiché avant la riposte de l'ennemi (deux rendus par tour)
+        self.pas_a_pas = etat.get("pas_a_pas", False) if etat is not None else pas_a_pas
 
-        # Qui attaque en premier
-        self.tour_joueur = self.joueur["vitesse"] >= self.ennemi["vitesse"]
-
-        # Select pour attaques du joueur
-        self.update_attack_select()
+        # Select pour attaques du joueur (inutile en combat automatique)
+        if politique is None:
+            self.update_attack_select()
 
     def update_attack_select(self):
         """Met à jour le menu de sélection des attaques."""
@@ -84,18 +54,44 @@ class CombatView(View):
             if isinstance(item, Select):
                 self.remove_item(item)
         
+        # Dégâts réels contre l'ennemi actuel, lus dans la table du moteur
+        degats = self.moteur.degats_attaques()
         options = [
-            discord.SelectOption(label=a["nom"], description=f"Dégâts : {a['degats']}")
+            discord.SelectOption(
+                label=a["nom"],
+                description=f"Dégâts : {degats[a['nom']]} contre {self.ennemi['nom']} (base {a['degats']})"[:100]
+            )
             for a in self.joueur["attaques"]
         ]
-        self.select_attacks = Select(placeholder="Choisis une attaque", options=options)
+        self.select_attacks = Select(
+            placeholder="Choisis une attaque",
+            options=options,
+            custom_id=custom_id_combat(self.user_id, self.session_id)
+        )
         self.select_attacks.callback = self.joueur_attaque
         self.add_item(self.select_attacks)
 
-    def get_combat_image(self):
-        """Génère et retourne l'image du combat."""
-        image_combat = creer_image_combat(self.joueur, self.ennemi, self.image_fond)
-        return discord.File(fp=image_combat, filename="combat.png")
+    # État du combat, lu dans le moteur
+    joueur = property(lambda self: self.moteur.joueur)
+    ennemi = property(lambda self: self.moteur.ennemi)
+    region = property(lambda self: self.moteur.region)
+    regions_queue = property(lambda self: self.moteur.regions_queue)
+    ennemis_queue = property(lambda self: self.moteur.ennemis_queue)
+    tour_joueur = property(lambda self: self.moteur.tour_joueur)
+    image_fond = property(lambda self: self.moteur.image_fond)
+
+    def exporter_etat(self):
+        """Retourne l'état compact du combat (le joueur, lui, est déjà en base)."""
+        return {"session_id": self.session_id, "pas_a_pas": self.pas_a_pas, **self.moteur.exporter_etat()}
+
+    def peut_etre_evince(self):
+        """Un combat ne peut pas être évincé pendant le shop (le shop le rappelle à la fin)."""
+        return not self.en_shop
+
+    async def get_combat_image(self):
+        """Génère (hors de la boucle d'événements) et retourne l'image du combat."""
+        image_combat = await rendre_combat(self.joueur, self.ennemi, self.image_fond)
+        return discord.File(fp=io.BytesIO(image_combat), filename=f"combat.{extension_image()}")
 
     def pv_text(self):
         """Texte des PV du joueur et de l'ennemi."""
@@ -106,6 +102,23 @@ class CombatView(View):
             f"👾 {self.ennemi['nom']} ❤️ {max(self.ennemi['pv'], 0)} / {self.ennemi.get('pv_max', self.ennemi['pv'])} PV\n"
         )
 
+    def exporter_journal(self):
+        """Journal du combat pour journal_combat.rejouer (None si le combat n'en a pas)."""
+        if self.moteur.journal is None:
+            return None
+        return {**self.moteur.journal.exporter(), "politique": self.politique}
+
+    async def terminer_aventure(self):
+        """Supprime le personnage à la fin de l'aventure (victoire finale ou défaite)."""
+        donnees = self.exporter_journal()
+        if donnees is not None:
+            chemin = journal_combat.ecrire(donnees, f"{self.user_id}-{self.session_id}")
+            if chemin:
+                print(f"📜 Journal du combat : {chemin} ({len(self.moteur.journal)} entrées)")
+        registre.retirer(self.user_id)
+        sauvegarde.oublier(self.user_id)
+        await supprimer_personnage(self.user_id)
+
     def get_initial_message_content(self):
         """Retourne le contenu du message initial avec l'image."""
         content = self.pv_text()
@@ -114,7 +127,7 @@ class CombatView(View):
 
     async def update_message(self, interaction, extra_text=""):
         """Met à jour le message Discord avec l'image du combat et le texte."""
-        file = self.get_combat_image()
+        file = await self.get_combat_image()
 
         content = self.pv_text()
         if extra_text:
@@ -123,82 +136,85 @@ class CombatView(View):
 
         # Utiliser la référence du message de combat
         if self.combat_message:
-            await self.combat_message.edit(
+            await envois.modifier(
+                self.combat_message,
                 content=content,
                 view=self if self.tour_joueur else None,
                 attachments=[file]
             )
         else:
-            await interaction.message.edit(
+            await envois.modifier(
+                interaction.message,
                 content=content,
                 view=self if self.tour_joueur else None,
                 attachments=[file]
             )
-        
-        # Sauvegarder les stats dans la base de données
-        update_personnage_pv(self.user_id, self.joueur["pv"])
-        update_personnage_stats(self.user_id, self.joueur)
-        update_personnage_attaques(self.user_id, self.joueur["attaques"])
+
+    async def abandonner_shop(self):
+        """Shop expiré sans que le joueur continue : le combat quitte la mémoire (et n'est plus reprenable)."""
+        if not self.en_shop:
+            # Le joueur a déjà quitté ce shop : le combat continue
+            return
+        self.en_shop = False
+        self.stop()
+        # Le joueur a peut-être déjà lancé un autre combat, qui suit alors son personnage
+        if registre.get(self.user_id) is self:
+            registre.retirer(self.user_id)
+            await sauvegarde.terminer(self.user_id)
 
     async def continuer_vers_prochaine_region(self, interaction, channel):
         """Continue vers la prochaine région après le shop."""
+        self.en_shop = False
+        registre.toucher(self.user_id)
         if not self.regions_queue:
-            # Plus de régions - victoire finale
-            # Essayer de charger l'image de fin
-            fin_image_path = "images/fin/fin.png"
-            if os.path.exists(fin_image_path):
-                file = discord.File(fp=fin_image_path, filename="fin.png")
-                await channel.send(
-                    content=f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n",
-                    file=file
-                )
-            else:
-                # Pas d'image, juste le message
-                await channel.send(
-                    content=f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n"
-                )
+            # Plus de régions - victoire finale (avec l'image de fin si elle existe)
+            await envois.envoyer(
+                channel,
+                content=f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n",
+                **await pieces_jointes.image_seule("images/fin/fin.png", "fin")
+            )
             
             # Supprimer complètement le personnage
-            supprimer_personnage(self.user_id)
+            await self.terminer_aventure()
             
             return
         
         # Passer à la région suivante
-        self.region = self.regions_queue.pop(0)
-        self.image_fond = f"images/fond/{self.region}.png"
-        
-        region_enemies = load_json(f"json/ennemies/{self.region}.json")
-        self.ennemis_queue = random.sample(region_enemies, k=min(self.nb_ennemis_par_region, len(region_enemies)))
-        self.ennemi = self.ennemis_queue.pop(0)
-        self.tour_joueur = self.joueur["vitesse"] >= self.ennemi["vitesse"]
+        self.moteur.region_suivante()
         
         # Mettre à jour le select d'attaques au cas où de nouvelles ont été achetées
-        self.update_attack_select()
+        if self.politique is None:
+            self.update_attack_select()
         
-        # 🔧 CORRECTION : Recharger les PV depuis la DB au lieu de forcer pv_max
-        # Cela permet de conserver les PV actuels après le shop (potions, etc.)
-        joueur_db = get_personnage(self.user_id)
-        if joueur_db:
-            self.joueur['pv'] = joueur_db['pv']
+        # Les PV actuels sont conservés après le shop (potions, etc.) : le shop modifie
+        # self.joueur lui-même et vient de l'écrire en base, inutile de le relire
         # Si vous voulez restaurer à 100% entre les régions, décommentez la ligne suivante :
         # self.joueur['pv'] = self.joueur['pv_max']
-        # update_personnage_pv(self.user_id, self.joueur['pv'])
+
+        if self.politique is not None:
+            await self.jouer_region_auto(channel)
+            return
         
         # Créer un NOUVEAU message de combat
-        file = self.get_combat_image()
+        file = await self.get_combat_image()
         content = self.pv_text()
         content += f"🗺️ **Nouvelle région : {self.region.capitalize()} !**\n"
         content += f"👾 **Premier ennemi : {self.ennemi['nom']} !**\n"
         content += "🟢 **C'est votre tour !**" if self.tour_joueur else "🔴 **Tour de l'ennemi...**"
         
         # Envoyer le nouveau message et garder la référence
-        self.combat_message = await channel.send(
+        self.combat_message = await envois.envoyer(
+            channel,
             content=content,
             view=self if self.tour_joueur else None,
             file=file
     )
 
     async def joueur_attaque(self, interaction: discord.Interaction):
+        await self.jouer_attaque(interaction, self.select_attacks.values[0])
+
+    async def jouer_attaque(self, interaction: discord.Interaction, nom_attaque):
+        contexte.set("combat:attaque")
         # Vérifier que c'est bien le joueur qui a lancé le combat
         if str(interaction.user.id) != self.user_id:
             await interaction.response.send_message(
@@ -206,147 +222,185 @@ class CombatView(View):
                 ephemeral=True
             )
             return
+        if self.en_eviction:
+            await interaction.response.send_message(
+                "⏳ Combat en cours de sauvegarde, réessayez dans un instant.",
+                ephemeral=True
+            )
+            return
             
         if not self.tour_joueur:
             await interaction.response.defer()
             return
         await interaction.response.defer()
+        registre.toucher(self.user_id)
 
-        attaque = next(a for a in self.joueur["attaques"] if a["nom"] == self.select_attacks.values[0])
-        degats = calcul_degats(attaque, self.joueur, self.ennemi)
-        self.ennemi["pv"] -= degats
+        attaque, degats, issue = self.moteur.attaque_joueur(nom_attaque)
 
         # Ennemi KO
-        if self.ennemi["pv"] <= 0:
-            if self.ennemis_queue:
-                # Passer au prochain ennemi dans la même région
-                self.ennemi = self.ennemis_queue.pop(0)
-                self.tour_joueur = self.joueur["vitesse"] >= self.ennemi["vitesse"]
+        if issue is not None:
+            if issue == ENNEMI_VAINCU:
+                # Le moteur a fait entrer le prochain ennemi de la même région (dégâts affichés à jour)
+                self.update_attack_select()
                 await self.update_message(
                     interaction,
                     extra_text=f"💥 **{attaque['nom']} inflige {degats} PV !**\n🏆 **Vous avez vaincu cet ennemi !**\n"
                                f"👾 **Prochain ennemi : {self.ennemi['nom']} !**"
                 )
+                # Point de sauvegarde : ennemi vaincu
+                await sauvegarde.flush(self.user_id)
                 return
             else:
                 # Région terminée - Supprimer le message de combat AVANT d'afficher le shop
                 try:
                     # Essayer d'abord avec combat_message
                     if self.combat_message:
-                        await self.combat_message.delete()
+                        await envois.supprimer(self.combat_message)
                     # Sinon essayer avec interaction.message
                     elif interaction.message:
-                        await interaction.message.delete()
+                        await envois.supprimer(interaction.message)
                 except Exception as e:
                     print(f"Erreur suppression message: {e}")
                 
-                if self.regions_queue:
+                if issue == REGION_TERMINEE:
+                    # Point de sauvegarde : fin de région
+                    await sauvegarde.flush(self.user_id)
+
                     # Il reste des régions - afficher le message de victoire puis le shop
-                    await interaction.channel.send(
-                        f"💥 **{attaque['nom']} inflige {degats} PV !**\n🎉 **Région {self.region.capitalize()} terminée !**"
+                    await envois.envoyer(
+                        interaction.channel,
+                        content=f"💥 **{attaque['nom']} inflige {degats} PV !**\n🎉 **Région {self.region.capitalize()} terminée !**"
                     )
                     
                     # Afficher le shop
+                    self.en_shop = True
                     await afficher_shop(
-                        interaction,
+                        interaction.channel,
                         self.user_id,
                         self.region,
                         self.joueur,
-                        self.continuer_vers_prochaine_region
+                        self.continuer_vers_prochaine_region,
+                        moteur=self.moteur,
+                        on_abandon_callback=self.abandonner_shop
                     )
                 else:
                     # C'était la dernière région - victoire finale directe
-                    fin_image_path = "images/fin/fin.png"
-                    if os.path.exists(fin_image_path):
-                        file = discord.File(fp=fin_image_path, filename="fin.png")
-                        await interaction.channel.send(
-                            content=f"💥 **{attaque['nom']} inflige {degats} PV !**\n"
-                                    f"🎉 **Dernière région terminée !**\n\n"
-                                    f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n"
-                                ,
-                            file=file
-                        )
-                    else:
-                        await interaction.channel.send(
-                            content=f"💥 **{attaque['nom']} inflige {degats} PV !**\n"
-                                    f"🎉 **Dernière région terminée !**\n\n"
-                                    f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n"
-                                   
-                        )
+                    await envois.envoyer(
+                        interaction.channel,
+                        content=f"💥 **{attaque['nom']} inflige {degats} PV !**\n"
+                                f"🎉 **Dernière région terminée !**\n\n"
+                                f"🏆 **Félicitations ! Vous avez vaincu toutes les régions !**\n",
+                        **await pieces_jointes.image_seule("images/fin/fin.png", "fin")
+                    )
                     
                     # Supprimer le personnage
-                    supprimer_personnage(self.user_id)
+                    await self.terminer_aventure()
                     
                 return
 
-        # Passage au tour de l'ennemi
-        self.tour_joueur = False
-        await self.update_message(interaction, extra_text=f"💥 **Vous utilisez {attaque['nom']} et infligez {degats} PV !**")
-        await self.ennemi_attaque(interaction)
+        # Passage au tour de l'ennemi : coup du joueur et riposte affichés ensemble (un seul rendu)
+        texte_joueur = f"💥 **Vous utilisez {attaque['nom']} et infligez {degats} PV !**"
+        if self.pas_a_pas:
+            await self.update_message(interaction, extra_text=texte_joueur)
+            texte_joueur = ""
+        await self.ennemi_attaque(interaction, texte_joueur)
 
-    async def ennemi_attaque(self, interaction: discord.Interaction):
-        attaque = random.choice(self.ennemi["attaques"])
-        degats = calcul_degats(attaque, self.ennemi, self.joueur)
-        self.joueur["pv"] -= degats
+    async def ennemi_attaque(self, interaction: discord.Interaction, texte_joueur=""):
+        """Riposte de l'ennemi ; `texte_joueur` (coup du joueur pas encore affiché) précède son résultat."""
+        attaque, degats, issue = self.moteur.attaque_ennemi()
+        prefixe = texte_joueur + "\n" if texte_joueur else ""
 
-        if self.joueur["pv"] <= 0:
+        if issue == DEFAITE:
             # Joueur KO - afficher l'image de défaite
-            defaite_image_path = "images/fin/defaite.png"
-            
             # Supprimer d'abord le message de combat
             try:
                 if self.combat_message:
-                    await self.combat_message.delete()
+                    await envois.supprimer(self.combat_message)
                 elif interaction.message:
-                    await interaction.message.delete()
+                    await envois.supprimer(interaction.message)
             except Exception as e:
                 print(f"Erreur suppression message: {e}")
             
             # Envoyer le message de défaite avec l'image si elle existe
-            if os.path.exists(defaite_image_path):
-                file = discord.File(fp=defaite_image_path, filename="defaite.png")
-                await interaction.channel.send(
-                    content=f"💥 **{self.ennemi['nom']} inflige {degats} PV avec {attaque['nom']} !**\n"
-                            f"💀 **Vous avez été vaincu...**\n"
-                            f"🔄 **Votre personnage a été supprimé. Créez-en un nouveau avec `/creer_personnage` !**",
-                    file=file
-                )
-            else:
-                # Pas d'image, juste le message
-                await interaction.channel.send(
-                    content=f"💥 **{self.ennemi['nom']} inflige {degats} PV avec {attaque['nom']} !**\n"
-                            f"💀 **Vous avez été vaincu...**\n"
-                            f"🔄 **Votre personnage a été supprimé. Créez-en un nouveau avec `/creer_personnage` !**"
-                )
+            await envois.envoyer(
+                interaction.channel,
+                content=prefixe +
+                        f"💥 **{self.ennemi['nom']} inflige {degats} PV avec {attaque['nom']} !**\n"
+                        f"💀 **Vous avez été vaincu...**\n"
+                        f"🔄 **Votre personnage a été supprimé. Créez-en un nouveau avec `/creer_personnage` !**",
+                **await pieces_jointes.image_seule("images/fin/defaite.png", "defaite")
+            )
             
             # Supprimer complètement le personnage (attaques et stats comprises)
-            supprimer_personnage(self.user_id)
+            # Joueur KO : inutile d'écrire ses dernières modifications
+            await self.terminer_aventure()
             
             return
         else:
             # Retour au joueur
-            self.tour_joueur = True
             await self.update_message(
                 interaction,
-                extra_text=f"💥 **{self.ennemi['nom']} inflige {degats} PV avec {attaque['nom']} !**"
+                extra_text=prefixe + f"💥 **{self.ennemi['nom']} inflige {degats} PV avec {attaque['nom']} !**"
             )
 
+    async def jouer_region_auto(self, channel, entete=""):
+        """
+        Combat automatique : joue toute la région en cours d'un coup avec le moteur,
+        puis envoie un seul message (bilan + image finale) et enchaîne sur le shop.
+        Une seule image rendue et une seule sauvegarde par région.
+        """
+        contexte.set("combat:auto")
+        registre.toucher(self.user_id)
+        bilan = self.moteur.resoudre_region(self.politique)
+
+        detail = ", ".join(f"{nom} ({n})" for nom, n in bilan.ennemis_vaincus)
+        content = entete + self.pv_text()
+        content += (
+            f"🤖 **Combat automatique ({self.politique})** : {len(bilan.ennemis_vaincus)} ennemis vaincus "
+            f"en {bilan.attaques} attaques | 💥 {bilan.degats_infliges} PV infligés | 🩸 {bilan.degats_subis} PV subis\n"
+        )
+        if detail:
+            content += f"🏆 {detail[:1000]}\n"
+        if bilan.issue == DEFAITE:
+            coup = bilan.dernier_coup
+            content += (
+                f"💥 **{self.ennemi['nom']} inflige {coup.degats} PV avec {coup.attaque['nom']} !**\n"
+                f"💀 **Vous avez été vaincu...**\n"
+                f"🔄 **Votre personnage a été supprimé. Créez-en un nouveau avec `/creer_personnage` !**"
+            )
+        elif bilan.issue == VICTOIRE:
+            content += "🏆 **Félicitations ! Vous avez vaincu toutes les régions !**"
+        else:
+            content += f"🎉 **Région {bilan.region.capitalize()} terminée !**"
+        await envois.envoyer(channel, content=content, file=await self.get_combat_image())
+
+        if bilan.issue != REGION_TERMINEE:
+            # Victoire finale ou défaite : le personnage est supprimé
+            await self.terminer_aventure()
+            return
+
+        # Point de sauvegarde : fin de région, puis shop (les achats restent au choix du joueur)
+        await sauvegarde.flush(self.user_id)
+        self.en_shop = True
+        await afficher_shop(
+            channel, self.user_id, self.region, self.joueur, self.continuer_vers_prochaine_region,
+            moteur=self.moteur, on_abandon_callback=self.abandonner_shop
+        )
+
 
 async def demarrer_combat(interaction: discord.Interaction, nb_regions=3, nb_ennemis_par_region=10):
     """Démarre un combat pour l'utilisateur."""
     user_id = str(interaction.user.id)
     
-    # Vérifier que l'utilisateur a un personnage
-    if not personnage_existe(user_id):
+    # Joueur d'un combat en cours (PV pas encore écrits compris), sinon chargé depuis la base
+    joueur = sauvegarde.joueur(user_id) or await get_personnage(user_id)
+    if not joueur:
         await interaction.response.send_message(
             "❌ Vous n'avez pas de personnage ! Utilisez `/creer_personnage` d'abord.",
             ephemeral=True
         )
         return
     
-    # Charger le personnage
-    joueur = get_personnage(user_id)
-    
     # Vérifier que le joueur a des PV
     if joueur["pv"] <= 0:
         await interaction.response.send_message(
@@ -357,8 +411,9 @@ async def demarrer_combat(interaction: discord.Interaction, nb_regions=3, nb_enn
     
     # Créer la vue de combat
     try:
-        view = CombatView(user_id, nb_regions, nb_ennemis_par_region)
-        file = view.get_combat_image()
+        view = CombatView(user_id, joueur, nb_regions, nb_ennemis_par_region)
+        await registre.enregistrer(view)
+        file = await view.get_combat_image()
         
         await interaction.response.send_message(
             content=view.get_initial_message_content(),
@@ -373,4 +428,43 @@ async def demarrer_combat(interaction: discord.Interaction, nb_regions=3, nb_enn
         await interaction.response.send_message(
             f"❌ Erreur : {str(e)}",
             ephemeral=True
-        )
\ No newline at end of file
+        )
+
+
+async def rehydrater_combat(interaction: discord.Interaction):
+    """Reprend un combat évincé de la mémoire quand le joueur clique sur son ancien menu d'attaque."""
+    if interaction.type != discord.InteractionType.component:
+        return
+    ids = lire_custom_id_combat((interaction.data or {}).get("custom_id"))
+    if ids is None:
+        return
+    user_id, session_id = ids
+    contexte.set("combat:reprise")
+
+    # Combat toujours en mémoire : c'est la vue elle-même qui traite le clic
+    view = registre.get(user_id)
+    if view is not None and view.session_id == session_id:
+        return
+    if view is not None:
+        await interaction.response.send_message("❌ Ce combat a été remplacé par un combat plus récent.", ephemeral=True)
+        return
+
+    if str(interaction.user.id) != user_id:
+        await interaction.response.send_message("❌ Ce n'est pas votre combat !", ephemeral=True)
+        return
+
+    # Lecture et suppression de l'état en une requête, seulement si c'est bien ce combat
+    # (un clic sur un ancien message ne doit pas effacer le combat évincé le plus récent)
+    etat = await reprendre_session_combat(user_id, session_id)
+    # Joueur sauvegardé avec l'état à l'éviction (relu en base pour les anciens états)
+    joueur = None
+    if etat is not None:
+        joueur = etat.pop("joueur", None) or await get_personnage(user_id)
+    if not joueur:
+        await interaction.response.send_message("❌ Ce combat est terminé. Lancez-en un nouveau avec `!combat` !", ephemeral=True)
+        return
+
+    view = CombatView(user_id, joueur, etat=etat)
+    view.combat_message = interaction.message
+    await registre.enregistrer(view, rehydrate=True)
+    await view.jouer_attaque(interaction, interaction.data["values"][0])
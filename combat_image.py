@@ -1,76 +1,218 @@
 from PIL import Image, ImageDraw, ImageFont
+import glob
 import io
+import json
+import os
+import time
 
-def creer_image_combat(joueur, ennemi, fond_path="images/region/fond.png"):
+from assets import charger_image, prechauffer, mtime
+from cache import CacheLRU, ABSENT
+
+# Taille d'affichage des sprites (agrandis de 150x150 à 350x350)
+TAILLE_SPRITE = (350, 350)
+# Dimensions des barres de PV (px)
+BARRE_LARGEUR = 200
+BARRE_HAUTEUR = 15
+
+# Couches de base (fond + sprites) déjà composées, par affrontement ; coût = octets décodés
+RENDU_BASES_MO = int(os.getenv("RENDU_BASES_MO", "128"))
+_bases = CacheLRU(
+    taille_max=1000,
+    cout_max=RENDU_BASES_MO * 1024 * 1024,
+    cout=lambda image: image.width * image.height * 4,
+)
+_police = None
+
+# ===== ENCODAGE DES IMAGES ENVOYÉES =====
+# Profil utilisé pour les images de combat (voir PROFILS_ENCODAGE et !profils_image)
+RENDU_PROFIL = os.getenv("RENDU_PROFIL", "png")
+# Qualité des profils avec perte (1-100) ; vide = qualité du profil
+RENDU_QUALITE = os.getenv("RENDU_QUALITE")
+# Réduction de la taille avant encodage (1 = pleine résolution, 0.5 = moitié)
+RENDU_ECHELLE = float(os.getenv("RENDU_ECHELLE", "1"))
+# ========================================
+
+# Le PNG "palette" réduit l'image à 256 couleurs avant de la compresser au mieux
+PROFILS_ENCODAGE = {
+    "png": {"format": "PNG", "extension": "png"},
+    "png_palette": {"format": "PNG", "extension": "png", "couleurs": 256},
+    "webp": {"format": "WEBP", "extension": "webp", "qualite": 80},
+    "jpeg": {"format": "JPEG", "extension": "jpg", "qualite": 85},
+}
+
+
+def _get_police():
+    global _police
+    if _police is None:
+        _police = ImageFont.load_default()
+    return _police
+
+
+def couche_base(fond_path, image_joueur, image_ennemi):
     """
-    Crée une image du combat avec :
-    - Fond
-    - Joueur à gauche
-    - Ennemi à droite
-    - Barres de PV avec couleur pleine + fond gris
-    Retourne un BytesIO pour Discord
+    Retourne le fond avec le joueur à gauche et l'ennemi à droite, composé une
+    seule fois par affrontement. L'image est partagée : ne pas dessiner dessus.
     """
-    # Charger images
-    fond = Image.open(fond_path).convert("RGBA")
-    perso_img = Image.open(joueur["image"]).convert("RGBA")
-    ennemi_img = Image.open(ennemi["image"]).convert("RGBA")
-    
-    # Redimensionner (agrandis de 150x150 à 250x250)
-    perso_img = perso_img.resize((350, 350))
-    ennemi_img = ennemi_img.resize((350, 350))
-    
-    # Coller sur le fond
-    fond.paste(perso_img, (200, fond.height - 310), perso_img)
-    fond.paste(ennemi_img, (fond.width - 400, fond.height - 350), ennemi_img)
-    
-    # Dessiner barres de PV
+    cle = (
+        fond_path, mtime(fond_path),
+        image_joueur, mtime(image_joueur),
+        image_ennemi, mtime(image_ennemi),
+    )
+    base = _bases.get(cle)
+    if base is ABSENT:
+        # Charger images (décodées et redimensionnées une seule fois, voir assets.py)
+        # Le fond est copié : on colle dessus, l'image du cache doit rester intacte
+        base = charger_image(fond_path).copy()
+        perso_img = charger_image(image_joueur, TAILLE_SPRITE)
+        ennemi_img = charger_image(image_ennemi, TAILLE_SPRITE)
+
+        # Coller sur le fond
+        base.paste(perso_img, (200, base.height - 310), perso_img)
+        base.paste(ennemi_img, (base.width - 400, base.height - 350), ennemi_img)
+        _bases.set(cle, base)
+    return base
+
+
+def largeur_barre(combattant):
+    """Largeur (px) de la partie pleine de la barre de PV."""
+    pv, pv_max = max(combattant["pv"], 0), combattant["pv_max"]
+    return int(BARRE_LARGEUR * pv / pv_max) if pv_max > 0 else 0
+
+
+def libelle_pv(combattant):
+    """Texte affiché au-dessus de la barre de PV."""
+    return f"{combattant['nom']} {max(combattant['pv'], 0)}/{combattant['pv_max']} PV"
+
+
+def cle_rendu(joueur, ennemi, fond_path, profil=None):
+    """
+    Clé canonique d'une image de combat : deux tours qui donnent la même clé
+    produisent exactement les mêmes octets (les PV ne comptent qu'à travers la
+    largeur des barres et les libellés).
+    """
+    return (
+        fond_path, mtime(fond_path),
+        joueur["image"], mtime(joueur["image"]),
+        ennemi["image"], mtime(ennemi["image"]),
+        largeur_barre(joueur), libelle_pv(joueur),
+        largeur_barre(ennemi), libelle_pv(ennemi),
+        profil or RENDU_PROFIL, RENDU_QUALITE, RENDU_ECHELLE,
+    )
+
+
+def dessiner_barres(fond, joueur, ennemi):
+    """Dessine les barres de PV et leurs libellés (seule partie qui change d'un tour à l'autre)."""
     draw = ImageDraw.Draw(fond)
-    font = ImageFont.load_default()
-    
-    # Paramètres barre
-    barre_largeur = 200
-    barre_hauteur = 15
+    font = _get_police()
     
     # ------------------ Joueur ------------------
-    pv_joueur = max(joueur["pv"], 0)
-    pv_max_joueur = joueur["pv_max"]
-    
     # Fond gris
     draw.rectangle(
-        (50, fond.height - 290, 50 + barre_largeur, fond.height - 290 + barre_hauteur),
+        (50, fond.height - 290, 50 + BARRE_LARGEUR, fond.height - 290 + BARRE_HAUTEUR),
         fill=(50, 50, 50)  # gris foncé
     )
     
     # Partie pleine (verte)
-    largeur_pv_joueur = int(barre_largeur * pv_joueur / pv_max_joueur) if pv_max_joueur > 0 else 0
     draw.rectangle(
-        (50, fond.height - 290, 50 + largeur_pv_joueur, fond.height - 290 + barre_hauteur),
+        (50, fond.height - 290, 50 + largeur_barre(joueur), fond.height - 290 + BARRE_HAUTEUR),
         fill=(0, 255, 0)
     )
     
-    draw.text((50, fond.height - 310), f"{joueur['nom']} {pv_joueur}/{pv_max_joueur} PV", fill="white", font=font)
+    draw.text((50, fond.height - 310), libelle_pv(joueur), fill="white", font=font)
     
     # ------------------ Ennemi ------------------
-    pv_ennemi = max(ennemi["pv"], 0)
-    pv_max_ennemi = ennemi["pv_max"]
-    
     # Fond gris
     draw.rectangle(
-        (fond.width - 350, 30, fond.width - 350 + barre_largeur, 30 + barre_hauteur),
+        (fond.width - 350, 30, fond.width - 350 + BARRE_LARGEUR, 30 + BARRE_HAUTEUR),
         fill=(50, 50, 50)
     )
     
     # Partie pleine (rouge)
-    largeur_pv_ennemi = int(barre_largeur * pv_ennemi / pv_max_ennemi) if pv_max_ennemi > 0 else 0
     draw.rectangle(
-        (fond.width - 350, 30, fond.width - 350 + largeur_pv_ennemi, 30 + barre_hauteur),
+        (fond.width - 350, 30, fond.width - 350 + largeur_barre(ennemi), 30 + BARRE_HAUTEUR),
         fill=(255, 0, 0)
     )
     
-    draw.text((fond.width - 350, 10), f"{ennemi['nom']} {pv_ennemi}/{pv_max_ennemi} PV", fill="white", font=font)
-    
-    # Retourner en BytesIO
+    draw.text((fond.width - 350, 10), libelle_pv(ennemi), fill="white", font=font)
+
+
+def extension_image(profil=None):
+    """Extension du fichier envoyé à Discord pour un profil d'encodage."""
+    return PROFILS_ENCODAGE[profil or RENDU_PROFIL]["extension"]
+
+
+def encoder_image(image, profil=None, qualite=None, echelle=None):
+    """Encode une image selon un profil de PROFILS_ENCODAGE et retourne un BytesIO."""
+    nom = profil or RENDU_PROFIL
+    if nom not in PROFILS_ENCODAGE:
+        raise ValueError(f"Profil d'encodage inconnu : {nom} (profils : {', '.join(PROFILS_ENCODAGE)})")
+    config = PROFILS_ENCODAGE[nom]
+    echelle = RENDU_ECHELLE if echelle is None else echelle
+
+    if echelle != 1:
+        taille = (max(1, round(image.width * echelle)), max(1, round(image.height * echelle)))
+        image = image.resize(taille, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    options = {}
+    if "couleurs" in config:
+        # Les fonds sont opaques : la transparence n'a pas besoin d'être gardée
+        image = image.convert("RGB").quantize(config["couleurs"], method=Image.Quantize.FASTOCTREE)
+        options["optimize"] = True
+    if "qualite" in config:
+        options["quality"] = int(qualite or RENDU_QUALITE or config["qualite"])
+        if config["format"] == "JPEG":
+            image = image.convert("RGB")
+
     output = io.BytesIO()
-    fond.save(output, format="PNG")
+    image.save(output, format=config["format"], **options)
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
+
+
+def composer_image_combat(joueur, ennemi, fond_path="images/region/fond.png"):
+    """Retourne l'image du combat (fond, joueur à gauche, ennemi à droite, barres de PV) avant encodage."""
+    # Seules les barres de PV sont redessinées, sur une copie de la couche de base
+    fond = couche_base(fond_path, joueur["image"], ennemi["image"]).copy()
+    dessiner_barres(fond, joueur, ennemi)
+    return fond
+
+
+def creer_image_combat(joueur, ennemi, fond_path="images/region/fond.png", profil=None):
+    """
+    Crée une image du combat avec :
+    - Fond
+    - Joueur à gauche
+    - Ennemi à droite
+    - Barres de PV avec couleur pleine + fond gris
+    Retourne un BytesIO pour Discord, encodé selon RENDU_PROFIL
+    """
+    return encoder_image(composer_image_combat(joueur, ennemi, fond_path), profil)
+
+
+def comparer_profils(joueur, ennemi, fond_path, echelle=None, profils=None):
+    """Encode la même image avec chaque profil ; retourne [(profil, octets, durée en ms)]."""
+    image = composer_image_combat(joueur, ennemi, fond_path)
+    resultats = []
+    for profil in profils or PROFILS_ENCODAGE:
+        debut = time.perf_counter()
+        octets = len(encoder_image(image, profil, echelle=echelle).getbuffer())
+        resultats.append((profil, octets, (time.perf_counter() - debut) * 1000))
+    return resultats
+
+
+def prechauffer_images():
+    """Charge en mémoire les fonds, ennemis et personnages pour qu'aucun tour de combat ne lise le disque."""
+    demandes = []
+    for fichier in sorted(glob.glob("json/ennemies/*.json")):
+        region = os.path.splitext(os.path.basename(fichier))[0]
+        demandes.append((f"images/fond/{region}.png", None))
+        with open(fichier, "r", encoding="utf-8") as f:
+            demandes.extend((e["image"], TAILLE_SPRITE) for e in json.load(f))
+    with open("json/personnages.json", "r", encoding="utf-8") as f:
+        demandes.extend((p["image"], TAILLE_SPRITE) for p in json.load(f))
+    return prechauffer(demandes)
+
+
+def stats_rendu():
+    """Retourne les compteurs du cache des couches de base."""
+    return _bases.stats()
@@ -0,0 +1,31 @@
+"""Configuration commune des tests : base SQLite en mémoire, sans Discord.
+
+Les variables d'environnement sont fixées avant tout import des modules du
+bot (personnage_db lit DB_BACKEND à l'import).
+"""
+import os
+
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = ":memory:"
+os.environ["RENDU_EXECUTOR"] = "thread"
+os.environ["JOURNAUX_COMBAT_DIR"] = ""
+os.environ.setdefault("CHANNEL_ID_COPAING", "0")
+
+import pytest
+
+import personnage_db
+from sauvegarde_differee import sauvegarde
+from sessions_combat import registre
+
+
+@pytest.fixture(autouse=True)
+def etat_vierge():
+    """Cache des personnages froid au début de chaque test ; combats et suivis oubliés à la fin."""
+    personnage_db.stockage()
+    personnage_db._cache.vider()
+    yield
+    for user_id in list(registre.sessions):
+        registre.get(user_id).stop()
+        registre.retirer(user_id)
+    for user_id in list(sauvegarde.joueurs):
+        sauvegarde.oublier(user_id)
@@ -0,0 +1,171 @@
+"""File d'attente des envois, modifications et suppressions de messages, par salon.
+
+Discord limite les requêtes par salon (quelques messages toutes les quelques
+secondes). Quand plusieurs joueurs combattent dans le même salon, les
+modifications du message de combat, les envois et les suppressions du combat
+et du shop partaient en même temps et discord.py attendait les 429 au hasard
+des clics. Ils passent maintenant tous par une file par salon :
+
+- les opérations d'un salon partent dans l'ordre, une à la fois ;
+- une modification pas encore partie est remplacée par la plus récente du même
+  message (seule la dernière image est envoyée) ; une suppression annule la
+  modification en attente du message ;
+- chaque salon a un seau de ENVOIS_LIMITE requêtes par ENVOIS_FENETRE
+  secondes : la file attend elle-même un créneau au lieu de provoquer un 429 ;
+- l'attente en file et la durée des appels sont mesurées (!stats_envois).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+from metriques import Metriques
+
+# ===== CONFIGURATION =====
+# Requêtes autorisées par salon sur une fenêtre glissante (secondes)
+ENVOIS_LIMITE = int(os.getenv("ENVOIS_LIMITE", "5"))
+ENVOIS_FENETRE = float(os.getenv("ENVOIS_FENETRE", "5"))
+# Les opérations plus longues (millisecondes, attente en file comprise) sont affichées dans la console
+ENVOIS_LENT_MS = float(os.getenv("ENVOIS_LENT_MS", "2000"))
+# =========================
+
+# "attente" = temps passé en file ; "envoyer", "modifier", "supprimer" = durée de l'appel Discord
+metriques_envois = Metriques("Envois", seuil_lent=ENVOIS_LENT_MS / 1000)
+
+
+class _Operation:
+    """Opération en file : l'appel à faire et les appelants qui attendent son résultat."""
+
+    __slots__ = ("nom", "appel", "message_id", "attentes", "debut")
+
+    def __init__(self, nom, appel, message_id=None):
+        self.nom = nom
+        self.appel = appel  # coroutine function sans argument ; None = annulée
+        self.message_id = message_id
+        self.attentes = [asyncio.get_running_loop().create_future()]
+        self.debut = time.perf_counter()
+
+    def terminer(self, resultat=None, erreur=None):
+        for attente in self.attentes:
+            if attente.done():
+                continue
+            if erreur is not None:
+                attente.set_exception(erreur)
+            else:
+                attente.set_result(resultat)
+
+
+class FileEnvois:
+    """Une file et un seau de requêtes par salon, une tâche par salon qui a du travail."""
+
+    def __init__(self, limite=ENVOIS_LIMITE, fenetre=ENVOIS_FENETRE):
+        self.limite = limite
+        self.fenetre = fenetre
+        self.files = {}  # salon_id -> deque d'opérations
+        self.taches = {}  # salon_id -> tâche qui vide la file
+        self.seaux = {}  # salon_id -> instants des dernières requêtes (fenêtre glissante)
+        self.modifications = {}  # message_id -> modification pas encore partie
+        self.file_max = 0
+        self.nb_remplacees = 0
+        self.nb_annulees = 0
+        self.nb_pauses = 0
+
+    def _ajouter(self, salon_id, operation):
+        file = self.files.setdefault(salon_id, deque())
+        file.append(operation)
+        self.file_max = max(self.file_max, len(file))
+        if salon_id not in self.taches:
+            self.taches[salon_id] = asyncio.create_task(self._vider(salon_id))
+        return operation.attentes[0]
+
+    async def envoyer(self, salon, **kwargs):
+        """salon.send(**kwargs) via la file ; retourne le message envoyé."""
+        return await self._ajouter(salon.id, _Operation("envoyer", lambda: salon.send(**kwargs)))
+
+    async def modifier(self, message, **kwargs):
+        """
+        message.edit(**kwargs) via la file ; retourne le message modifié. Si une
+        modification du même message attend encore, elle est remplacée par
+        celle-ci (les deux appelants reçoivent le même résultat).
+        """
+        appel = lambda: message.edit(**kwargs)
+        operation = self.modifications.get(message.id)
+        if operation is not None:
+            operation.appel = appel
+            operation.attentes.append(asyncio.get_running_loop().create_future())
+            self.nb_remplacees += 1
+            return await operation.attentes[-1]
+        operation = _Operation("modifier", appel, message.id)
+        self.modifications[message.id] = operation
+        return await self._ajouter(message.channel.id, operation)
+
+    async def supprimer(self, message):
+        """message.delete() via la file ; la modification en attente du message est abandonnée."""
+        operation = self.modifications.pop(message.id, None)
+        if operation is not None:
+            operation.appel = None
+            operation.terminer(None)
+            self.nb_annulees += 1
+        return await self._ajouter(message.channel.id, _Operation("supprimer", message.delete))
+
+    async def _attendre_creneau(self, salon_id):
+        """Attend qu'une requête de plus soit permise dans le salon, puis la compte."""
+        seau = self.seaux.setdefault(salon_id, deque())
+        maintenant = time.monotonic()
+        while seau and maintenant - seau[0] >= self.fenetre:
+            seau.popleft()
+        if len(seau) >= self.limite:
+            self.nb_pauses += 1
+            await asyncio.sleep(self.fenetre - (maintenant - seau[0]))
+            seau.popleft()
+        seau.append(time.monotonic())
+
+    async def _vider(self, salon_id):
+        file = self.files[salon_id]
+        try:
+            while file:
+                operation = file.popleft()
+                if operation.appel is None:
+                    continue
+                await self._attendre_creneau(salon_id)
+                if operation.appel is None:
+                    # Annulée par une suppression pendant l'attente : le créneau est rendu
+                    self.seaux[salon_id].pop()
+                    continue
+                # À partir d'ici la modification est partie : une nouvelle ne la remplace plus
+                if self.modifications.get(operation.message_id) is operation:
+                    del self.modifications[operation.message_id]
+                attente = time.perf_counter() - operation.debut
+                debut = time.perf_counter()
+                try:
+                    resultat = await operation.appel()
+                except Exception as e:
+                    operation.terminer(erreur=e)
+                else:
+                    operation.terminer(resultat)
+                duree = time.perf_counter() - debut
+                metriques_envois.enregistrer("attente", attente)
+                metriques_envois.enregistrer(operation.nom, duree, attente_ms=attente * 1000)
+        finally:
+            del self.files[salon_id]
+            del self.taches[salon_id]
+            # Seau vide depuis longtemps : inutile de le garder
+            seau = self.seaux.get(salon_id)
+            if seau and time.monotonic() - seau[-1] >= self.fenetre:
+                del self.seaux[salon_id]
+
+    def stats(self):
+        """Retourne la profondeur des files et les compteurs de remplacement."""
+        return {
+            "salons": len(self.files),
+            "en_attente": sum(len(f) for f in self.files.values()),
+            "file_max": self.file_max,
+            "remplacees": self.nb_remplacees,
+            "annulees": self.nb_annulees,
+            "pauses": self.nb_pauses,
+            **metriques_envois.stats(),
+        }
+
+
+# Instance partagée par les combats et le shop
+envois = FileEnvois()
@@ -0,0 +1,96 @@
+"""Journaux des combats et replay sans Discord.
+
+    python journal_combat.py journaux_combat/<user_id>-<session_id>.json
+    python journal_combat.py journaux_combat/<fichier>.json --repetitions 1000
+
+À la fin d'une aventure (victoire ou défaite), le journal du combat (graine,
+joueur de départ, tours, achats) est écrit dans JOURNAUX_COMBAT_DIR. Le replay
+refait la même aventure avec le moteur : mêmes régions, mêmes ennemis, mêmes
+attaques de l'ennemi, et vérifie à chaque tour dégâts et PV. Avec
+--repetitions, il mesure aussi le temps du moteur sur cette partie réelle.
+"""
+import argparse
+import copy
+import json
+import os
+import time
+
+from moteur_combat import (
+    MoteurCombat, JournalCombat, charger_shop,
+    TOUR_JOUEUR, TOUR_ENNEMI, ACHAT, NOUVELLE_REGION,
+)
+
+# ===== CONFIGURATION =====
+# Dossier des journaux de combat (vide = journaux non écrits)
+JOURNAUX_COMBAT_DIR = os.getenv("JOURNAUX_COMBAT_DIR", "journaux_combat")
+# =========================
+
+
+def ecrire(donnees, nom):
+    """Écrit un journal (JournalCombat.exporter(), plus la politique) ; retourne son chemin, ou None."""
+    if not JOURNAUX_COMBAT_DIR:
+        return None
+    os.makedirs(JOURNAUX_COMBAT_DIR, exist_ok=True)
+    chemin = os.path.join(JOURNAUX_COMBAT_DIR, f"{nom}.json")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(donnees, f, ensure_ascii=False, separators=(",", ":"))
+    return chemin
+
+
+def _verifier(n, attendu, obtenu, quoi):
+    if attendu != obtenu:
+        raise ValueError(f"Tour {n} : {quoi} {obtenu} au lieu de {attendu} (le journal ne correspond plus au moteur)")
+
+
+def rejouer(donnees):
+    """
+    Rejoue un journal avec le moteur ; retourne le moteur en fin de partie.
+    Lève ValueError au premier tour qui diverge (règles ou données modifiées).
+    """
+    journal = JournalCombat.restaurer(donnees)
+    politique = donnees.get("politique")
+    moteur = MoteurCombat(
+        copy.deepcopy(journal.joueur), journal.nb_regions, journal.nb_ennemis, graine=journal.graine
+    )
+    joueur = moteur.joueur
+    # La première région est tirée par le constructeur
+    for n, (camp, indice, degats, pv) in enumerate(journal, start=0):
+        if n == 0:
+            _verifier(n, NOUVELLE_REGION, camp, "entrée")
+            continue
+        if camp == NOUVELLE_REGION:
+            moteur.region_suivante()
+        elif camp == TOUR_JOUEUR:
+            # Combat automatique : la politique refait ses propres tirages
+            nom = moteur.choisir_attaque(politique) if politique else joueur["attaques"][indice]["nom"]
+            _verifier(n, joueur["attaques"][indice]["nom"], nom, "attaque du joueur")
+            coup = moteur.attaque_joueur(nom)
+            _verifier(n, degats, coup.degats, "dégâts du joueur")
+        elif camp == TOUR_ENNEMI:
+            coup = moteur.attaque_ennemi()
+            _verifier(n, indice, moteur.journal.indices[-1], "attaque de l'ennemi")
+            _verifier(n, degats, coup.degats, "dégâts de l'ennemi")
+        elif camp == ACHAT:
+            moteur.acheter(charger_shop(moteur.region)[indice])
+        _verifier(n, pv, moteur.journal.pv[-1], "PV")
+    return moteur
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejoue un journal de combat sans Discord")
+    parser.add_argument("journal", help="fichier écrit dans JOURNAUX_COMBAT_DIR")
+    parser.add_argument("--repetitions", type=int, default=1, help="rejoue N fois et mesure le temps")
+    args = parser.parse_args()
+
+    with open(args.journal, "r", encoding="utf-8") as f:
+        donnees = json.load(f)
+
+    debut = time.perf_counter()
+    for _ in range(args.repetitions):
+        moteur = rejouer(donnees)
+    duree = time.perf_counter() - debut
+
+    tours = sum(1 for camp in donnees["camps"] if camp in (TOUR_JOUEUR, TOUR_ENNEMI))
+    print(f"✅ Journal rejoué à l'identique : {tours} tours, graine {donnees['graine']}, "
+          f"région finale {moteur.region}, PV du joueur {moteur.joueur['pv']}")
+    print(f"⏱️ {duree / args.repetitions * 1000:.2f} ms par partie ({args.repetitions} répétitions)")
@@ -0,0 +1,99 @@
+"""Mesures de performance : nombre d'appels, latences (p50/p95/p99) et compteurs par opération."""
+import threading
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+# Commande ou callback en cours (ex. "mon_personnage", "combat:attaque"), pour répartir les mesures
+contexte = ContextVar("contexte_metriques", default=None)
+
+
+def percentile(valeurs_triees, p):
+    """Percentile p (0-100) d'une liste déjà triée (0 si vide)."""
+    if not valeurs_triees:
+        return 0.0
+    index = min(len(valeurs_triees) - 1, int(round(p / 100 * (len(valeurs_triees) - 1))))
+    return valeurs_triees[index]
+
+
+class StatsOperation:
+    """Mesures d'une opération nommée ; les latences gardent les derniers échantillons."""
+
+    def __init__(self, taille_echantillon=2000):
+        self.appels = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.echantillons = deque(maxlen=taille_echantillon)
+        self.compteurs = defaultdict(float)  # ex. lignes, commit, octets
+
+    def ajouter(self, duree, **compteurs):
+        self.appels += 1
+        self.total += duree
+        self.maximum = max(self.maximum, duree)
+        self.echantillons.append(duree)
+        for nom, valeur in compteurs.items():
+            self.compteurs[nom] += valeur
+
+    def resume(self):
+        tries = sorted(self.echantillons)
+        return {
+            "appels": self.appels,
+            "moyenne_ms": self.total / self.appels * 1000 if self.appels else 0.0,
+            "p50_ms": percentile(tries, 50) * 1000,
+            "p95_ms": percentile(tries, 95) * 1000,
+            "p99_ms": percentile(tries, 99) * 1000,
+            "max_ms": self.maximum * 1000,
+            **{nom: valeur for nom, valeur in self.compteurs.items()},
+        }
+
+
+class Metriques:
+    """Ensemble de mesures par opération, avec journal des opérations lentes."""
+
+    def __init__(self, nom, seuil_lent=None):
+        self.nom = nom
+        self.seuil_lent = seuil_lent  # secondes, None = pas de journal
+        self.operations = defaultdict(StatsOperation)
+        self.par_contexte = defaultdict(int)  # (contexte, opération) -> appels
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, operation, duree, **compteurs):
+        """Ajoute une mesure (durée en secondes) pour une opération."""
+        ctx = contexte.get()
+        with self._verrou:
+            self.operations[operation].ajouter(duree, **compteurs)
+            if ctx is not None:
+                self.par_contexte[(ctx, operation)] += 1
+        if self.seuil_lent is not None and duree >= self.seuil_lent:
+            details = ", ".join(f"{k}={v:g}" for k, v in compteurs.items())
+            print(f"🐢 Lent ({self.nom}) : {operation} {duree * 1000:.1f} ms"
+                  + (f" ({details})" if details else "")
+                  + (f" [{ctx}]" if ctx else ""))
+
+    def stats(self):
+        """Retourne le résumé de chaque opération, la plus coûteuse en temps total d'abord."""
+        with self._verrou:
+            operations = sorted(self.operations.items(), key=lambda o: o[1].total, reverse=True)
+            return {nom: stats.resume() for nom, stats in operations}
+
+    def stats_par_contexte(self):
+        """Retourne {contexte: {opération: appels}}."""
+        with self._verrou:
+            resultat = defaultdict(dict)
+            for (ctx, operation), appels in self.par_contexte.items():
+                resultat[ctx][operation] = appels
+            return dict(resultat)
+
+    def rapport(self, limite=10):
+        """Texte lisible des opérations les plus coûteuses."""
+        lignes = []
+        for nom, s in list(self.stats().items())[:limite]:
+            lignes.append(
+                f"{nom}: {s['appels']} appels | p50 {s['p50_ms']:.1f} ms | "
+                f"p95 {s['p95_ms']:.1f} ms | p99 {s['p99_ms']:.1f} ms"
+            )
+        return "\n".join(lignes) or "Aucune mesure."
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.operations.clear()
+            self.par_contexte.clear()
@@ -0,0 +1,152 @@
+"""Migrations versionnées du schéma de la base.
+
+Le bot ne modifie plus le schéma au démarrage : on lance explicitement
+
+    python migrations.py migrate   # applique les migrations en attente
+    python migrations.py check     # code de sortie 1 s'il reste des migrations à appliquer
+
+Pour faire évoluer le schéma, ajouter une entrée à la fin de MIGRATIONS
+(ne jamais modifier une migration déjà déployée). Le SQL peut être un dict
+{dialecte: SQL} quand PostgreSQL et SQLite diffèrent (None = rien à faire),
+et une liste de requêtes exécutées dans la même transaction.
+"""
+import sys
+
+import personnage_db
+
+# (version, description, SQL)
+MIGRATIONS = [
+    (1, "création de la table personnages", """
+        CREATE TABLE IF NOT EXISTS personnages (
+            user_id TEXT PRIMARY KEY,
+            race TEXT NOT NULL,
+            nom TEXT NOT NULL,
+            description TEXT,
+            pv INTEGER NOT NULL,
+            pv_max INTEGER NOT NULL,
+            vitesse INTEGER NOT NULL,
+            force INTEGER NOT NULL,
+            magie INTEGER NOT NULL,
+            armure INTEGER NOT NULL,
+            armure_magique INTEGER NOT NULL,
+            image TEXT NOT NULL,
+            attaques JSONB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "ajout de la colonne description", {
+        "postgres": """
+            ALTER TABLE personnages
+            ADD COLUMN IF NOT EXISTS description TEXT;
+        """,
+        # SQLite n'a pas ADD COLUMN IF NOT EXISTS, et la migration 1 crée déjà la colonne
+        "sqlite": None,
+    }),
+    (3, "création de la table combat_sessions (combats inactifs évincés)", """
+        CREATE TABLE IF NOT EXISTS combat_sessions (
+            user_id TEXT PRIMARY KEY,
+            etat JSONB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (4, "combat_sessions supprimées avec leur personnage (ON DELETE CASCADE)", {
+        "postgres": [
+            "DELETE FROM combat_sessions WHERE user_id NOT IN (SELECT user_id FROM personnages)",
+            """
+            ALTER TABLE combat_sessions
+            ADD CONSTRAINT combat_sessions_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES personnages (user_id) ON DELETE CASCADE
+            """,
+        ],
+        # SQLite ne sait pas ajouter une contrainte : on recrée la table (états temporaires)
+        "sqlite": [
+            "DROP TABLE combat_sessions",
+            """
+            CREATE TABLE combat_sessions (
+                user_id TEXT PRIMARY KEY REFERENCES personnages (user_id) ON DELETE CASCADE,
+                etat JSONB NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    }),
+]
+
+
+def _creer_table_version(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def _sql_pour(sql, stockage):
+    """Retourne les requêtes d'une migration adaptées au dialecte du stockage."""
+    if isinstance(sql, dict):
+        sql = sql.get(stockage.dialecte)
+    if not sql:
+        return []
+    if isinstance(sql, str):
+        sql = [sql]
+    return [stockage.adapter_ddl(requete) for requete in sql]
+
+
+def version_actuelle(stockage=None):
+    """Retourne la dernière version de schéma appliquée (0 si aucune)."""
+    stockage = stockage or personnage_db.stockage()
+    with stockage.transaction() as cur:
+        _creer_table_version(cur)
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cur.fetchone()[0]
+
+
+def migrations_en_attente(stockage=None):
+    """Retourne les migrations qui n'ont pas encore été appliquées."""
+    version = version_actuelle(stockage)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def migrate(stockage=None):
+    """Applique les migrations en attente, chacune dans sa propre transaction."""
+    stockage = stockage or personnage_db.stockage()
+    appliquees = []
+    for version, description, sql in migrations_en_attente(stockage):
+        with stockage.transaction() as cur:
+            for requete in _sql_pour(sql, stockage):
+                cur.execute(requete)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+        print(f"✅ Migration {version} appliquée : {description}")
+        appliquees.append(version)
+    return appliquees
+
+
+def check(stockage=None):
+    """Retourne True si le schéma est à jour, sinon affiche les migrations manquantes."""
+    en_attente = migrations_en_attente(stockage)
+    for version, description, _ in en_attente:
+        print(f"⏳ Migration {version} en attente : {description}")
+    return not en_attente
+
+
+if __name__ == "__main__":
+    commande = sys.argv[1] if len(sys.argv) > 1 else "check"
+    try:
+        if commande == "migrate":
+            migrate()
+            print(f"Schéma à jour (version {version_actuelle()})")
+        elif commande == "check":
+            if not check():
+                sys.exit(1)
+            print(f"Schéma à jour (version {version_actuelle()})")
+        else:
+            print("Usage : python migrations.py [migrate|check]")
+            sys.exit(2)
+    finally:
+        personnage_db.fermer()
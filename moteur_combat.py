@@ -0,0 +1,684 @@
+"""Règles du combat, sans Discord.
+
+MoteurCombat garde l'état d'une aventure (régions, file d'ennemis, tour) et
+applique les règles : ordre des tours selon la vitesse, calcul des dégâts,
+attaque de l'ennemi tirée au hasard. CombatView ne fait plus que l'affichage.
+
+Chaque combat a ses propres tirages (TiragesRejouables, à partir d'une
+graine) et tient un journal compact de ses tours (JournalCombat) : un combat
+signalé par un joueur se rejoue à l'identique sans Discord (journal_combat.py).
+
+simuler_lot joue des milliers de combats indépendants en même temps avec
+NumPy (PV, dégâts et tirages dans des tableaux), pour estimer l'issue d'une
+aventure sans lancer le bot.
+"""
+import copy
+import functools
+import json
+import random
+import secrets
+from array import array
+from collections import namedtuple
+from types import MappingProxyType
+
+# Régions jouables et tables d'apparition : voir json/regions.json
+FICHIER_REGIONS = "json/regions.json"
+
+# Essais de tirage pondéré d'un ennemi pas encore dans la file, avant de prendre le suivant libre
+ESSAIS_TIRAGE = 8
+
+# Or gagné à la fin d'une région, à dépenser dans son shop
+OR_PAR_REGION = 100
+
+# Issues d'une attaque (Coup.issue)
+ENNEMI_VAINCU = "ennemi_vaincu"      # ennemi KO, le suivant de la région arrive
+REGION_TERMINEE = "region_terminee"  # dernier ennemi de la région KO, il reste des régions
+VICTOIRE = "victoire"                # dernier ennemi de la dernière région KO
+DEFAITE = "defaite"                  # joueur KO
+
+# Résultat d'une attaque : issue vaut None si le combat continue
+Coup = namedtuple("Coup", "attaque degats issue")
+# Résultat d'une région jouée d'un coup (combat automatique)
+BilanRegion = namedtuple("BilanRegion", "region issue ennemis_vaincus attaques degats_infliges degats_subis dernier_coup")
+
+# Entrées du journal d'un combat (JournalCombat.camps)
+TOUR_JOUEUR = 0   # indice = attaque du joueur, pv = PV de l'ennemi après le coup
+TOUR_ENNEMI = 1   # indice = attaque de l'ennemi, pv = PV du joueur après le coup
+ACHAT = 2         # indice = item dans charger_shop(région), degats = PV restaurés, pv = PV du joueur
+NOUVELLE_REGION = 3
+
+# Choix de l'attaque du joueur en combat automatique
+POLITIQUES = {
+    "max": "attaque la plus forte contre l'ennemi actuel",
+    "hasard": "attaque tirée au hasard",
+}
+
+
+def load_json(file):
+    with open(file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _figer(valeur):
+    """Copie en lecture seule d'une valeur JSON (dicts -> MappingProxyType, listes -> tuples)."""
+    if isinstance(valeur, dict):
+        return MappingProxyType({cle: _figer(v) for cle, v in valeur.items()})
+    if isinstance(valeur, list):
+        return tuple(_figer(v) for v in valeur)
+    return valeur
+
+
+@functools.lru_cache(maxsize=None)
+def modeles_ennemis(region):
+    """
+    Modèles (en lecture seule) des ennemis d'une région, lus une seule fois
+    par processus : modifier un fichier json/ennemies demande un redémarrage.
+    """
+    return tuple(_figer(e) for e in load_json(f"json/ennemies/{region}.json"))
+
+
+@functools.lru_cache(maxsize=None)
+def config_regions():
+    """Contenu de json/regions.json, lu une fois par processus."""
+    return _figer(load_json(FICHIER_REGIONS))
+
+
+def regions_disponibles():
+    """Régions jouables (actif dans json/regions.json), dans l'ordre du fichier."""
+    return tuple(nom for nom, region in config_regions()["regions"].items() if region.get("actif", True))
+
+
+class TableAlias:
+    """
+    Tirage pondéré en O(1) (méthode des alias de Vose) : la table est construite
+    une fois en O(n), chaque tirage coûte un seul nombre aléatoire.
+    """
+
+    def __init__(self, poids):
+        n = len(poids)
+        total = sum(poids)
+        if n == 0 or total <= 0:
+            raise ValueError("Table de tirage vide ou sans poids positif")
+        self.probas = array("d", (p * n / total for p in poids))
+        self.alias = array("l", range(n))
+        petits = [i for i, p in enumerate(self.probas) if p < 1]
+        grands = [i for i, p in enumerate(self.probas) if p >= 1]
+        while petits and grands:
+            petit, grand = petits.pop(), grands.pop()
+            self.alias[petit] = grand
+            self.probas[grand] -= 1 - self.probas[petit]
+            (petits if self.probas[grand] < 1 else grands).append(grand)
+        # Restes dus aux arrondis : probabilité 1
+        for i in petits + grands:
+            self.probas[i] = 1.0
+
+    def __len__(self):
+        return len(self.probas)
+
+    def tirer(self, rng):
+        """Indice tiré selon les poids."""
+        x = rng.random() * len(self.probas)
+        i = int(x)
+        return i if x - i < self.probas[i] else self.alias[i]
+
+
+class TableApparition:
+    """
+    Table d'apparition des ennemis d'une région, construite une fois (voir
+    table_apparition). Chaque ennemi peut avoir dans json/ennemies :
+
+    - "rarete" (défaut "commun") : les raretés se partagent les tirages selon
+      leurs poids (json/regions.json, "raretes"), quel que soit le nombre
+      d'ennemis de chaque rareté ;
+    - "poids" (défaut 1) : poids relatif parmi les ennemis de même rareté ;
+    - "difficulte" (défaut 1).
+
+    Les "bandes" de la région ([difficulté min, max], dans l'ordre) découpent la
+    file d'ennemis : les premiers ennemis sont tirés dans la première bande, les
+    derniers dans la dernière. Une bande sans ennemi reprend toute la région.
+    Une file ne contient jamais deux fois le même ennemi (tirage sans remise).
+    """
+
+    def __init__(self, region):
+        config = config_regions()
+        reglages = config["regions"].get(region, {})
+        raretes = reglages.get("raretes", config["raretes"])
+        self.modeles = modeles_ennemis(region)
+        self.par_nom = {modele["nom"]: modele for modele in self.modeles}
+        self.bandes = []
+        for bas, haut in reglages.get("bandes", ((float("-inf"), float("inf")),)):
+            modeles = [m for m in self.modeles if bas <= m.get("difficulte", 1) <= haut] or list(self.modeles)
+            self.bandes.append((tuple(modeles), TableAlias(_poids_apparition(modeles, raretes))))
+
+    def tirer(self, rng, position, nb, exclus=frozenset()):
+        """
+        Modèle de l'ennemi en `position` (0 à nb - 1) dans une file de `nb` ennemis,
+        hors des noms `exclus` (ennemis déjà dans la file).
+        """
+        modeles, alias = self.bandes[position * len(self.bandes) // nb]
+        # Un random() par essai ; un ennemi déjà tiré est rejeté
+        for _ in range(ESSAIS_TIRAGE):
+            i = alias.tirer(rng)
+            if modeles[i]["nom"] not in exclus:
+                return modeles[i]
+        # Bande presque épuisée : premier ennemi libre après le dernier tiré,
+        # sinon (bande épuisée) le premier libre de la région à partir d'un indice au hasard
+        modele = _premier_libre(modeles, i, exclus)
+        if modele is None:
+            modele = _premier_libre(self.modeles, rng.randrange(len(self.modeles)), exclus)
+        return modele
+
+    def file_ennemis(self, rng, nb):
+        """File de `nb` modèles distincts (nb <= len(self.modeles)), tirés sans remise."""
+        file = []
+        noms = set()
+        for position in range(nb):
+            modele = self.tirer(rng, position, nb, noms)
+            noms.add(modele["nom"])
+            file.append(modele)
+        return file
+
+
+def _premier_libre(modeles, depart, exclus):
+    """
+    Premier modèle hors de `exclus` en partant de `depart` (circulairement) ; None
+    s'il n'y en a pas. Au plus len(exclus) modèles sautés : le coût dépend de la
+    longueur de la file, pas de la taille de la région.
+    """
+    for pas in range(min(len(modeles), len(exclus) + 1)):
+        modele = modeles[(depart + pas) % len(modeles)]
+        if modele["nom"] not in exclus:
+            return modele
+    return None
+
+
+def _poids_apparition(modeles, raretes):
+    """Poids de chaque modèle : poids de sa rareté réparti entre les modèles de cette rareté, au prorata de leur "poids"."""
+    poids_rarete = {}
+    for m in modeles:
+        rarete = m.get("rarete", "commun")
+        poids_rarete[rarete] = poids_rarete.get(rarete, 0) + m.get("poids", 1)
+    return [
+        raretes.get(m.get("rarete", "commun"), 0) * m.get("poids", 1) / poids_rarete[m.get("rarete", "commun")]
+        for m in modeles
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def table_apparition(region):
+    """TableApparition de la région, construite une fois par processus."""
+    return TableApparition(region)
+
+
+class Ennemi:
+    """Ennemi en jeu : seuls ses PV lui sont propres, le reste est lu dans son modèle partagé."""
+
+    __slots__ = ("modele", "pv")
+
+    def __init__(self, modele, pv=None):
+        self.modele = modele
+        self.pv = modele["pv"] if pv is None else pv
+
+    def __getitem__(self, cle):
+        return self.pv if cle == "pv" else self.modele[cle]
+
+    def __setitem__(self, cle, valeur):
+        if cle != "pv":
+            raise TypeError(f"Seuls les PV d'un ennemi changent en combat (pas {cle!r})")
+        self.pv = valeur
+
+    def __contains__(self, cle):
+        return cle in self.modele
+
+    def get(self, cle, defaut=None):
+        return self.pv if cle == "pv" else self.modele.get(cle, defaut)
+
+
+def image_fond(region):
+    return f"images/fond/{region}.png"
+
+
+def charger_shop(region):
+    """Charge les items disponibles dans la boutique d'une région."""
+    try:
+        return load_json(f"json/shops/{region}.json")
+    except FileNotFoundError:
+        # Si pas de shop spécifique, charger le shop par défaut
+        return load_json("json/shops/default.json")
+
+
+def appliquer_achat(joueur, item):
+    """Applique l'effet d'un item du shop au joueur ; retourne les PV restaurés (potions)."""
+    if item['type'] == 'attaque':
+        # Ajouter la nouvelle attaque
+        joueur['attaques'].append(item['data'])
+
+    elif item['type'] == 'potion':
+        # Restaurer des PV sans dépasser le maximum
+        pv_avant = joueur['pv']
+        joueur['pv'] = min(joueur['pv'] + item['data']['heal'], joueur['pv_max'])
+        return joueur['pv'] - pv_avant
+
+    elif item['type'] == 'stat':
+        # Augmenter la stat
+        stat = item['data']['stat']
+        value = item['data']['value']
+        joueur[stat] += value
+
+        # Si c'est pv_max, augmenter les PV actuels de la même valeur
+        # mais NE PAS restaurer à 100%
+        if stat == 'pv_max':
+            joueur['pv'] = min(joueur['pv'] + value, joueur['pv_max'])
+    return 0
+
+
+# Attaque réduite à des nombres : ratios déjà divisés par 100, type remplacé par un code
+AttaqueCompilee = namedtuple("AttaqueCompilee", "nom degats ratio_attk ratio_magie type_code")
+BRUT, PHYSIQUE, MAGIQUE, HYBRIDE = 0, 1, 2, 3
+CODES_TYPE = {"physique": PHYSIQUE, "magique": MAGIQUE, "hybride": HYBRIDE}
+
+
+def compiler_attaque(attaque):
+    return AttaqueCompilee(
+        attaque["nom"],
+        attaque["degats"],
+        attaque.get("ratioattk", 0) / 100,
+        attaque.get("ratiomagie", 0) / 100,
+        CODES_TYPE.get(attaque["type"], BRUT),
+    )
+
+
+def multiplicateurs(defenseur):
+    """Part des dégâts qui passe l'armure du défenseur, pour chaque code de type."""
+    armure = defenseur.get("armure", 0)
+    armure_magique = defenseur.get("armure_magique", 0)
+    return (
+        1,
+        1 - armure / 100,
+        1 - armure_magique / 100,
+        1 - (armure + armure_magique) / 2 / 100,
+    )
+
+
+def degats_compiles(attaque, force, magie, multiplicateurs_defenseur):
+    """Dégâts d'une AttaqueCompilee (mêmes calculs, dans le même ordre, que calcul_degats)."""
+    degats = attaque.degats + force * attaque.ratio_attk + magie * attaque.ratio_magie
+    if attaque.type_code != BRUT:
+        degats *= multiplicateurs_defenseur[attaque.type_code]
+    return max(1, int(degats))
+
+
+def calcul_degats(attaque, attaquant, defenseur):
+    """Calcule les dégâts d'une attaque en prenant en compte les ratios force/magie et les armures."""
+    return degats_compiles(
+        compiler_attaque(attaque),
+        attaquant.get("force", 0),
+        attaquant.get("magie", 0),
+        multiplicateurs(defenseur),
+    )
+
+
+class TableDegats:
+    """
+    Dégâts de chaque attaque d'un attaquant contre un défenseur. La table est
+    recalculée seulement quand les stats qui comptent changent (achat au shop,
+    nouvelle attaque) : un tour de combat ne fait plus qu'une lecture de dict.
+    """
+
+    def __init__(self, attaquant, defenseur):
+        self.attaquant = attaquant
+        self.defenseur = defenseur
+        self._signature = None
+        self._degats = {}
+
+    def _signature_actuelle(self):
+        a, d = self.attaquant, self.defenseur
+        return (a.get("force", 0), a.get("magie", 0), len(a["attaques"]),
+                d.get("armure", 0), d.get("armure_magique", 0))
+
+    def degats(self):
+        """Retourne {nom de l'attaque: dégâts}."""
+        signature = self._signature_actuelle()
+        if signature != self._signature:
+            force, magie, _, _, _ = signature
+            mult = multiplicateurs(self.defenseur)
+            self._degats = {
+                a["nom"]: degats_compiles(compiler_attaque(a), force, magie, mult)
+                for a in self.attaquant["attaques"]
+            }
+            self._signature = signature
+        return self._degats
+
+
+_MASQUE_64 = (1 << 64) - 1
+_PAS_SPLITMIX = 0x9E3779B97F4A7C15
+
+
+class TiragesRejouables:
+    """
+    Tirages pseudo-aléatoires dont l'état tient en deux entiers : le n-ième
+    tirage ne dépend que de (graine, n). Un combat évincé reprend ses tirages où
+    il s'était arrêté et un journal se rejoue à l'identique.
+
+    Générateur à compteur (SplitMix64) : chaque tirage mélange graine + n * pas
+    en quelques opérations entières, sans recréer de random.Random.
+    """
+
+    def __init__(self, graine, tirages=0):
+        self.graine = graine
+        self.tirages = tirages
+
+    def _suivant(self):
+        """Entier de 64 bits du tirage suivant."""
+        self.tirages += 1
+        z = (self.graine + self.tirages * _PAS_SPLITMIX) & _MASQUE_64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASQUE_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASQUE_64
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self._suivant() >> 11) * (1.0 / (1 << 53))
+
+    def randrange(self, n):
+        # Multiplication puis décalage : biais < n / 2**64, négligeable ici
+        return (self._suivant() * n) >> 64
+
+    def choice(self, sequence):
+        return sequence[self.randrange(len(sequence))]
+
+    def sample(self, population, k):
+        # Fisher-Yates partiel : k tirages
+        elements = list(population)
+        for i in range(k):
+            j = i + self.randrange(len(elements) - i)
+            elements[i], elements[j] = elements[j], elements[i]
+        return elements[:k]
+
+
+class JournalCombat:
+    """
+    Journal des tours d'un combat : quatre tableaux parallèles (array) plutôt
+    qu'une liste de dicts, avec ce qu'il faut pour le rejouer (graine, paramètres
+    et joueur de départ).
+    """
+
+    def __init__(self, graine, joueur, nb_regions, nb_ennemis):
+        self.graine = graine
+        self.joueur = copy.deepcopy(joueur)
+        self.nb_regions = nb_regions
+        self.nb_ennemis = nb_ennemis
+        self.camps = array("b")
+        self.indices = array("h")
+        self.degats = array("i")
+        self.pv = array("i")
+
+    def __len__(self):
+        return len(self.camps)
+
+    def __iter__(self):
+        return zip(self.camps, self.indices, self.degats, self.pv)
+
+    def ajouter(self, camp, indice=0, degats=0, pv=0):
+        self.camps.append(camp)
+        self.indices.append(indice)
+        self.degats.append(degats)
+        self.pv.append(pv)
+
+    def exporter(self):
+        """Dict sérialisable en JSON (voir restaurer)."""
+        return {
+            "graine": self.graine,
+            "joueur": self.joueur,
+            "nb_regions": self.nb_regions,
+            "nb_ennemis": self.nb_ennemis,
+            "camps": self.camps.tolist(),
+            "indices": self.indices.tolist(),
+            "degats": self.degats.tolist(),
+            "pv": self.pv.tolist(),
+        }
+
+    @classmethod
+    def restaurer(cls, donnees):
+        journal = cls(donnees["graine"], donnees["joueur"], donnees["nb_regions"], donnees["nb_ennemis"])
+        for nom in ("camps", "indices", "degats", "pv"):
+            getattr(journal, nom).extend(donnees[nom])
+        return journal
+
+
+def joueur_commence(joueur, ennemi):
+    """Le plus rapide attaque en premier (le joueur en cas d'égalité)."""
+    return joueur["vitesse"] >= ennemi["vitesse"]
+
+
+class MoteurCombat:
+    """
+    État et règles d'une aventure : régions, file d'ennemis, tours et dégâts.
+
+    Sans `rng`, le combat tire ses propres nombres (TiragesRejouables à partir de
+    `graine`, aléatoire par défaut) et tient son journal. Avec un `rng` fourni
+    (simulateur), pas de journal.
+    """
+
+    def __init__(self, joueur, nb_regions=3, nb_ennemis_par_region=10, rng=None, etat=None, graine=None):
+        self.joueur = joueur
+        self.rng = rng
+        self.journal = None
+        if etat is not None:
+            self.restaurer_etat(etat)
+        else:
+            if rng is None:
+                graine = secrets.randbits(32) if graine is None else graine
+                self.rng = TiragesRejouables(graine)
+                self.journal = JournalCombat(graine, joueur, nb_regions, nb_ennemis_par_region)
+            self.nb_ennemis_par_region = nb_ennemis_par_region
+            regions = regions_disponibles()
+            self.regions_queue = self.rng.sample(regions, k=min(nb_regions, len(regions)))
+            self.region_suivante()
+
+    @property
+    def image_fond(self):
+        return image_fond(self.region)
+
+    def region_suivante(self):
+        """Passe à la région suivante et tire ses ennemis."""
+        self._noter(NOUVELLE_REGION)
+        self.region = self.regions_queue.pop(0)
+        # La file ne contient que des références aux modèles ; l'ennemi est créé à son entrée
+        table = table_apparition(self.region)
+        self.ennemis_queue = table.file_ennemis(self.rng, min(self.nb_ennemis_par_region, len(table.modeles)))
+        self.ennemi_suivant()
+
+    def ennemi_suivant(self):
+        """Fait entrer le prochain ennemi de la région."""
+        self.ennemi = Ennemi(self.ennemis_queue.pop(0))
+        self.tour_joueur = joueur_commence(self.joueur, self.ennemi)
+        self._nouvel_affrontement()
+
+    def _nouvel_affrontement(self):
+        self.table_joueur = TableDegats(self.joueur, self.ennemi)
+        self.table_ennemi = TableDegats(self.ennemi, self.joueur)
+
+    def _noter(self, camp, indice=0, degats=0, pv=0):
+        if self.journal is not None:
+            self.journal.ajouter(camp, indice, degats, pv)
+
+    def degats_attaques(self):
+        """{attaque du joueur: dégâts contre l'ennemi actuel}."""
+        return self.table_joueur.degats()
+
+    def attaque_joueur(self, nom_attaque):
+        """Le joueur utilise une de ses attaques ; retourne un Coup."""
+        indice, attaque = next((i, a) for i, a in enumerate(self.joueur["attaques"]) if a["nom"] == nom_attaque)
+        degats = self.table_joueur.degats()[nom_attaque]
+        self.ennemi["pv"] -= degats
+        self._noter(TOUR_JOUEUR, indice, degats, self.ennemi["pv"])
+
+        if self.ennemi["pv"] > 0:
+            self.tour_joueur = False
+            return Coup(attaque, degats, None)
+        if self.ennemis_queue:
+            self.ennemi_suivant()
+            return Coup(attaque, degats, ENNEMI_VAINCU)
+        return Coup(attaque, degats, REGION_TERMINEE if self.regions_queue else VICTOIRE)
+
+    def attaque_ennemi(self):
+        """L'ennemi utilise une attaque au hasard ; retourne un Coup."""
+        indice = self.rng.randrange(len(self.ennemi["attaques"]))
+        attaque = self.ennemi["attaques"][indice]
+        degats = self.table_ennemi.degats()[attaque["nom"]]
+        self.joueur["pv"] -= degats
+        self._noter(TOUR_ENNEMI, indice, degats, self.joueur["pv"])
+
+        if self.joueur["pv"] <= 0:
+            return Coup(attaque, degats, DEFAITE)
+        self.tour_joueur = True
+        return Coup(attaque, degats, None)
+
+    def acheter(self, item):
+        """Achat dans le shop de la région en cours (journalisé) ; retourne les PV restaurés."""
+        pv_restaures = appliquer_achat(self.joueur, item)
+        if self.journal is not None:
+            indice = next(i for i, it in enumerate(charger_shop(self.region)) if it["nom"] == item["nom"])
+            self.journal.ajouter(ACHAT, indice, pv_restaures or 0, self.joueur["pv"])
+        return pv_restaures
+
+    def choisir_attaque(self, politique="max"):
+        """Nom de l'attaque que jouerait le joueur selon la politique (voir POLITIQUES)."""
+        if politique == "hasard":
+            return self.rng.choice(self.joueur["attaques"])["nom"]
+        degats = self.degats_attaques()
+        return max(degats, key=degats.get)
+
+    def resoudre_region(self, politique="max"):
+        """
+        Joue la région en cours jusqu'au dernier ennemi ou jusqu'à la défaite,
+        sans affichage ; retourne un BilanRegion (issue : REGION_TERMINEE,
+        VICTOIRE ou DEFAITE).
+        """
+        region = self.region
+        vaincus = []
+        attaques = infliges = subis = 0
+        attaques_ennemi = 0
+        while True:
+            if not self.tour_joueur:
+                coup = self.attaque_ennemi()
+                subis += coup.degats
+                if coup.issue == DEFAITE:
+                    return BilanRegion(region, DEFAITE, vaincus, attaques, infliges, subis, coup)
+                continue
+
+            nom_ennemi = self.ennemi["nom"]
+            coup = self.attaque_joueur(self.choisir_attaque(politique))
+            attaques += 1
+            attaques_ennemi += 1
+            infliges += coup.degats
+            if coup.issue is None:
+                continue
+            vaincus.append((nom_ennemi, attaques_ennemi))
+            attaques_ennemi = 0
+            if coup.issue != ENNEMI_VAINCU:
+                return BilanRegion(region, coup.issue, vaincus, attaques, infliges, subis, coup)
+
+    def exporter_etat(self):
+        """Retourne l'état compact du combat (le joueur, lui, est déjà en base)."""
+        return {
+            "nb_ennemis": self.nb_ennemis_par_region,
+            "region": self.region,
+            "regions": list(self.regions_queue),
+            "ennemi": [self.ennemi["nom"], self.ennemi["pv"]],
+            "ennemis": [e["nom"] for e in self.ennemis_queue],
+            "tour_joueur": self.tour_joueur,
+            # Tirages et journal : le combat repris reste rejouable
+            "tirages": [self.rng.graine, self.rng.tirages] if self.journal is not None else None,
+            "journal": self.journal.exporter() if self.journal is not None else None,
+        }
+
+    def restaurer_etat(self, etat):
+        """Reconstruit le combat à partir de l'état produit par exporter_etat."""
+        self.nb_ennemis_par_region = etat["nb_ennemis"]
+        self.region = etat["region"]
+        self.regions_queue = list(etat["regions"])
+
+        region_enemies = table_apparition(self.region).par_nom
+        nom_ennemi, pv_ennemi = etat["ennemi"]
+        self.ennemi = Ennemi(region_enemies[nom_ennemi], pv_ennemi)
+        self.ennemis_queue = [region_enemies[nom] for nom in etat["ennemis"] if nom in region_enemies]
+        self.tour_joueur = etat["tour_joueur"]
+        if etat.get("journal") is not None:
+            self.rng = TiragesRejouables(*etat["tirages"])
+            self.journal = JournalCombat.restaurer(etat["journal"])
+        elif self.rng is None:
+            # Combat évincé avant l'existence des journaux : nouveaux tirages, pas de replay possible
+            self.rng = TiragesRejouables(secrets.randbits(32))
+        self._nouvel_affrontement()
+
+
+def simuler_lot(joueur, ennemis, nb_combats, politique="max", rng=None, max_tours=1000):
+    """
+    Joue `nb_combats` aventures indépendantes : le joueur affronte les ennemis
+    de la liste dans l'ordre, ses PV étant conservés d'un ennemi à l'autre.
+
+    - politique : "max" (le joueur prend l'attaque la plus forte contre l'ennemi)
+      ou "hasard" (attaque tirée au hasard) ; l'ennemi tire toujours au hasard
+    - rng : numpy.random.Generator (pour des résultats reproductibles)
+
+    Retourne un dict de tableaux NumPy de taille nb_combats :
+    victoire, ennemis_vaincus, pv_restants, tours (attaques du joueur) et
+    tours_par_ennemi (nb_combats x len(ennemis), -1 si l'ennemi n'a pas été affronté).
+    """
+    import numpy as np
+
+    rng = rng if rng is not None else np.random.default_rng()
+    nb_ennemis = len(ennemis)
+
+    # Les dégâts ne dépendent que des stats : une table par ennemi, calculée une fois
+    degats_joueur = [np.array([calcul_degats(a, joueur, e) for a in joueur["attaques"]]) for e in ennemis]
+    degats_ennemi = [np.array([calcul_degats(a, e, joueur) for a in e["attaques"]]) for e in ennemis]
+
+    pv = np.full(nb_combats, joueur["pv"], dtype=np.int64)
+    encore = np.ones(nb_combats, dtype=bool)  # aventure toujours en cours
+    vaincus = np.zeros(nb_combats, dtype=np.int64)
+    tours = np.zeros(nb_combats, dtype=np.int64)
+    tours_par_ennemi = np.full((nb_combats, nb_ennemis), -1, dtype=np.int64)
+
+    for e, ennemi in enumerate(ennemis):
+        # Seuls les joueurs qui ont vaincu l'ennemi précédent affrontent le suivant
+        combats = np.flatnonzero(encore)
+        if combats.size == 0:
+            break
+        pv_joueur = pv[combats]
+        pv_ennemi = np.full(combats.size, ennemi["pv"], dtype=np.int64)
+        tour_joueur = np.full(combats.size, joueur_commence(joueur, ennemi))
+        nb_tours = np.zeros(combats.size, dtype=np.int64)
+
+        en_cours = np.arange(combats.size)
+        for _ in range(max_tours * 2):
+            if en_cours.size == 0:
+                break
+            attaquent = en_cours[tour_joueur[en_cours]]
+            subissent = en_cours[~tour_joueur[en_cours]]
+
+            if politique == "max":
+                pv_ennemi[attaquent] -= degats_joueur[e].max()
+            else:
+                pv_ennemi[attaquent] -= degats_joueur[e][rng.integers(len(degats_joueur[e]), size=attaquent.size)]
+            nb_tours[attaquent] += 1
+            pv_joueur[subissent] -= degats_ennemi[e][rng.integers(len(degats_ennemi[e]), size=subissent.size)]
+
+            tour_joueur[en_cours] = ~tour_joueur[en_cours]
+            en_cours = en_cours[(pv_ennemi[en_cours] > 0) & (pv_joueur[en_cours] > 0)]
+
+        pv[combats] = pv_joueur
+        gagne = pv_ennemi <= 0
+        vaincus[combats[gagne]] += 1
+        encore[combats[~gagne]] = False
+        tours[combats] += nb_tours
+        tours_par_ennemi[combats, e] = nb_tours
+
+    return {
+        "victoire": vaincus == nb_ennemis,
+        "ennemis_vaincus": vaincus,
+        "pv_restants": np.maximum(pv, 0),
+        "tours": tours,
+        "tours_par_ennemi": tours_par_ennemi,
+    }
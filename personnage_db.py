@@ -1,49 +1,111 @@
 import os
-import psycopg2
+import copy
 import json
-from psycopg2.extras import Json
+import threading
 from dotenv import load_dotenv
 
+from cache import CacheLRU, ABSENT
+from metriques import Metriques
+
 # Charge les variables d'environnement
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Connexion globale à la base
-conn = psycopg2.connect(DATABASE_URL, sslmode="require")
-cur = conn.cursor()
-
-# Création de la table personnages avec description
-cur.execute("""
-CREATE TABLE IF NOT EXISTS personnages (
-    user_id TEXT PRIMARY KEY,
-    race TEXT NOT NULL,
-    nom TEXT NOT NULL,
-    description TEXT,
-    pv INTEGER NOT NULL,
-    pv_max INTEGER NOT NULL,
-    vitesse INTEGER NOT NULL,
-    force INTEGER NOT NULL,
-    magie INTEGER NOT NULL,
-    armure INTEGER NOT NULL,
-    armure_magique INTEGER NOT NULL,
-    image TEXT NOT NULL,
-    attaques JSONB NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-""")
-conn.commit()
-
-# Ajouter la colonne description si elle n'existe pas déjà
-try:
-    cur.execute("""
-        ALTER TABLE personnages 
-        ADD COLUMN IF NOT EXISTS description TEXT;
-    """)
-    conn.commit()
-except Exception as e:
-    print(f"Info: {e}")
-    conn.rollback()
+# ===== CONFIGURATION DU STOCKAGE =====
+# "postgres" (production) ou "sqlite" (tests de charge / benchmarks sans serveur)
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+# Fichier de la base SQLite (":memory:" pour une base en mémoire)
+SQLITE_PATH = os.getenv("SQLITE_PATH", ":memory:")
+# Applique les migrations à la première connexion (activé par défaut pour SQLite)
+DB_MIGRATION_AUTO = os.getenv("DB_MIGRATION_AUTO", "1" if DB_BACKEND == "sqlite" else "0") == "1"
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Une connexion inutilisée depuis plus longtemps est vérifiée (SELECT 1) avant d'être réutilisée
+DB_HEALTHCHECK_IDLE = float(os.getenv("DB_HEALTHCHECK_IDLE", "30"))
+# Requêtes préparées côté serveur (PREPARE/EXECUTE) pour PostgreSQL
+DB_PREPARE = os.getenv("DB_PREPARE", "1") == "1"
+# Cache des personnages : nombre d'entrées et durée de vie (secondes)
+CACHE_PERSONNAGES_TAILLE = int(os.getenv("CACHE_PERSONNAGES_TAILLE", "1000"))
+CACHE_PERSONNAGES_TTL = float(os.getenv("CACHE_PERSONNAGES_TTL", "300"))
+# Les requêtes plus longues (millisecondes) sont affichées dans la console
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# =====================================
+
+# Stockage créé à la première requête (l'import ne touche pas la base)
+_stockage = None
+_stockage_verrou = threading.Lock()
+
+# Latences, lignes et temps de commit de chaque requête nommée
+metriques_db = Metriques("SQL", seuil_lent=DB_SLOW_QUERY_MS / 1000)
+
+# user_id -> personnage (ou None si l'utilisateur n'a pas de personnage)
+_cache = CacheLRU(taille_max=CACHE_PERSONNAGES_TAILLE, ttl=CACHE_PERSONNAGES_TTL)
+# user_id -> nombre d'écritures : une lecture commencée avant une écriture ne remplit pas le cache
+_generations = {}
+_generations_verrou = threading.Lock()
+
+
+def _creer_stockage():
+    """Instancie le stockage choisi par DB_BACKEND."""
+    if DB_BACKEND == "postgres":
+        from stockage_postgres import StockagePostgres
+        return StockagePostgres(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_HEALTHCHECK_IDLE, DB_PREPARE)
+    if DB_BACKEND == "sqlite":
+        from stockage_sqlite import StockageSqlite
+        return StockageSqlite(SQLITE_PATH)
+    raise ValueError(f"DB_BACKEND inconnu : {DB_BACKEND}")
+
+
+def stockage():
+    """Retourne le stockage actif, créé (et migré si DB_MIGRATION_AUTO) au premier appel."""
+    global _stockage
+    if _stockage is None:
+        with _stockage_verrou:
+            if _stockage is None:
+                nouveau = _creer_stockage()
+                nouveau.metriques = metriques_db
+                if DB_MIGRATION_AUTO:
+                    import migrations
+                    migrations.migrate(nouveau)
+                _stockage = nouveau
+    return _stockage
+
+
+def transaction():
+    """Ouvre un curseur dans une transaction, validée à la sortie du bloc (annulée en cas d'erreur)."""
+    return stockage().transaction()
+
+
+def _executer(sql, params=(), fetch=None, nom=None):
+    """Exécute une requête sur le stockage actif et la valide.
+
+    `nom` identifie une requête fixe : le stockage peut alors la préparer une
+    fois par connexion (PREPARE/EXECUTE côté PostgreSQL).
+    """
+    return stockage().executer(sql, params, fetch, nom)
+
+
+def _json(valeur):
+    return stockage().json(valeur)
+
+
+def _lire_json(valeur):
+    return stockage().lire_json(valeur)
+
+
+def verifier_sante():
+    """Retourne True si la base répond."""
+    return stockage().verifier_sante()
+
+
+def fermer():
+    """Ferme les connexions à la base (arrêt du bot)."""
+    global _stockage
+    with _stockage_verrou:
+        if _stockage is not None:
+            _stockage.fermer()
+            _stockage = None
+        _cache.vider()
 
 
 def charger_personnages_base():
@@ -52,15 +114,34 @@ def charger_personnages_base():
         return json.load(f)
 
 
+# Colonnes écrites par update_personnage_stats
+COLONNES_STATS = ("pv", "pv_max", "vitesse", "force", "magie", "armure", "armure_magique")
+# Colonnes qu'une sauvegarde partielle a le droit de modifier
+COLONNES_MODIFIABLES = ("pv", "pv_max", "vitesse", "force", "magie", "armure", "armure_magique", "attaques")
+
+
 def get_personnage(user_id):
-    """Récupère le personnage d'un utilisateur depuis la base de données."""
-    cur.execute("""
+    """Récupère le personnage d'un utilisateur (depuis le cache ou la base de données)."""
+    perso = _cache.get(user_id)
+    if perso is ABSENT:
+        generation = _generations.get(user_id, 0)
+        perso = _lire_personnage(user_id)
+        with _generations_verrou:
+            # Écriture validée pendant la lecture : la ligne lue est peut-être déjà périmée
+            if _generations.get(user_id, 0) == generation:
+                _cache.set(user_id, perso)
+    # Les appelants modifient le dict (combat, shop) : on ne leur donne jamais l'entrée du cache
+    return copy.deepcopy(perso)
+
+
+def _lire_personnage(user_id):
+    """Lit le personnage d'un utilisateur dans la base de données."""
+    result = _executer("""
         SELECT race, nom, description, pv, pv_max, vitesse, force, magie, armure, armure_magique, image, attaques
         FROM personnages
         WHERE user_id = %s
-    """, (user_id,))
-    
-    result = cur.fetchone()
+    """, (user_id,), fetch="one", nom="get_personnage")
+
     if result:
         return {
             "race": result[0],
@@ -74,20 +155,24 @@ def get_personnage(user_id):
             "armure": result[8],
             "armure_magique": result[9],
             "image": result[10],
-            "attaques": result[11]
+            "attaques": _lire_json(result[11])
         }
     return None
 
 
 def creer_personnage(user_id, personnage_base):
-    """Crée un nouveau personnage pour un utilisateur à partir d'un personnage de base."""
-    cur.execute("""
+    """Crée un nouveau personnage à partir d'un personnage de base.
+
+    Retourne False si l'utilisateur avait déjà un personnage (rien n'est modifié).
+    """
+    result = _executer("""
         INSERT INTO personnages (
             user_id, race, nom, description, pv, pv_max, vitesse, force, magie, 
             armure, armure_magique, image, attaques
         )
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (user_id) DO NOTHING
+        RETURNING user_id
     """, (
         user_id,
         personnage_base["race"],
@@ -101,24 +186,35 @@ def creer_personnage(user_id, personnage_base):
         personnage_base["armure"],
         personnage_base["armure_magique"],
         personnage_base["image"],
-        Json(personnage_base["attaques"])
-    ))
-    conn.commit()
+        _json(personnage_base["attaques"])
+    ), fetch="one", nom="creer_personnage")
+
+    if result is None:
+        # Conflit : le personnage existant n'a pas été touché, on le relira si besoin
+        _ecrire_cache(user_id, ABSENT)
+        return False
+    # La ligne vient d'être écrite avec ces valeurs : inutile de la relire
+    _ecrire_cache(user_id, {
+        **{c: personnage_base[c] for c in ("race", "nom", "image") + COLONNES_MODIFIABLES},
+        "description": personnage_base.get("description", ""),
+        "attaques": copy.deepcopy(personnage_base["attaques"]),
+    })
+    return True
 
 
 def update_personnage_pv(user_id, pv):
     """Met à jour les PV du personnage."""
-    cur.execute("""
+    _executer("""
         UPDATE personnages
         SET pv = %s, updated_at = CURRENT_TIMESTAMP
         WHERE user_id = %s
-    """, (pv, user_id))
-    conn.commit()
+    """, (pv, user_id), nom="update_personnage_pv")
+    _mettre_a_jour_cache(user_id, {"pv": pv})
 
 
 def update_personnage_stats(user_id, personnage):
     """Met à jour toutes les statistiques du personnage."""
-    cur.execute("""
+    _executer("""
         UPDATE personnages
         SET pv = %s,
             pv_max = %s,
@@ -138,62 +234,137 @@ def update_personnage_stats(user_id, personnage):
         personnage['armure'],
         personnage['armure_magique'],
         user_id
-    ))
-    conn.commit()
+    ), nom="update_personnage_stats")
+    _mettre_a_jour_cache(user_id, {c: personnage[c] for c in COLONNES_STATS})
 
 
 def update_personnage_attaques(user_id, attaques):
     """Met à jour les attaques du personnage."""
-    cur.execute("""
+    _executer("""
         UPDATE personnages
         SET attaques = %s, updated_at = CURRENT_TIMESTAMP
         WHERE user_id = %s
-    """, (Json(attaques), user_id))
-    conn.commit()
+    """, (_json(attaques), user_id), nom="update_personnage_attaques")
+    _mettre_a_jour_cache(user_id, {"attaques": attaques})
+
+
+def update_personnage_champs(user_id, champs):
+    """Met à jour en une seule requête uniquement les champs fournis."""
+    colonnes = [c for c in COLONNES_MODIFIABLES if c in champs]
+    if not colonnes:
+        return
+    affectations = ", ".join(f"{c} = %s" for c in colonnes)
+    valeurs = [_json(champs[c]) if c == "attaques" else champs[c] for c in colonnes]
+    _executer(f"""
+        UPDATE personnages
+        SET {affectations}, updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = %s
+    """, (*valeurs, user_id), nom="update_champs_" + "_".join(colonnes))
+    _mettre_a_jour_cache(user_id, {c: champs[c] for c in colonnes})
 
 
 def reset_personnage_pv(user_id):
-    """Restaure les PV du personnage à leur maximum."""
-    cur.execute("""
+    """Restaure les PV du personnage à leur maximum et retourne les nouveaux PV (None si absent)."""
+    result = _executer("""
         UPDATE personnages
         SET pv = pv_max, updated_at = CURRENT_TIMESTAMP
         WHERE user_id = %s
-    """, (user_id,))
-    conn.commit()
+        RETURNING pv
+    """, (user_id,), fetch="one", nom="reset_personnage_pv")
+    if result is None:
+        _ecrire_cache(user_id, None)
+        return None
+    _mettre_a_jour_cache(user_id, {"pv": result[0]})
+    return result[0]
 
 
 def supprimer_personnage(user_id):
-    """Supprime le personnage d'un utilisateur."""
-    cur.execute("DELETE FROM personnages WHERE user_id = %s", (user_id,))
-    conn.commit()
+    """Supprime le personnage d'un utilisateur (et son combat évincé éventuel).
+
+    Retourne {"nom", "race"} du personnage supprimé, ou None s'il n'y en avait pas.
+    """
+    result = _executer("""
+        DELETE FROM personnages
+        WHERE user_id = %s
+        RETURNING nom, race
+    """, (user_id,), fetch="one", nom="supprimer_personnage")
+    _ecrire_cache(user_id, None)
+    if result is None:
+        return None
+    return {"nom": result[0], "race": result[1]}
 
 
 def personnage_existe(user_id):
     """Vérifie si un utilisateur a déjà un personnage."""
-    cur.execute("SELECT 1 FROM personnages WHERE user_id = %s", (user_id,))
-    return cur.fetchone() is not None
+    # Lit la ligne complète : le get_personnage qui suit presque toujours sera servi par le cache
+    return get_personnage(user_id) is not None
 
 
 def get_stats_personnage(user_id):
     """Récupère uniquement les statistiques du personnage (sans les attaques)."""
-    cur.execute("""
-        SELECT race, nom, description, pv, pv_max, vitesse, force, magie, armure, armure_magique
-        FROM personnages
-        WHERE user_id = %s
-    """, (user_id,))
-    
-    result = cur.fetchone()
-    if result:
-        return {
-            "race": result[0],
-            "nom": result[1],
-            "description": result[2] or "",
-            "pv": result[3],
-            "pv_max": result[4],
-            "vitesse": result[5],
-            "force": result[6],
-            "magie": result[7],
-            "armure": result[8],
-            "armure_magique": result[9]
-        }
-    return None
\ No newline at end of file
+    perso = get_personnage(user_id)
+    if perso:
+        return {c: perso[c] for c in (
+            "race", "nom", "description", "pv", "pv_max", "vitesse",
+            "force", "magie", "armure", "armure_magique"
+        )}
+    return None
+
+
+def sauver_session_combat(user_id, etat):
+    """Enregistre l'état compact d'un combat évincé de la mémoire."""
+    _executer("""
+        INSERT INTO combat_sessions (user_id, etat)
+        VALUES (%s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+        SET etat = EXCLUDED.etat, updated_at = CURRENT_TIMESTAMP
+    """, (user_id, _json(etat)), nom="sauver_session_combat")
+
+
+def reprendre_session_combat(user_id, session_id):
+    """
+    Récupère et supprime en une requête l'état du combat évincé `session_id`
+    (None s'il n'y en a pas, ou si le combat évincé du joueur en est un autre :
+    son état est alors gardé).
+    """
+    result = _executer("""
+        DELETE FROM combat_sessions
+        WHERE user_id = %s AND etat->>'session_id' = %s
+        RETURNING etat
+    """, (user_id, session_id), fetch="one", nom="reprendre_session_combat")
+    return _lire_json(result[0]) if result else None
+
+
+def _ecrire_cache(user_id, valeur):
+    """
+    Après une écriture validée : remplace l'entrée du cache (ABSENT = l'invalide)
+    et compte l'écriture, pour qu'une lecture en cours ne remette pas l'ancienne ligne.
+    """
+    with _generations_verrou:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        if valeur is ABSENT:
+            _cache.invalider(user_id)
+        else:
+            _cache.set(user_id, valeur)
+
+
+def _mettre_a_jour_cache(user_id, champs):
+    """Répercute une écriture sur l'entrée du cache, si elle existe (write-through)."""
+    with _generations_verrou:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        perso = _cache.get(user_id, compter=False)
+        # ABSENT (entrée expirée ou jamais lue) : rien à mettre à jour ; None : pas de personnage
+        if perso is not ABSENT and perso:
+            perso = dict(perso)
+            perso.update(copy.deepcopy(champs))
+            _cache.set(user_id, perso)
+
+
+def stats_requetes():
+    """Retourne les mesures par requête (appels, p50/p95/p99, lignes, commit)."""
+    return metriques_db.stats()
+
+
+def stats_cache():
+    """Retourne les compteurs du cache des personnages (hits, misses...)."""
+    return _cache.stats()
@@ -0,0 +1,94 @@
+"""Variantes asynchrones de personnage_db, utilisables depuis les callbacks discord.py.
+
+Chaque fonction exécute la requête bloquante psycopg2 dans un pool de threads
+dimensionné comme le pool de connexions : la boucle d'événements n'attend jamais
+la base, et plusieurs combats peuvent interroger la base en parallèle.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import personnage_db
+
+# Autant de threads que de connexions : un thread ne reste jamais bloqué sur le pool
+_executor = ThreadPoolExecutor(max_workers=personnage_db.DB_POOL_MAX, thread_name_prefix="db")
+
+
+async def _lancer(fonction, *args):
+    """Exécute une fonction de personnage_db hors de la boucle d'événements."""
+    loop = asyncio.get_running_loop()
+    # Copie du contexte : les mesures restent attribuées à la commande en cours
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, fonction, *args))
+
+
+async def get_personnage(user_id):
+    """Récupère le personnage d'un utilisateur depuis la base de données."""
+    return await _lancer(personnage_db.get_personnage, user_id)
+
+
+async def creer_personnage(user_id, personnage_base):
+    """Crée un nouveau personnage ; retourne False si l'utilisateur en avait déjà un."""
+    return await _lancer(personnage_db.creer_personnage, user_id, personnage_base)
+
+
+async def update_personnage_pv(user_id, pv):
+    """Met à jour les PV du personnage."""
+    return await _lancer(personnage_db.update_personnage_pv, user_id, pv)
+
+
+async def update_personnage_stats(user_id, personnage):
+    """Met à jour toutes les statistiques du personnage."""
+    return await _lancer(personnage_db.update_personnage_stats, user_id, personnage)
+
+
+async def update_personnage_attaques(user_id, attaques):
+    """Met à jour les attaques du personnage."""
+    return await _lancer(personnage_db.update_personnage_attaques, user_id, attaques)
+
+
+async def update_personnage_champs(user_id, champs):
+    """Met à jour en une seule requête uniquement les champs fournis."""
+    return await _lancer(personnage_db.update_personnage_champs, user_id, champs)
+
+
+async def reset_personnage_pv(user_id):
+    """Restaure les PV du personnage à leur maximum et retourne les nouveaux PV (None si absent)."""
+    return await _lancer(personnage_db.reset_personnage_pv, user_id)
+
+
+async def supprimer_personnage(user_id):
+    """Supprime le personnage d'un utilisateur ; retourne {"nom", "race"} ou None."""
+    return await _lancer(personnage_db.supprimer_personnage, user_id)
+
+
+async def personnage_existe(user_id):
+    """Vérifie si un utilisateur a déjà un personnage."""
+    return await _lancer(personnage_db.personnage_existe, user_id)
+
+
+async def get_stats_personnage(user_id):
+    """Récupère uniquement les statistiques du personnage (sans les attaques)."""
+    return await _lancer(personnage_db.get_stats_personnage, user_id)
+
+
+async def sauver_session_combat(user_id, etat):
+    """Enregistre l'état compact d'un combat évincé de la mémoire."""
+    return await _lancer(personnage_db.sauver_session_combat, user_id, etat)
+
+
+async def reprendre_session_combat(user_id, session_id):
+    """Récupère et supprime en une requête l'état du combat évincé `session_id` (None s'il n'y en a pas)."""
+    return await _lancer(personnage_db.reprendre_session_combat, user_id, session_id)
+
+
+async def verifier_sante():
+    """Retourne True si la base répond."""
+    return await _lancer(personnage_db.verifier_sante)
+
+
+async def fermer():
+    """Attend la fin des requêtes en cours puis ferme le pool."""
+    await asyncio.get_running_loop().run_in_executor(None, functools.partial(_executor.shutdown, wait=True))
+    personnage_db.fermer()
@@ -0,0 +1,147 @@
+"""Réutilisation des URL des images statiques déjà envoyées à Discord.
+
+Les images qui ne changent pas (personnages, shops, écrans de fin) sont
+envoyées une seule fois dans un salon réservé (PIECES_JOINTES_SALON_ID) ; les
+embeds référencent ensuite directement l'URL de la pièce jointe. Le registre
+est indexé par l'empreinte SHA-256 du fichier : une image modifiée est
+renvoyée, deux chemins au contenu identique partagent la même URL.
+
+Le salon réservé n'est jamais modifié : les URL des pièces jointes d'un message
+édité ou supprimé (combat, shop, sélection) cessent de fonctionner. Sans salon
+configuré, les images sont jointes à chaque message comme avant.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from urllib.parse import urlparse, parse_qs
+
+import discord
+
+import assets
+from cache import CacheLRU, ABSENT
+
+# ===== CONFIGURATION =====
+# Salon où le bot dépose les images statiques (vide = pas de réutilisation)
+PIECES_JOINTES_SALON_ID = int(os.getenv("PIECES_JOINTES_SALON_ID", "0") or 0)
+# Durée maximale (secondes) de réutilisation d'une URL
+PIECES_JOINTES_TTL = float(os.getenv("PIECES_JOINTES_TTL", str(12 * 3600)))
+# Marge (secondes) avant l'expiration signée de l'URL (paramètre ex= des URL Discord)
+PIECES_JOINTES_MARGE = 600
+# =========================
+
+# empreinte -> (url, expiration en temps epoch)
+_urls = CacheLRU(taille_max=1000, ttl=PIECES_JOINTES_TTL)
+# (fichier, mtime) -> empreinte
+_empreintes = {}
+_verrous = {}
+_salon = None
+nb_envois = 0
+nb_reutilisations = 0
+
+
+def empreinte_fichier(fichier):
+    """SHA-256 du contenu d'un fichier, calculé une fois par version du fichier."""
+    cle = (fichier, assets.mtime(fichier))
+    valeur = _empreintes.get(cle)
+    if valeur is None:
+        with open(fichier, "rb") as f:
+            valeur = hashlib.sha256(f.read()).hexdigest()
+        _empreintes[cle] = valeur
+    return valeur
+
+
+def _expiration(url):
+    """Instant (epoch) où l'URL signée expire, borné par PIECES_JOINTES_TTL."""
+    limite = time.time() + PIECES_JOINTES_TTL
+    ex = parse_qs(urlparse(url).query).get("ex")
+    if ex:
+        try:
+            return min(limite, int(ex[0], 16) - PIECES_JOINTES_MARGE)
+        except ValueError:
+            pass
+    return limite
+
+
+def demarrer(bot):
+    """Retrouve le salon réservé (à appeler une fois le bot connecté)."""
+    global _salon
+    if PIECES_JOINTES_SALON_ID:
+        _salon = bot.get_channel(PIECES_JOINTES_SALON_ID)
+        if _salon is None:
+            print(f"❌ Salon des pièces jointes introuvable ({PIECES_JOINTES_SALON_ID}), images jointes à chaque message")
+
+
+async def url_statique(fichier):
+    """URL Discord d'un fichier déjà envoyé (envoyé dans le salon réservé si besoin), ou None."""
+    global nb_envois, nb_reutilisations
+    if _salon is None:
+        return None
+    cle = empreinte_fichier(fichier)
+    entree = _urls.get(cle, compter=False)
+    if entree is not ABSENT and entree[1] > time.time():
+        nb_reutilisations += 1
+        return entree[0]
+
+    # Un seul envoi par image, même si plusieurs joueurs la demandent en même temps
+    verrou = _verrous.setdefault(cle, asyncio.Lock())
+    async with verrou:
+        entree = _urls.get(cle, compter=False)
+        if entree is not ABSENT and entree[1] > time.time():
+            nb_reutilisations += 1
+            return entree[0]
+        try:
+            message = await _salon.send(
+                content=cle[:12],
+                file=discord.File(fichier, filename=os.path.basename(fichier))
+            )
+        except discord.HTTPException as e:
+            print(f"Erreur envoi de {fichier} dans le salon des pièces jointes : {e}")
+            return None
+        nb_envois += 1
+        url = message.attachments[0].url
+        _urls.set(cle, (url, _expiration(url)))
+        return url
+
+
+async def illustrer(embed, chemin, nom, miniature=False):
+    """
+    Met l'image source `chemin` dans l'embed (vignette si `miniature`, sinon grande
+    image). Retourne le discord.File à joindre au message, ou None si l'URL d'un
+    envoi précédent est réutilisée (ou si l'image n'existe pas).
+    """
+    fichier = assets.miniature(chemin) if miniature else assets.fichier(chemin)
+    if fichier is None:
+        return None
+    url = await url_statique(fichier)
+    file = None
+    if url is None:
+        nom = assets.nom_piece_jointe(nom, fichier)
+        file = discord.File(fichier, filename=nom)
+        url = f"attachment://{nom}"
+    if miniature:
+        embed.set_thumbnail(url=url)
+    else:
+        embed.set_image(url=url)
+    return file
+
+
+async def image_seule(chemin, nom):
+    """Arguments de send() pour afficher une image seule : un embed vers l'URL connue, ou le fichier."""
+    fichier = assets.fichier(chemin)
+    if fichier is None:
+        return {}
+    url = await url_statique(fichier)
+    if url is not None:
+        return {"embed": discord.Embed().set_image(url=url)}
+    return {"file": discord.File(fp=fichier, filename=assets.nom_piece_jointe(nom, fichier))}
+
+
+def stats():
+    """Retourne les compteurs du registre (réutilisations, envois)."""
+    return {
+        "entrees": len(_urls),
+        "reutilisations": nb_reutilisations,
+        "envois": nb_envois,
+        "actif": _salon is not None,
+    }
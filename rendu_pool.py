@@ -0,0 +1,131 @@
+"""Rendu des images de combat hors de la boucle d'événements.
+
+La composition PIL et l'encodage de l'image partent dans un pool de processus (ou de
+threads, PIL relâchant le GIL pendant l'encodage) : un gros rendu ne bloque plus
+les clics des autres joueurs et plusieurs combats sont rendus en parallèle.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cache import CacheLRU, ABSENT
+from combat_image import composer_image_combat, encoder_image, prechauffer_images, cle_rendu
+from metriques import Metriques
+
+# ===== CONFIGURATION =====
+# "process" (un rendu par cœur) ou "thread"
+RENDU_EXECUTOR = os.getenv("RENDU_EXECUTOR", "process")
+RENDU_WORKERS = int(os.getenv("RENDU_WORKERS", str(os.cpu_count() or 2)))
+# Les rendus plus longs (millisecondes, attente comprise) sont affichés dans la console
+RENDU_LENT_MS = float(os.getenv("RENDU_LENT_MS", "500"))
+# Mémoire maximale (Mo) des images déjà encodées, réutilisées quand un tour donne la même image
+RENDU_IMAGES_MO = int(os.getenv("RENDU_IMAGES_MO", "64"))
+# =========================
+
+# "rendu" = temps total vu par le combat (attente comprise) ; "travail" = temps dans le worker
+metriques_rendu = Metriques("Rendu", seuil_lent=RENDU_LENT_MS / 1000)
+
+# cle_rendu(...) -> octets encodés ; coût = taille de l'image
+_images = CacheLRU(
+    taille_max=100000,
+    cout_max=RENDU_IMAGES_MO * 1024 * 1024,
+    cout=len,
+)
+_executor = None
+_en_cours = 0
+_file_max = 0
+
+
+def _initialiser_worker():
+    """Chaque processus décode les images une fois au démarrage."""
+    try:
+        prechauffer_images()
+    except Exception as e:
+        print(f"Info: préchauffage du worker de rendu impossible : {e}")
+
+
+def _rendre(joueur, ennemi, fond_path):
+    """Exécuté dans le worker : retourne (octets encodés, durée du rendu, durée de l'encodage)."""
+    debut = time.perf_counter()
+    image = composer_image_combat(joueur, ennemi, fond_path)
+    debut_encodage = time.perf_counter()
+    octets = encoder_image(image).getvalue()
+    fin = time.perf_counter()
+    return octets, fin - debut, fin - debut_encodage
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if RENDU_EXECUTOR == "process":
+            # Pas de fork : le bot a déjà des threads (pool SQL, discord.py), un fork pourrait bloquer
+            methode = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDU_WORKERS,
+                initializer=_initialiser_worker,
+                mp_context=multiprocessing.get_context(methode),
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=RENDU_WORKERS, thread_name_prefix="rendu")
+    return _executor
+
+
+def _essentiel(combattant):
+    """Ne transmet au worker que ce qui sert au rendu (moins de données à sérialiser)."""
+    return {c: combattant[c] for c in ("nom", "image", "pv", "pv_max")}
+
+
+async def rendre_combat(joueur, ennemi, fond_path):
+    """Rend l'image d'un combat dans le pool et retourne les octets encodés (profil RENDU_PROFIL)."""
+    global _en_cours, _file_max
+    # Image identique déjà encodée (même affrontement, mêmes barres et libellés) : ni composition ni encodage
+    cle = cle_rendu(joueur, ennemi, fond_path)
+    image = _images.get(cle)
+    if image is not ABSENT:
+        return image
+
+    loop = asyncio.get_running_loop()
+    debut = time.perf_counter()
+    _en_cours += 1
+    _file_max = max(_file_max, _en_cours - RENDU_WORKERS)
+    try:
+        image, duree_travail, duree_encodage = await loop.run_in_executor(
+            _get_executor(),
+            functools.partial(_rendre, _essentiel(joueur), _essentiel(ennemi), fond_path)
+        )
+    finally:
+        _en_cours -= 1
+    duree = time.perf_counter() - debut
+    metriques_rendu.enregistrer(
+        "rendu", duree,
+        attente_ms=(duree - duree_travail) * 1000,
+        encodage_ms=duree_encodage * 1000,
+        octets=len(image)
+    )
+    metriques_rendu.enregistrer("travail", duree_travail)
+    _images.set(cle, image)
+    return image
+
+
+def stats():
+    """Retourne la profondeur de file et les mesures des rendus."""
+    return {
+        "executor": RENDU_EXECUTOR,
+        "workers": RENDU_WORKERS,
+        "en_cours": _en_cours,
+        "file": max(0, _en_cours - RENDU_WORKERS),
+        "file_max": _file_max,
+        "cache": _images.stats(),
+        **metriques_rendu.stats(),
+    }
+
+
+def fermer():
+    """Arrête le pool de rendu (arrêt du bot)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
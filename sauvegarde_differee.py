@@ -0,0 +1,114 @@
+"""Sauvegarde différée (write-behind) des personnages en cours de partie.
+
+Les combats et le shop modifient directement le dict `joueur`. Au lieu d'écrire
+en base à chaque tour, on garde une copie de ce qui a été persisté et on
+n'envoie, aux moments importants (ennemi vaincu, fin de région, sortie du shop,
+minuterie, arrêt du bot), que les champs qui ont réellement changé, en une
+seule requête.
+"""
+import asyncio
+import copy
+import os
+
+from personnage_db import COLONNES_MODIFIABLES
+from personnage_db_async import update_personnage_champs
+
+# ===== CONFIGURATION =====
+# Intervalle (secondes) de la sauvegarde périodique des personnages modifiés
+SAUVEGARDE_INTERVALLE = float(os.getenv("SAUVEGARDE_INTERVALLE", "60"))
+# =========================
+
+
+class SauvegardeDifferee:
+    """Suit les personnages actifs et n'écrit que leurs champs modifiés."""
+
+    def __init__(self, intervalle=SAUVEGARDE_INTERVALLE):
+        self.intervalle = intervalle
+        self.joueurs = {}  # user_id -> dict joueur vivant (partagé avec les vues)
+        self.persistes = {}  # user_id -> valeurs telles qu'en base
+        self.verrous = {}
+        self.tache = None
+        self.nb_flush = 0
+        self.nb_champs_ecrits = 0
+
+    def suivre(self, user_id, joueur):
+        """Commence à suivre un joueur fraîchement chargé depuis la base (sans effet s'il est déjà suivi)."""
+        if self.joueurs.get(user_id) is joueur:
+            # Même dict vivant (nouveau combat du même joueur) : ses modifications restent à écrire
+            return
+        self.joueurs[user_id] = joueur
+        self.persistes[user_id] = {c: copy.deepcopy(joueur[c]) for c in COLONNES_MODIFIABLES if c in joueur}
+        self.verrous.setdefault(user_id, asyncio.Lock())
+
+    def joueur(self, user_id):
+        """Dict vivant d'un joueur suivi (modifications pas encore écrites comprises), ou None."""
+        return self.joueurs.get(user_id)
+
+    def oublier(self, user_id):
+        """Arrête de suivre un joueur sans rien écrire (personnage supprimé)."""
+        self.joueurs.pop(user_id, None)
+        self.persistes.pop(user_id, None)
+        self.verrous.pop(user_id, None)
+
+    def champs_modifies(self, user_id):
+        """Retourne les champs du joueur qui diffèrent de la base."""
+        joueur = self.joueurs.get(user_id)
+        if joueur is None:
+            return {}
+        persiste = self.persistes[user_id]
+        return {
+            c: joueur[c]
+            for c in COLONNES_MODIFIABLES
+            if c in joueur and joueur[c] != persiste.get(c)
+        }
+
+    async def flush(self, user_id):
+        """Écrit les champs modifiés d'un joueur en une seule requête."""
+        verrou = self.verrous.get(user_id)
+        if verrou is None:
+            return
+        async with verrou:
+            champs = self.champs_modifies(user_id)
+            if not champs:
+                return
+            # Copie avant l'await : le combat peut continuer à modifier le joueur pendant l'écriture
+            champs = copy.deepcopy(champs)
+            await update_personnage_champs(user_id, champs)
+            if user_id in self.persistes:
+                self.persistes[user_id].update(champs)
+            self.nb_flush += 1
+            self.nb_champs_ecrits += len(champs)
+
+    async def flush_tout(self):
+        """Écrit les modifications de tous les joueurs suivis."""
+        for user_id in list(self.joueurs):
+            try:
+                await self.flush(user_id)
+            except Exception as e:
+                print(f"Erreur sauvegarde différée ({user_id}): {e}")
+
+    async def terminer(self, user_id):
+        """Écrit les dernières modifications puis arrête de suivre le joueur."""
+        await self.flush(user_id)
+        self.oublier(user_id)
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(self.intervalle)
+            await self.flush_tout()
+
+    def demarrer(self):
+        """Lance la sauvegarde périodique (sans effet si elle tourne déjà)."""
+        if self.tache is None or self.tache.done():
+            self.tache = asyncio.create_task(self._boucle())
+
+    async def arreter(self):
+        """Arrête la sauvegarde périodique et écrit tout ce qui reste (arrêt du bot)."""
+        if self.tache is not None:
+            self.tache.cancel()
+            self.tache = None
+        await self.flush_tout()
+
+
+# Instance partagée par le bot, les combats et le shop
+sauvegarde = SauvegardeDifferee()
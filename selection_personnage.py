@@ -1,12 +1,13 @@
 import discord
 from discord.ui import View, Button
-from personnage_db import (
-    charger_personnages_base, 
-    creer_personnage, 
-    personnage_existe,
+from personnage_db import charger_personnages_base
+from personnage_db_async import (
+    creer_personnage,
     get_personnage
 )
-import os
+import pieces_jointes
+
+from metriques import contexte
 
 
 class SelectionPersonnageView(View):
@@ -38,8 +39,8 @@ class SelectionPersonnageView(View):
         self.prev_button.disabled = (self.selected_index == 0)
         self.next_button.disabled = (self.selected_index == len(self.personnages) - 1)
     
-    def get_current_embed_and_file(self):
-        """Crée l'embed et le fichier pour le personnage actuel."""
+    async def get_current_embed_and_file(self):
+        """Crée l'embed et le fichier pour le personnage actuel (pas de fichier si l'image est déjà en ligne)."""
         perso = self.personnages[self.selected_index]
         
         # Créer l'embed
@@ -49,14 +50,8 @@ class SelectionPersonnageView(View):
             color=discord.Color.blue()
         )
         
-        # Attacher l'image du personnage - utiliser toujours le même nom
-        image_path = perso.get('image', '')
-        file = None
-        if image_path and os.path.exists(image_path):
-            # Utiliser un nom de fichier fixe pour que Discord ne cache pas
-            filename = "personnage.png"
-            file = discord.File(image_path, filename=filename)
-            embed.set_thumbnail(url=f"attachment://{filename}")
+        # Image du personnage : URL d'un envoi précédent si possible, sinon pièce jointe
+        file = await pieces_jointes.illustrer(embed, perso.get('image', ''), "personnage", miniature=True)
         
         # Ajouter la description si elle existe
         if perso.get('description'):
@@ -106,7 +101,7 @@ class SelectionPersonnageView(View):
             self.selected_index -= 1
             self.update_buttons()
             
-            embed, file = self.get_current_embed_and_file()
+            embed, file = await self.get_current_embed_and_file()
             
             # Toujours envoyer le fichier dans une liste pour remplacer l'ancien
             await interaction.response.edit_message(
@@ -128,7 +123,7 @@ class SelectionPersonnageView(View):
             self.selected_index += 1
             self.update_buttons()
             
-            embed, file = self.get_current_embed_and_file()
+            embed, file = await self.get_current_embed_and_file()
             
             # Toujours envoyer le fichier dans une liste pour remplacer l'ancien
             await interaction.response.edit_message(
@@ -139,6 +134,7 @@ class SelectionPersonnageView(View):
     
     async def select_personnage(self, interaction: discord.Interaction):
         """Sélectionne le personnage actuel."""
+        contexte.set("selection:choix")
         if interaction.user.id != int(self.user_id):
             await interaction.response.send_message(
                 "❌ Ce n'est pas votre sélection de personnage !",
@@ -148,8 +144,13 @@ class SelectionPersonnageView(View):
         
         perso = self.personnages[self.selected_index]
         
-        # Créer le personnage dans la base de données
-        creer_personnage(self.user_id, perso)
+        # Créer le personnage dans la base de données (une seule requête, False s'il existait déjà)
+        if not await creer_personnage(self.user_id, perso):
+            await interaction.response.send_message(
+                "❌ Vous avez déjà un personnage ! Utilisez `!reset_personnage` pour recommencer.",
+                ephemeral=True
+            )
+            return
         
         # Désactiver tous les boutons
         for item in self.children:
@@ -165,12 +166,7 @@ class SelectionPersonnageView(View):
         )
         
         # Attacher l'image du personnage
-        image_path = perso.get('image', '')
-        file = None
-        if image_path and os.path.exists(image_path):
-            filename = "personnage_selected.png"
-            file = discord.File(image_path, filename=filename)
-            embed.set_thumbnail(url=f"attachment://{filename}")
+        file = await pieces_jointes.illustrer(embed, perso.get('image', ''), "personnage_selected", miniature=True)
         
         await interaction.response.edit_message(
             embed=embed, 
@@ -183,9 +179,9 @@ async def afficher_selection_personnage(interaction: discord.Interaction):
     """Affiche le menu de sélection de personnage."""
     user_id = str(interaction.user.id)
     
-    # Vérifier si l'utilisateur a déjà un personnage
-    if personnage_existe(user_id):
-        perso = get_personnage(user_id)
+    # Vérifier si l'utilisateur a déjà un personnage (une seule lecture : la ligne ou None)
+    perso = await get_personnage(user_id)
+    if perso:
         await interaction.response.send_message(
             f"❌ Vous avez déjà un personnage : **{perso['nom']}** ({perso['race']})\n"
             f"Utilisez `/reset_personnage` pour recommencer.",
@@ -195,7 +191,7 @@ async def afficher_selection_personnage(interaction: discord.Interaction):
     
     # Afficher le menu de sélection
     view = SelectionPersonnageView(user_id)
-    embed, file = view.get_current_embed_and_file()
+    embed, file = await view.get_current_embed_and_file()
     
     if file:
         await interaction.response.send_message(
@@ -0,0 +1,175 @@
+"""Registre des combats en cours.
+
+Un CombatView garde en mémoire le joueur, l'ennemi et les files d'attente
+tant que le combat dure. Le registre limite le nombre de combats gardés en
+mémoire : un combat inactif (ou le plus ancien quand la limite est atteinte)
+est évincé sous forme compacte dans la table combat_sessions. Le menu
+d'attaque garde un custom_id persistant, ce qui permet de reconstruire le
+combat au clic suivant (voir combat.rehydrater_combat).
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from personnage_db_async import sauver_session_combat
+from sauvegarde_differee import sauvegarde
+
+# ===== CONFIGURATION =====
+# Nombre maximum de combats gardés en mémoire
+COMBATS_MAX_ACTIFS = int(os.getenv("COMBATS_MAX_ACTIFS", "200"))
+# Un combat sans action depuis ce délai (secondes) est évincé
+COMBAT_INACTIVITE = float(os.getenv("COMBAT_INACTIVITE", "600"))
+# Intervalle (secondes) entre deux balayages des combats inactifs
+COMBAT_BALAYAGE_INTERVALLE = float(os.getenv("COMBAT_BALAYAGE_INTERVALLE", "60"))
+# =========================
+
+# Préfixe des custom_id persistants des composants de combat : combat:<user_id>:<session_id>
+PREFIXE_CUSTOM_ID = "combat"
+
+
+def custom_id_combat(user_id, session_id):
+    """Construit le custom_id persistant du menu d'attaque d'un combat."""
+    return f"{PREFIXE_CUSTOM_ID}:{user_id}:{session_id}"
+
+
+def lire_custom_id_combat(custom_id):
+    """Retourne (user_id, session_id) pour un custom_id de combat, sinon None."""
+    morceaux = (custom_id or "").split(":")
+    if len(morceaux) != 3 or morceaux[0] != PREFIXE_CUSTOM_ID:
+        return None
+    return morceaux[1], morceaux[2]
+
+
+class RegistreCombats:
+    """Garde les combats actifs en mémoire, dans l'ordre de leur dernière action."""
+
+    def __init__(self, max_actifs=COMBATS_MAX_ACTIFS, inactivite=COMBAT_INACTIVITE):
+        self.max_actifs = max_actifs
+        self.inactivite = inactivite
+        self.sessions = OrderedDict()  # user_id -> CombatView (le moins récent en premier)
+        self.activite = {}  # user_id -> instant de la dernière action
+        self.tache = None
+        self.taches_eviction = set()  # Évictions du surplus en cours (référence gardée jusqu'à la fin)
+        self.nb_evictions = 0
+        self.nb_rehydratations = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, user_id):
+        """Retourne le combat en mémoire d'un utilisateur, ou None."""
+        return self.sessions.get(user_id)
+
+    async def enregistrer(self, view, rehydrate=False):
+        """
+        Ajoute un combat au registre et suit son joueur pour la sauvegarde différée.
+        L'éventuel combat précédent du joueur est arrêté et ses modifications écrites.
+        """
+        ancienne = self.sessions.pop(view.user_id, None)
+        if ancienne is not None and ancienne is not view:
+            ancienne.stop()
+            await sauvegarde.flush(view.user_id)
+        sauvegarde.suivre(view.user_id, view.joueur)
+        self.sessions[view.user_id] = view
+        self.activite[view.user_id] = time.monotonic()
+        if rehydrate:
+            self.nb_rehydratations += 1
+
+        # Limite mémoire : on évince les combats les moins récemment actifs (hors du chemin critique)
+        if len(self.sessions) > self.max_actifs:
+            tache = asyncio.create_task(self._evincer_surplus(view.user_id))
+            self.taches_eviction.add(tache)
+            tache.add_done_callback(self.taches_eviction.discard)
+
+    async def _evincer_surplus(self, user_id_protege):
+        for user_id in list(self.sessions):
+            if len(self.sessions) <= self.max_actifs:
+                break
+            if user_id != user_id_protege:
+                try:
+                    await self.evincer(user_id)
+                except Exception as e:
+                    print(f"Erreur éviction du combat ({user_id}): {e}")
+
+    def toucher(self, user_id):
+        """Note une action du joueur sur son combat."""
+        if user_id in self.sessions:
+            self.sessions.move_to_end(user_id)
+            self.activite[user_id] = time.monotonic()
+
+    def retirer(self, user_id):
+        """Retire un combat terminé du registre."""
+        self.sessions.pop(user_id, None)
+        self.activite.pop(user_id, None)
+
+    async def evincer(self, user_id):
+        """Sauvegarde un combat sous forme compacte puis le retire de la mémoire."""
+        view = self.sessions.get(user_id)
+        if view is None or not view.peut_etre_evince():
+            return False
+        # Clics refusés pendant les écritures : l'état sauvegardé reste celui du combat
+        view.en_eviction = True
+        try:
+            # Le joueur voyage avec l'état : la reprise n'a pas à relire le personnage
+            # (la ligne de combat_sessions disparaît avec lui, ON DELETE CASCADE)
+            etat = {**view.exporter_etat(), "joueur": view.joueur}
+            await sauvegarde.flush(user_id)
+            await sauver_session_combat(user_id, etat)
+        except Exception:
+            # Rien n'est perdu : le combat reste en mémoire et jouable
+            view.en_eviction = False
+            raise
+        # Écritures réussies : le combat peut quitter la mémoire
+        view.stop()
+        if self.sessions.get(user_id) is view:
+            self.retirer(user_id)
+            sauvegarde.oublier(user_id)
+        self.nb_evictions += 1
+        return True
+
+    async def balayer(self):
+        """Évince les combats inactifs depuis trop longtemps."""
+        limite = time.monotonic() - self.inactivite
+        for user_id in list(self.sessions):
+            if self.activite.get(user_id, 0) < limite:
+                try:
+                    await self.evincer(user_id)
+                except Exception as e:
+                    print(f"Erreur éviction du combat ({user_id}): {e}")
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(COMBAT_BALAYAGE_INTERVALLE)
+            await self.balayer()
+
+    def demarrer(self):
+        """Lance le balayage périodique (sans effet s'il tourne déjà)."""
+        if self.tache is None or self.tache.done():
+            self.tache = asyncio.create_task(self._boucle())
+
+    async def arreter(self):
+        """Arrête le balayage et évince tous les combats (reprenables après redémarrage)."""
+        if self.tache is not None:
+            self.tache.cancel()
+            self.tache = None
+        # Évictions du surplus encore en cours : les laisser finir avant d'évincer le reste
+        if self.taches_eviction:
+            await asyncio.gather(*self.taches_eviction, return_exceptions=True)
+        for user_id in list(self.sessions):
+            try:
+                await self.evincer(user_id)
+            except Exception as e:
+                print(f"Erreur éviction du combat ({user_id}): {e}")
+
+    def stats(self):
+        """Retourne les compteurs du registre."""
+        return {
+            "actifs": len(self.sessions),
+            "evictions": self.nb_evictions,
+            "rehydratations": self.nb_rehydratations,
+        }
+
+
+# Registre partagé par le bot et les combats
+registre = RegistreCombats()
@@ -1,34 +1,31 @@
 import discord
 from discord.ui import View, Button, Select
-import json
-import os
+import pieces_jointes
 
-def load_shop_items(region):
-    """Charge les items disponibles dans la boutique d'une région."""
-    try:
-        with open(f"json/shops/{region}.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Si pas de shop spécifique, charger le shop par défaut
-        with open("json/shops/default.json", "r", encoding="utf-8") as f:
-            return json.load(f)
+from sauvegarde_differee import sauvegarde
+from envois_discord import envois
+from metriques import contexte
+from moteur_combat import charger_shop, appliquer_achat, OR_PAR_REGION
 
 
 class ShopView(View):
     """Vue pour le shop de fin de région."""
     
-    def __init__(self, user_id, region, joueur, on_continue_callback):
+    def __init__(self, user_id, region, joueur, on_continue_callback, moteur=None, on_abandon_callback=None):
         super().__init__(timeout=180)
         self.user_id = user_id
         self.region = region
         self.joueur = joueur
+        self.moteur = moteur  # Moteur du combat : les achats y passent pour être journalisés
         self.on_continue_callback = on_continue_callback
-        self.gold = 100  # Or gagné à la fin de la région
+        self.on_abandon_callback = on_abandon_callback  # Appelé si le shop expire sans que le joueur continue
+        self.gold = OR_PAR_REGION  # Or gagné à la fin de la région
         self.shop_message = None  # Référence au message du shop
         self.channel = None  # Référence au canal
+        self.image_url = None  # Image du shop (URL Discord ou attachment://), gardée à chaque mise à jour
         
         # Charger les items du shop
-        self.shop_items = load_shop_items(region)
+        self.shop_items = charger_shop(region)
         
         # Créer le select pour les items
         self.create_shop_select()
@@ -145,11 +142,14 @@ class ShopView(View):
         )
         
         embed.set_footer(text=f"💰 Or restant : {self.gold}G")
+        if self.image_url:
+            embed.set_image(url=self.image_url)
         
         return embed
     
     async def acheter_item(self, interaction: discord.Interaction):
         """Gère l'achat d'un item."""
+        contexte.set("shop:achat")
         if str(interaction.user.id) != self.user_id:
             await interaction.response.send_message(
                 "❌ Ce n'est pas votre boutique !",
@@ -179,37 +179,17 @@ class ShopView(View):
         # Acheter l'item
         self.gold -= item['prix']
         
-        # Appliquer l'effet de l'item
+        # Appliquer l'effet de l'item (règles dans moteur_combat)
+        pv_restaures = self.moteur.acheter(item) if self.moteur else appliquer_achat(self.joueur, item)
         if item['type'] == 'attaque':
-            # Ajouter la nouvelle attaque
-            self.joueur['attaques'].append(item['data'])
             message = f"✅ Vous avez appris **{item['nom']}** !"
         
         elif item['type'] == 'potion':
-            # Restaurer des PV sans dépasser le maximum
-            heal = item['data']['heal']
-            pv_avant = self.joueur['pv']
-            self.joueur['pv'] = min(self.joueur['pv'] + heal, self.joueur['pv_max'])
-            pv_restaures = self.joueur['pv'] - pv_avant
-            
-            # 🔧 CORRECTION : Sauvegarder les PV dans la base de données
-            from personnage_db import update_personnage_pv
-            update_personnage_pv(self.user_id, self.joueur['pv'])
-            
+            # Les PV seront sauvegardés en base à la sortie du shop
             message = f"✅ Vous utilisez **{item['nom']}** et restaurez **{pv_restaures} PV** !"
         
         elif item['type'] == 'stat':
-            # Augmenter la stat
             stat = item['data']['stat']
-            value = item['data']['value']
-            self.joueur[stat] += value
-            
-            # Si c'est pv_max, augmenter les PV actuels proportionnellement
-            # mais NE PAS restaurer à 100%
-            if stat == 'pv_max':
-                # Seulement ajouter la différence, pas restaurer complètement
-                self.joueur['pv'] = min(self.joueur['pv'] + value, self.joueur['pv_max'])
-            
             stat_names = {
                 'force': 'Force',
                 'magie': 'Magie',
@@ -218,7 +198,7 @@ class ShopView(View):
                 'vitesse': 'Vitesse',
                 'pv_max': 'PV Maximum'
             }
-            message = f"✅ Votre **{stat_names.get(stat, stat)}** augmente de **+{value}** !"
+            message = f"✅ Votre **{stat_names.get(stat, stat)}** augmente de **+{item['data']['value']}** !"
         
         # Retirer l'item acheté de la liste
         self.shop_items.remove(item)
@@ -238,8 +218,15 @@ class ShopView(View):
         # Mettre à jour la référence du message
         self.shop_message = await interaction.original_response()
     
+    async def on_timeout(self):
+        """Sauvegarde les achats si le joueur quitte le shop sans continuer (l'aventure est abandonnée)."""
+        await sauvegarde.flush(self.user_id)
+        if self.on_abandon_callback:
+            await self.on_abandon_callback()
+    
     async def continue_adventure(self, interaction: discord.Interaction):
         """Continue l'aventure vers la prochaine région."""
+        contexte.set("shop:continuer")
         if str(interaction.user.id) != self.user_id:
             await interaction.response.send_message(
                 "❌ Ce n'est pas votre aventure !",
@@ -248,49 +235,51 @@ class ShopView(View):
             return
         
         await interaction.response.defer()
+        # Shop terminé : sans stop(), on_timeout se déclencherait quand même et abandonnerait le combat
+        self.stop()
+        
+        # Point de sauvegarde : sortie du shop (achats, potions...)
+        await sauvegarde.flush(self.user_id)
         
         # Supprimer le message du shop
         if self.shop_message:
-            await self.shop_message.delete()
+            await envois.supprimer(self.shop_message)
         
         # Appeler le callback pour continuer le combat
         await self.on_continue_callback(interaction, self.channel)
 
 
-async def afficher_shop(interaction, user_id, region, joueur, on_continue_callback):
+async def afficher_shop(channel, user_id, region, joueur, on_continue_callback, moteur=None, on_abandon_callback=None):
     """Affiche le shop de fin de région."""
     print(f"DEBUG SHOP: Début afficher_shop pour région={region}, user_id={user_id}")
     
     try:
         print("DEBUG SHOP: Création de ShopView...")
-        view = ShopView(user_id, region, joueur, on_continue_callback)
-        view.channel = interaction.channel  # Garder la référence du canal
+        view = ShopView(user_id, region, joueur, on_continue_callback, moteur, on_abandon_callback)
+        view.channel = channel  # Garder la référence du canal
         print(f"DEBUG SHOP: ShopView créée, channel={view.channel}")
         
-        # Essayer de charger une image de fond pour le shop
-        shop_image_path = f"images/shops/{region}.png"
-        file = None
-        if os.path.exists(shop_image_path):
-            print(f"DEBUG SHOP: Image trouvée: {shop_image_path}")
-            file = discord.File(shop_image_path, filename="shop.png")
-        else:
-            print(f"DEBUG SHOP: Pas d'image pour {shop_image_path}")
-        
         print("DEBUG SHOP: Création de l'embed...")
         embed = view.get_shop_embed()
         print(f"DEBUG SHOP: Embed créé: {embed.title}")
         
+        # Image de fond du shop : URL d'un envoi précédent si possible, sinon pièce jointe
+        file = await pieces_jointes.illustrer(embed, f"images/shops/{region}.png", "shop")
+        view.image_url = embed.image.url
+        
         # Envoyer un NOUVEAU message pour le shop
         print("DEBUG SHOP: Envoi du message shop...")
         if file:
-            view.shop_message = await interaction.channel.send(
+            view.shop_message = await envois.envoyer(
+                channel,
                 content="",
                 embed=embed,
                 view=view,
                 file=file
             )
         else:
-            view.shop_message = await interaction.channel.send(
+            view.shop_message = await envois.envoyer(
+                channel,
                 content="",
                 embed=embed,
                 view=view
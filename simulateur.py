@@ -0,0 +1,247 @@
+"""Simulateur d'équilibrage : joue des aventures complètes sans Discord.
+
+    python simulateur.py --parties 100000 --regions 3 --ennemis 10 --strategie soin
+    python simulateur.py --strategie toutes --json resultats.json
+
+Chaque partie suit les règles du bot (moteur_combat) : régions et ennemis tirés
+au hasard, attaque la plus forte contre l'ennemi en cours, shop entre deux
+régions avec la stratégie d'achat choisie. Les parties sont réparties sur un
+pool de processus. Le résultat, par personnage : taux de victoire, région de
+la défaite, nombre d'attaques pour vaincre un ennemi et PV restants en fin de
+région (distributions par région).
+"""
+import argparse
+import bisect
+import functools
+import itertools
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from moteur_combat import (
+    MoteurCombat, charger_shop, appliquer_achat, load_json,
+    OR_PAR_REGION, ENNEMI_VAINCU, REGION_TERMINEE, VICTOIRE, DEFAITE,
+)
+
+# Priorité des types d'items pour chaque stratégie (plus petit = acheté d'abord)
+STRATEGIES = {
+    "aucun": None,
+    "soin": {"potion": 0, "pv_max": 1, "armure": 2, "armure_magique": 2},
+    "offensif": {"attaque": 0, "force": 0, "magie": 0, "vitesse": 1},
+    "defensif": {"armure": 0, "armure_magique": 0, "pv_max": 1, "potion": 2},
+    "moins_cher": {},
+    "hasard": {},
+}
+# Nombre de parties envoyées d'un coup à un worker
+TAILLE_LOT = 2000
+
+
+def _categorie(item):
+    return item["data"]["stat"] if item["type"] == "stat" else item["type"]
+
+
+@functools.lru_cache(maxsize=None)
+def _shop(region):
+    """Items du shop d'une région, lus une fois par worker (ne pas modifier les items)."""
+    return tuple(charger_shop(region))
+
+
+def acheter(joueur, region, strategie, rng):
+    """Dépense l'or de fin de région selon la stratégie ; retourne les items achetés."""
+    priorites = STRATEGIES[strategie]
+    if priorites is None:
+        return []
+    # Copie de la liste (mélangée ou triée sur place), les items restent partagés
+    items = list(_shop(region))
+    if strategie == "hasard":
+        rng.shuffle(items)
+    else:
+        # Items prioritaires d'abord, puis les moins chers (pour en acheter le plus possible)
+        items.sort(key=lambda i: (priorites.get(_categorie(i), len(priorites) + 1), i["prix"]))
+
+    or_restant = OR_PAR_REGION
+    achats = []
+    for item in items:
+        # Une potion ne sert à rien à PV pleins
+        if item["type"] == "potion" and joueur["pv"] >= joueur["pv_max"]:
+            continue
+        if item["prix"] <= or_restant:
+            or_restant -= item["prix"]
+            appliquer_achat(joueur, item)
+            achats.append(item["nom"])
+    return achats
+
+
+def jouer_partie(personnage, nb_regions, nb_ennemis, strategie, rng):
+    """Joue une aventure complète ; retourne (victoire, [(région, [attaques par ennemi vaincu], pv ou None)])."""
+    joueur = json.loads(json.dumps(personnage))
+    moteur = MoteurCombat(joueur, nb_regions, nb_ennemis, rng=rng)
+    regions = []
+    tours_region = []
+    tours = 0
+    while True:
+        if not moteur.tour_joueur:
+            coup = moteur.attaque_ennemi()
+            if coup.issue == DEFAITE:
+                regions.append((moteur.region, tours_region, None))
+                return False, regions
+            continue
+
+        region = moteur.region
+        coup = moteur.attaque_joueur(moteur.choisir_attaque("max"))
+        tours += 1
+        if coup.issue is None:
+            continue
+        tours_region.append(tours)
+        tours = 0
+        if coup.issue == ENNEMI_VAINCU:
+            continue
+        regions.append((region, tours_region, joueur["pv"]))
+        tours_region = []
+        if coup.issue == VICTOIRE:
+            return True, regions
+        if coup.issue == REGION_TERMINEE:
+            acheter(joueur, region, strategie, rng)
+            moteur.region_suivante()
+
+
+def _lot(args):
+    """Exécuté dans un worker : joue un lot de parties et retourne des compteurs fusionnables."""
+    personnage, nb_regions, nb_ennemis, strategie, nb_parties, graine = args
+    rng = random.Random(graine)
+    resultat = {
+        "parties": 0,
+        "victoires": 0,
+        "defaites": Counter(),                  # région -> défaites
+        "tours": defaultdict(Counter),          # région -> {attaques pour vaincre un ennemi: n}
+        "pv_fin_region": defaultdict(Counter),  # région -> {PV restants en fin de région: n}
+    }
+    for _ in range(nb_parties):
+        victoire, regions = jouer_partie(personnage, nb_regions, nb_ennemis, strategie, rng)
+        resultat["parties"] += 1
+        resultat["victoires"] += victoire
+        for region, tours, pv in regions:
+            resultat["tours"][region].update(tours)
+            if pv is None:
+                resultat["defaites"][region] += 1
+            else:
+                resultat["pv_fin_region"][region][pv] += 1
+    return resultat
+
+
+def _fusionner(total, lot):
+    total["parties"] += lot["parties"]
+    total["victoires"] += lot["victoires"]
+    total["defaites"].update(lot["defaites"])
+    for cle in ("tours", "pv_fin_region"):
+        for region, compteur in lot[cle].items():
+            total[cle][region].update(compteur)
+
+
+def _distribution(compteur):
+    """
+    Résumé (moyenne, p10, p50, p90) d'un histogramme {valeur: occurrences},
+    calculé sur les valeurs distinctes et leurs effectifs cumulés (sans déplier
+    l'histogramme en une liste d'échantillons).
+    """
+    valeurs = sorted(v for v, k in compteur.items() if k > 0)
+    cumul = list(itertools.accumulate(compteur[v] for v in valeurs))
+    if not cumul:
+        return None
+    n = cumul[-1]
+
+    def percentile(p):
+        # Même rang que metriques.percentile sur la liste triée de tous les échantillons
+        rang = min(n - 1, int(round(p / 100 * (n - 1))))
+        return valeurs[bisect.bisect_right(cumul, rang)]
+
+    return {
+        "n": n,
+        "moyenne": round(sum(v * compteur[v] for v in valeurs) / n, 2),
+        "p10": percentile(10),
+        "p50": percentile(50),
+        "p90": percentile(90),
+    }
+
+
+def simuler(personnages, nb_parties, nb_regions, nb_ennemis, strategies, workers=None, graine=None):
+    """Répartit les parties sur un pool de processus ; retourne {strategie: {personnage: résumé}}."""
+    graines = random.Random(graine)
+    taches = []
+    for strategie in strategies:
+        for personnage in personnages:
+            restant = nb_parties
+            while restant > 0:
+                n = min(TAILLE_LOT, restant)
+                taches.append((strategie, personnage["nom"],
+                               (personnage, nb_regions, nb_ennemis, strategie, n, graines.getrandbits(64))))
+                restant -= n
+
+    totaux = defaultdict(lambda: {
+        "parties": 0, "victoires": 0, "defaites": Counter(),
+        "tours": defaultdict(Counter), "pv_fin_region": defaultdict(Counter),
+    })
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (strategie, nom, _), lot in zip(taches, pool.map(_lot, [t[2] for t in taches])):
+            _fusionner(totaux[(strategie, nom)], lot)
+
+    resultats = defaultdict(dict)
+    for (strategie, nom), total in totaux.items():
+        resultats[strategie][nom] = {
+            "parties": total["parties"],
+            "taux_victoire": total["victoires"] / total["parties"],
+            "defaites_par_region": dict(total["defaites"]),
+            "tours_pour_vaincre": {r: _distribution(c) for r, c in total["tours"].items()},
+            "pv_fin_region": {r: _distribution(c) for r, c in total["pv_fin_region"].items()},
+        }
+    return dict(resultats)
+
+
+def afficher(resultats):
+    for strategie, par_personnage in resultats.items():
+        print(f"\n=== Stratégie : {strategie} ===")
+        for nom, r in par_personnage.items():
+            print(f"{nom} : {r['taux_victoire']:.1%} de victoires sur {r['parties']} parties"
+                  + (f" | défaites : {r['defaites_par_region']}" if r["defaites_par_region"] else ""))
+            for region, tours in r["tours_pour_vaincre"].items():
+                pv = r["pv_fin_region"].get(region)
+                ligne = f"  {region:<10} attaques/ennemi moy {tours['moyenne']:.2f} (p50 {tours['p50']}, p90 {tours['p90']})"
+                if pv:
+                    ligne += f" | PV fin de région moy {pv['moyenne']:.1f} (p10 {pv['p10']}, p50 {pv['p50']}, p90 {pv['p90']})"
+                print(ligne)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulateur d'équilibrage des aventures")
+    parser.add_argument("--parties", type=int, default=10000, help="parties par personnage et par stratégie")
+    parser.add_argument("--regions", type=int, default=3)
+    parser.add_argument("--ennemis", type=int, default=10, help="ennemis par région")
+    parser.add_argument("--strategie", default="moins_cher", help=f"{', '.join(STRATEGIES)} ou toutes")
+    parser.add_argument("--personnages", help="noms séparés par des virgules (défaut : tous)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--graine", type=int, help="graine pour des résultats reproductibles")
+    parser.add_argument("--json", help="écrit aussi les résultats dans ce fichier")
+    args = parser.parse_args()
+
+    strategies = list(STRATEGIES) if args.strategie == "toutes" else args.strategie.split(",")
+    inconnues = [s for s in strategies if s not in STRATEGIES]
+    if inconnues:
+        parser.error(f"stratégie inconnue : {', '.join(inconnues)}")
+    personnages = load_json("json/personnages.json")
+    if args.personnages:
+        noms = args.personnages.split(",")
+        personnages = [p for p in personnages if p["nom"] in noms]
+
+    debut = time.perf_counter()
+    resultats = simuler(personnages, args.parties, args.regions, args.ennemis, strategies, args.workers, args.graine)
+    duree = time.perf_counter() - debut
+    afficher(resultats)
+    total = args.parties * len(personnages) * len(strategies)
+    print(f"\n✅ {total} parties en {duree:.1f} s ({total / duree:.0f} parties/s)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
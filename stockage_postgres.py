@@ -0,0 +1,186 @@
+"""Stockage PostgreSQL (production) : pool de connexions psycopg2 avec vérification et reconnexion."""
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import Json
+
+ERREURS_CONNEXION = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def _nb_lignes(cur, fetch, resultat):
+    """Nombre de lignes lues (SELECT / RETURNING) ou modifiées."""
+    if fetch == "all":
+        return len(resultat)
+    if fetch == "one":
+        return 1 if resultat is not None else 0
+    return max(cur.rowcount, 0)
+
+
+class StockagePostgres:
+    """Exécute les requêtes de personnage_db sur un pool de connexions PostgreSQL."""
+
+    dialecte = "postgres"
+
+    def __init__(self, url, pool_min=1, pool_max=10, healthcheck_idle=30, prepare=True):
+        self.url = url
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        # Une connexion inutilisée depuis plus longtemps est vérifiée (SELECT 1) avant d'être réutilisée
+        self.healthcheck_idle = healthcheck_idle
+        # Pool créé à la première requête (l'import ne touche pas la base)
+        self._pool = None
+        self._pool_verrou = threading.Lock()
+        # ThreadedConnectionPool lève une erreur quand il est plein : le sémaphore fait attendre à la place
+        self._places = threading.BoundedSemaphore(pool_max)
+        self._derniere_utilisation = {}
+        # Requêtes nommées préparées côté serveur (PREPARE), par connexion
+        self.prepare = prepare
+        self._preparees = {}
+        # Mesures des requêtes (metriques.Metriques), branchées par personnage_db
+        self.metriques = None
+
+    def json(self, valeur):
+        """Adapte une valeur Python pour une colonne JSONB."""
+        return Json(valeur)
+
+    def lire_json(self, valeur):
+        """psycopg2 décode déjà les colonnes JSONB."""
+        return valeur
+
+    def adapter_ddl(self, sql):
+        return sql
+
+    def _get_pool(self):
+        """Crée le pool de connexions au premier besoin."""
+        if self._pool is None:
+            with self._pool_verrou:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(
+                        self.pool_min, self.pool_max, self.url, sslmode="require"
+                    )
+        return self._pool
+
+    def _connexion_saine(self, conn):
+        """Vérifie qu'une connexion restée inactive répond encore."""
+        if conn.closed:
+            return False
+        inactive = time.monotonic() - self._derniere_utilisation.get(id(conn), 0)
+        if inactive < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except ERREURS_CONNEXION:
+            return False
+
+    def _prendre_connexion(self):
+        """Récupère une connexion saine du pool, en remplaçant celles qui sont coupées."""
+        pool_connexions = self._get_pool()
+        conn = pool_connexions.getconn()
+        while not self._connexion_saine(conn):
+            self._oublier_connexion(conn)
+            pool_connexions.putconn(conn, close=True)
+            conn = pool_connexions.getconn()
+        return conn
+
+    def _oublier_connexion(self, conn):
+        self._derniere_utilisation.pop(id(conn), None)
+        self._preparees.pop(id(conn), None)
+
+    @contextmanager
+    def _connexion(self):
+        """Emprunte une connexion au pool le temps d'une requête."""
+        with self._places:
+            conn = self._prendre_connexion()
+            try:
+                yield conn
+            except ERREURS_CONNEXION:
+                # Connexion cassée : on la jette au lieu de la remettre dans le pool
+                self._oublier_connexion(conn)
+                self._get_pool().putconn(conn, close=True)
+                raise
+            except Exception:
+                conn.rollback()
+                self._get_pool().putconn(conn)
+                raise
+            else:
+                self._derniere_utilisation[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Ouvre un curseur dans une transaction, validée à la sortie du bloc (annulée en cas d'erreur)."""
+        with self._connexion() as conn:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+
+    def _executer_preparee(self, conn, cur, nom, sql, params):
+        """Exécute une requête nommée, en la préparant sur la connexion à sa première utilisation."""
+        preparees = self._preparees.setdefault(id(conn), set())
+        if nom not in preparees:
+            # %s (psycopg2) -> $1, $2... (paramètres de PREPARE)
+            morceaux = sql.split("%s")
+            sql_prepare = morceaux[0] + "".join(f"${i}{m}" for i, m in enumerate(morceaux[1:], start=1))
+            cur.execute(f"PREPARE {nom} AS {sql_prepare}")
+            preparees.add(nom)
+        if params:
+            cur.execute(f"EXECUTE {nom} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {nom}")
+
+    def executer(self, sql, params=(), fetch=None, nom=None):
+        """Exécute une requête et la valide ; réessaie une fois sur une nouvelle connexion si elle est coupée."""
+        for tentative in range(2):
+            try:
+                debut_attente = time.perf_counter()
+                with self._connexion() as conn:
+                    debut = time.perf_counter()
+                    with conn.cursor() as cur:
+                        if nom and self.prepare:
+                            self._executer_preparee(conn, cur, nom, sql, params)
+                        else:
+                            cur.execute(sql, params)
+                        if fetch == "one":
+                            resultat = cur.fetchone()
+                        elif fetch == "all":
+                            resultat = cur.fetchall()
+                        else:
+                            resultat = None
+                        lignes = _nb_lignes(cur, fetch, resultat)
+                    debut_commit = time.perf_counter()
+                    conn.commit()
+                    fin = time.perf_counter()
+                if self.metriques is not None:
+                    self.metriques.enregistrer(
+                        nom or "sql", fin - debut,
+                        lignes=lignes,
+                        commit_ms=(fin - debut_commit) * 1000,
+                        attente_pool_ms=(debut - debut_attente) * 1000
+                    )
+                return resultat
+            except ERREURS_CONNEXION:
+                if tentative:
+                    raise
+                print("Info: connexion à la base perdue, reconnexion...")
+
+    def verifier_sante(self):
+        """Retourne True si la base répond."""
+        try:
+            return self.executer("SELECT 1", fetch="one") == (1,)
+        except ERREURS_CONNEXION:
+            return False
+
+    def fermer(self):
+        """Ferme toutes les connexions du pool."""
+        with self._pool_verrou:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._derniere_utilisation.clear()
+            self._preparees.clear()
@@ -0,0 +1,143 @@
+"""Stockage SQLite (ou en mémoire) pour tester et mesurer le bot sans serveur PostgreSQL.
+
+Mêmes requêtes que la production : les paramètres %s sont traduits en ?, la
+colonne JSONB devient un TEXT contenant du JSON, et ON CONFLICT / RETURNING /
+CURRENT_TIMESTAMP sont supportés nativement par SQLite, ainsi que l'opérateur
+->> de reprendre_session_combat : SQLite 3.38 minimum (vérifié à la première
+connexion). sqlite3 garde déjà en cache les requêtes compilées : le nom des
+requêtes est ignoré.
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+ERREURS_CONNEXION = (sqlite3.OperationalError, sqlite3.InterfaceError)
+# Version minimale : opérateurs JSON -> et ->> (RETURNING et ON CONFLICT datent de 3.35)
+SQLITE_VERSION_MIN = (3, 38, 0)
+
+
+def _traduire(sql):
+    """Passe du style de paramètres psycopg2 (%s) à celui de sqlite3 (?)."""
+    return sql.replace("%s", "?")
+
+
+class _CurseurSqlite:
+    """Curseur qui accepte les requêtes écrites pour psycopg2."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql, params=()):
+        self._cur.execute(_traduire(sql), params)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+
+class StockageSqlite:
+    """Exécute les requêtes de personnage_db sur une base SQLite locale."""
+
+    dialecte = "sqlite"
+
+    def __init__(self, chemin=":memory:"):
+        self.chemin = chemin
+        self._conn = None
+        # Une seule connexion partagée (obligatoire pour :memory:), protégée par un verrou
+        self._verrou = threading.RLock()
+        # Mesures des requêtes (metriques.Metriques), branchées par personnage_db
+        self.metriques = None
+
+    def json(self, valeur):
+        """Sérialise une valeur Python pour la colonne JSON (TEXT)."""
+        return json.dumps(valeur, ensure_ascii=False)
+
+    def lire_json(self, valeur):
+        return json.loads(valeur) if isinstance(valeur, str) else valeur
+
+    def adapter_ddl(self, sql):
+        """SQLite n'a pas de type JSONB : le JSON est stocké en TEXT."""
+        return sql.replace("JSONB", "TEXT")
+
+    def _get_connexion(self):
+        if self._conn is None:
+            if sqlite3.sqlite_version_info < SQLITE_VERSION_MIN:
+                raise RuntimeError(
+                    f"SQLite {sqlite3.sqlite_version} trop ancien : "
+                    f"{'.'.join(map(str, SQLITE_VERSION_MIN))} minimum (opérateur ->>)"
+                )
+            self._conn = sqlite3.connect(self.chemin, check_same_thread=False)
+            # Nécessaire pour les ON DELETE CASCADE (désactivé par défaut dans SQLite)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        """Ouvre un curseur dans une transaction, validée à la sortie du bloc (annulée en cas d'erreur)."""
+        with self._verrou:
+            conn = self._get_connexion()
+            cur = conn.cursor()
+            try:
+                yield _CurseurSqlite(cur)
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                cur.close()
+
+    def executer(self, sql, params=(), fetch=None, nom=None):
+        """Exécute une requête et la valide."""
+        with self._verrou:
+            debut = time.perf_counter()
+            conn = self._get_connexion()
+            cur = conn.cursor()
+            try:
+                cur.execute(_traduire(sql), params)
+                if fetch == "one":
+                    resultat = cur.fetchone()
+                    lignes = 1 if resultat is not None else 0
+                elif fetch == "all":
+                    resultat = cur.fetchall()
+                    lignes = len(resultat)
+                else:
+                    resultat = None
+                    lignes = max(cur.rowcount, 0)
+                debut_commit = time.perf_counter()
+                conn.commit()
+                fin = time.perf_counter()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+        if self.metriques is not None:
+            self.metriques.enregistrer(
+                nom or "sql", fin - debut,
+                lignes=lignes,
+                commit_ms=(fin - debut_commit) * 1000
+            )
+        return resultat
+
+    def verifier_sante(self):
+        """Retourne True si la base répond."""
+        try:
+            return self.executer("SELECT 1", fetch="one") == (1,)
+        except ERREURS_CONNEXION:
+            return False
+
+    def fermer(self):
+        """Ferme la connexion (une base :memory: est alors perdue)."""
+        with self._verrou:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
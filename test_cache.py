@@ -0,0 +1,89 @@
+"""Cache LRU et cache des personnages de personnage_db.
+
+    python -m pytest -q test_cache.py
+"""
+import itertools
+
+import personnage_db
+from cache import CacheLRU, ABSENT
+
+_ids = (f"cache-{n}" for n in itertools.count(1))
+
+
+def test_lru_evince_le_moins_recent():
+    cache = CacheLRU(taille_max=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is ABSENT
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_lru_expiration(monkeypatch):
+    import cache as module_cache
+
+    maintenant = [100.0]
+    monkeypatch.setattr(module_cache.time, "monotonic", lambda: maintenant[0])
+    cache = CacheLRU(ttl=10)
+    cache.set("a", 1)
+    maintenant[0] += 9
+    assert cache.get("a") == 1
+    maintenant[0] += 2
+    assert cache.get("a") is ABSENT
+
+
+def _creer():
+    user_id = next(_ids)
+    assert personnage_db.creer_personnage(user_id, personnage_db.charger_personnages_base()[0])
+    return user_id
+
+
+def test_lecture_servie_par_le_cache_et_ecriture_repercutee():
+    user_id = _creer()
+    personnage_db._cache.vider()
+    perso = personnage_db.get_personnage(user_id)
+    personnage_db.metriques_db.reinitialiser()
+    # Copie rendue à l'appelant : la modifier ne touche pas le cache
+    perso["pv"] = -1
+    assert personnage_db.get_personnage(user_id)["pv"] != -1
+    personnage_db.update_personnage_champs(user_id, {"pv": 7})
+    assert personnage_db.get_personnage(user_id)["pv"] == 7
+    assert set(personnage_db.metriques_db.stats()) == {"update_champs_pv"}
+
+
+def test_lecture_doublee_par_une_ecriture_ne_remplit_pas_le_cache(monkeypatch):
+    user_id = _creer()
+    personnage_db._cache.vider()
+    lire = personnage_db._lire_personnage
+
+    def lecture_lente(uid):
+        # La ligne est lue, puis une écriture est validée avant que la lecture ne se termine
+        perso = lire(uid)
+        personnage_db.update_personnage_champs(uid, {"pv": 3})
+        return perso
+
+    monkeypatch.setattr(personnage_db, "_lire_personnage", lecture_lente)
+    ancien = personnage_db.get_personnage(user_id)
+    assert ancien["pv"] != 3
+    monkeypatch.undo()
+    # L'ancienne ligne n'a pas été mise en cache : la lecture suivante voit l'écriture
+    assert personnage_db._cache.get(user_id) is ABSENT
+    assert personnage_db.get_personnage(user_id)["pv"] == 3
+
+
+def test_suppression_pendant_une_lecture(monkeypatch):
+    user_id = _creer()
+    personnage_db._cache.vider()
+    lire = personnage_db._lire_personnage
+
+    def lecture_lente(uid):
+        perso = lire(uid)
+        personnage_db.supprimer_personnage(uid)
+        return perso
+
+    monkeypatch.setattr(personnage_db, "_lire_personnage", lecture_lente)
+    assert personnage_db.get_personnage(user_id) is not None
+    monkeypatch.undo()
+    assert personnage_db.get_personnage(user_id) is None
@@ -0,0 +1,240 @@
+"""Règles du combat sans Discord : tables d'apparition, tirages et journaux.
+
+    python -m pytest -q test_moteur_combat.py
+"""
+import copy
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import journal_combat
+import moteur_combat
+import personnage_db
+from moteur_combat import (
+    ACHAT, DEFAITE, REGION_TERMINEE, VICTOIRE,
+    Ennemi, MoteurCombat, TableAlias, TableDegats, TiragesRejouables, appliquer_achat, calcul_degats,
+    charger_shop, compiler_attaque, config_regions, degats_compiles, joueur_commence, multiplicateurs,
+    simuler_lot, table_apparition,
+)
+
+TIRAGES = 20000
+
+
+def test_table_alias_suit_les_poids():
+    poids = [1, 2, 3, 4, 0]
+    alias = TableAlias(poids)
+    rng = TiragesRejouables(1)
+    frequences = Counter(alias.tirer(rng) for _ in range(TIRAGES))
+    for i, p in enumerate(poids):
+        assert frequences[i] / TIRAGES == pytest.approx(p / sum(poids), abs=0.01)
+
+
+def test_premier_ennemi_suit_rarete_et_poids():
+    raretes = config_regions()["raretes"]
+    for region in ("foret", "desert"):
+        table = table_apparition(region)
+        modeles, _ = table.bandes[0]
+        # Poids attendus dans la première bande : rareté répartie au prorata de "poids"
+        par_rarete = Counter()
+        for m in modeles:
+            par_rarete[m.get("rarete", "commun")] += m.get("poids", 1)
+        attendus = {
+            m["nom"]: raretes[m.get("rarete", "commun")] * m.get("poids", 1) / par_rarete[m.get("rarete", "commun")]
+            for m in modeles
+        }
+        total = sum(attendus.values())
+        rng = TiragesRejouables(2)
+        premiers = Counter(table.file_ennemis(rng, len(table.modeles))[0]["nom"] for _ in range(TIRAGES))
+        assert set(premiers) <= set(attendus)
+        for nom, p in attendus.items():
+            assert premiers[nom] / TIRAGES == pytest.approx(p / total, abs=0.015), (region, nom)
+
+
+def test_file_ennemis_sans_doublon_et_par_bande():
+    for region in ("foret", "desert"):
+        table = table_apparition(region)
+        rng = TiragesRejouables(3)
+        for nb in range(1, len(table.modeles) + 1):
+            for _ in range(2000):
+                file = table.file_ennemis(rng, nb)
+                noms = [m["nom"] for m in file]
+                assert len(set(noms)) == nb
+                # Chaque ennemi vient de sa bande, tant que la bande en a de libres
+                for position, modele in enumerate(file):
+                    modeles, _ = table.bandes[position * len(table.bandes) // nb]
+                    libres = {m["nom"] for m in modeles} - set(noms[:position])
+                    assert not libres or modele["nom"] in libres
+
+
+def test_difficulte_croissante_en_foret():
+    # Bandes de foret : les deux premiers ennemis sont les plus faibles, Lady Jeanne (difficulté 3) ferme la marche
+    table = table_apparition("foret")
+    rng = TiragesRejouables(4)
+    ordres = Counter(tuple(m["nom"] for m in table.file_ennemis(rng, 3)) for _ in range(TIRAGES))
+    assert all(ordre[-1] == "Lady Jeanne" for ordre in ordres)
+    assert len(ordres) == 2
+
+
+def _joueur(pv=300, indice=0):
+    joueur = copy.deepcopy(personnage_db.charger_personnages_base()[indice])
+    joueur["pv"] = joueur["pv_max"] = pv
+    return joueur
+
+
+def _jouer(moteur, nb_coups=None):
+    """
+    Joue `nb_coups` coups (ou jusqu'à la fin) sans politique : le joueur
+    alterne ses attaques d'après la longueur du journal et achète le dernier
+    item du shop entre deux régions. Retourne l'issue finale (None si interrompu).
+    """
+    for _ in range(nb_coups or 10 ** 6):
+        if moteur.tour_joueur:
+            attaques = moteur.joueur["attaques"]
+            coup = moteur.attaque_joueur(attaques[len(moteur.journal.camps) % len(attaques)]["nom"])
+        else:
+            coup = moteur.attaque_ennemi()
+        if coup.issue == REGION_TERMINEE:
+            moteur.acheter(charger_shop(moteur.region)[-1])
+            moteur.region_suivante()
+        elif coup.issue in (VICTOIRE, DEFAITE):
+            return coup.issue
+    return None
+
+
+def test_combat_repris_apres_export_identique(monkeypatch):
+    monkeypatch.setattr(moteur_combat, "regions_disponibles", lambda: ("foret", "desert"))
+    for graine in range(5):
+        continu = MoteurCombat(_joueur(), 2, 3, graine=graine)
+        assert _jouer(continu, 7) is None
+        # Export au milieu du combat, passage par JSON comme en base, puis reprise
+        etat = json.loads(json.dumps(continu.exporter_etat()))
+        repris = MoteurCombat(copy.deepcopy(continu.joueur), etat=etat)
+
+        assert _jouer(continu) == _jouer(repris)
+        assert repris.joueur == continu.joueur
+        assert repris.journal.exporter() == continu.journal.exporter()
+        assert ACHAT in continu.journal.camps
+
+        # Le journal du combat repris se rejoue à l'identique depuis le début
+        rejoue = journal_combat.rejouer(json.loads(json.dumps(repris.journal.exporter())))
+        assert rejoue.journal.exporter() == repris.journal.exporter()
+        assert rejoue.joueur == repris.joueur and rejoue.region == repris.region
+
+
+def _degats_reference(attaque, attaquant, defenseur):
+    """Formule d'origine de combat.calcul_degats, avant la table de dégâts."""
+    degats = attaque["degats"]
+    degats += attaquant.get("force", 0) * attaque.get("ratioattk", 0) / 100
+    degats += attaquant.get("magie", 0) * attaque.get("ratiomagie", 0) / 100
+    if attaque["type"] == "magique":
+        degats *= (1 - defenseur.get("armure_magique", 0) / 100)
+    elif attaque["type"] == "physique":
+        degats *= (1 - defenseur.get("armure", 0) / 100)
+    elif attaque["type"] == "hybride":
+        degats *= (1 - (defenseur.get("armure", 0) + defenseur.get("armure_magique", 0)) / 2 / 100)
+    return max(1, int(degats))
+
+
+def _verifier_table(attaquant, defenseur, table):
+    attendus = {a["nom"]: _degats_reference(a, attaquant, defenseur) for a in attaquant["attaques"]}
+    assert table.degats() == attendus
+    for a in attaquant["attaques"]:
+        assert calcul_degats(a, attaquant, defenseur) == attendus[a["nom"]]
+        assert degats_compiles(
+            compiler_attaque(a), attaquant.get("force", 0), attaquant.get("magie", 0), multiplicateurs(defenseur)
+        ) == attendus[a["nom"]]
+
+
+def test_degats_compiles_comme_la_formule_d_origine():
+    personnages = personnage_db.charger_personnages_base()
+    ennemis = [Ennemi(m) for region in ("foret", "desert") for m in table_apparition(region).modeles]
+    for joueur in personnages:
+        for ennemi in ennemis:
+            _verifier_table(joueur, ennemi, TableDegats(joueur, ennemi))
+            _verifier_table(ennemi, joueur, TableDegats(ennemi, joueur))
+
+    # Tous les types d'attaque, armures de 0 à 100 %
+    attaquant = {"force": 37, "magie": 23, "attaques": [
+        {"nom": t, "degats": 17, "type": t, "ratioattk": 45, "ratiomagie": 70}
+        for t in ("physique", "magique", "hybride", "brut")
+    ]}
+    for armure in range(0, 101, 5):
+        for armure_magique in range(0, 101, 5):
+            defenseur = {"armure": armure, "armure_magique": armure_magique}
+            _verifier_table(attaquant, defenseur, TableDegats(attaquant, defenseur))
+
+
+def test_table_degats_suit_les_achats():
+    joueur = copy.deepcopy(personnage_db.charger_personnages_base()[0])
+    ennemi = Ennemi(table_apparition("foret").modeles[0])
+    table_joueur = TableDegats(joueur, ennemi)
+    table_ennemi = TableDegats(ennemi, joueur)
+    items = charger_shop("foret") + charger_shop("default")
+    for item in items:
+        # Les tables sont déjà calculées : l'achat doit les invalider
+        table_joueur.degats()
+        table_ennemi.degats()
+        appliquer_achat(joueur, copy.deepcopy(item))
+        _verifier_table(joueur, ennemi, table_joueur)
+        _verifier_table(ennemi, joueur, table_ennemi)
+    assert len(table_joueur.degats()) == len(personnage_db.charger_personnages_base()[0]["attaques"]) + 2
+
+
+def test_simuler_lot_comme_le_moteur_sans_hasard(monkeypatch):
+    # Ennemis du desert à une seule attaque et politique "max" : aucun tirage ne change l'issue
+    monkeypatch.setattr(moteur_combat, "regions_disponibles", lambda: ("desert",))
+    for indice in range(len(personnage_db.charger_personnages_base())):
+        for pv in (10, 30, 45, 60, 300):
+            for graine in range(5):
+                moteur = MoteurCombat(_joueur(pv, indice), 1, 2, graine=graine)
+                ennemis = [moteur.ennemi.modele] + list(moteur.ennemis_queue)
+                bilan = moteur.resoudre_region("max")
+                lot = simuler_lot(_joueur(pv, indice), ennemis, 3, "max", rng=np.random.default_rng(graine))
+
+                tours_par_ennemi = [n for _, n in bilan.ennemis_vaincus]
+                if bilan.issue == DEFAITE:
+                    tours_par_ennemi.append(bilan.attaques - sum(tours_par_ennemi))
+                tours_par_ennemi += [-1] * (len(ennemis) - len(tours_par_ennemi))
+                assert lot["victoire"].tolist() == [bilan.issue == VICTOIRE] * 3
+                assert lot["ennemis_vaincus"].tolist() == [len(bilan.ennemis_vaincus)] * 3
+                assert lot["pv_restants"].tolist() == [max(moteur.joueur["pv"], 0)] * 3
+                assert lot["tours"].tolist() == [bilan.attaques] * 3
+                assert lot["tours_par_ennemi"].tolist() == [tours_par_ennemi] * 3
+
+
+def _moteur_sur_file(joueur, ennemis, graine):
+    """MoteurCombat d'une seule région dont la file d'ennemis est imposée (via un état exporté)."""
+    etat = {
+        "nb_ennemis": len(ennemis),
+        "region": "foret",
+        "regions": [],
+        "ennemi": [ennemis[0]["nom"], ennemis[0]["pv"]],
+        "ennemis": [e["nom"] for e in ennemis[1:]],
+        "tour_joueur": joueur_commence(joueur, ennemis[0]),
+        "tirages": None,
+        "journal": None,
+    }
+    return MoteurCombat(joueur, rng=TiragesRejouables(graine), etat=etat)
+
+
+@pytest.mark.parametrize("politique, pv", [("max", 66), ("hasard", 80)])
+def test_simuler_lot_comme_le_moteur_en_moyenne(politique, pv):
+    # Ennemis de foret à deux attaques : l'issue dépend des tirages, on compare les distributions
+    modeles = table_apparition("foret").par_nom
+    ennemis = [modeles[nom] for nom in ("Archer Trool", "Trool", "Lady Jeanne")]
+    nb_moteur = 3000
+    victoires = vaincus = tours = 0
+    for graine in range(nb_moteur):
+        moteur = _moteur_sur_file(_joueur(pv, 1), ennemis, graine)
+        bilan = moteur.resoudre_region(politique)
+        victoires += bilan.issue == VICTOIRE
+        vaincus += len(bilan.ennemis_vaincus)
+        tours += bilan.attaques
+
+    lot = simuler_lot(_joueur(pv, 1), ennemis, TIRAGES, politique, rng=np.random.default_rng(0))
+    assert 0.1 < lot["victoire"].mean() < 0.9
+    assert victoires / nb_moteur == pytest.approx(lot["victoire"].mean(), abs=0.04)
+    assert vaincus / nb_moteur == pytest.approx(lot["ennemis_vaincus"].mean(), abs=0.06)
+    assert tours / nb_moteur == pytest.approx(lot["tours"].mean(), abs=0.1)
@@ -0,0 +1,232 @@
+"""Nombre de requêtes SQL par commande et par callback de vue.
+
+Chaque commande du bot et chaque callback de vue doit toucher la base au plus
+une fois sur son chemin critique. Les commandes tournent ici sur le stockage
+SQLite en mémoire (conftest.py), avec de faux objets Discord, et les requêtes
+sont comptées par contexte (metriques_db.stats_par_contexte()). Le cache des
+personnages est vidé avant chaque appel mesuré : chaque lecture compte.
+
+    python -m pytest -q test_requetes.py
+"""
+import asyncio
+import itertools
+
+import discord
+
+import bot
+import personnage_db
+from combat import rehydrater_combat
+from sessions_combat import registre, custom_id_combat
+from metriques import contexte
+
+REQUETES_MAX = 1
+
+_ids = itertools.count(1)
+
+
+class FauxMessage:
+    def __init__(self, salon, **kwargs):
+        self.id = next(_ids)
+        self.channel = salon
+        self.kwargs = kwargs
+        self.attachments = []
+
+    async def edit(self, **kwargs):
+        self.kwargs = kwargs
+        return self
+
+    async def delete(self):
+        pass
+
+
+class FauxSalon:
+    def __init__(self):
+        self.id = next(_ids)
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        message = FauxMessage(self, content=content, **kwargs)
+        self.messages.append(message)
+        return message
+
+
+class FauxUtilisateur:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class FauxContexte:
+    def __init__(self, user_id, salon, commande):
+        self.author = FauxUtilisateur(user_id)
+        self.channel = salon
+        self.command = bot.bot.get_command(commande)
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FausseReponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.faite = False
+
+    def is_done(self):
+        return self.faite
+
+    async def defer(self, **kwargs):
+        self.faite = True
+
+    async def send_message(self, content=None, **kwargs):
+        self.faite = True
+        self.interaction.message = await self.interaction.channel.send(content, **kwargs)
+
+    async def edit_message(self, **kwargs):
+        self.faite = True
+        await self.interaction.message.edit(**kwargs)
+
+
+class FausseInteraction:
+    def __init__(self, user_id, salon, message=None, data=None):
+        self.user = FauxUtilisateur(user_id)
+        self.channel = salon
+        self.message = message
+        self.data = data or {}
+        self.type = discord.InteractionType.component
+        self.response = FausseReponse(self)
+
+    async def original_response(self):
+        return self.message
+
+
+async def compter(appel):
+    """Exécute `appel` (coroutine) et retourne {contexte: requêtes} pour cet appel seul."""
+    personnage_db.metriques_db.reinitialiser()
+    contexte.set(None)
+    await appel
+    return {
+        ctx: sum(operations.values())
+        for ctx, operations in personnage_db.metriques_db.stats_par_contexte().items()
+    }
+
+
+def verifier(requetes):
+    trop = {ctx: n for ctx, n in requetes.items() if n > REQUETES_MAX}
+    assert not trop, f"Plus de {REQUETES_MAX} requête par commande ou callback : {trop}"
+
+
+async def commande(nom, user_id, salon, *args):
+    ctx = FauxContexte(user_id, salon, nom)
+    await bot.marquer_commande(ctx)
+    await ctx.command.callback(ctx, *args)
+
+
+async def _creer_personnage(user_id, salon):
+    """!choix_personnage puis le bouton « Choisir » ; retourne les requêtes de chaque étape."""
+    requetes = await compter(commande("choix_personnage", user_id, salon))
+    vue = salon.messages[-1].kwargs["view"]
+    interaction = FausseInteraction(user_id, salon, salon.messages[-1])
+    requetes_choix = await compter(vue.select_personnage(interaction))
+    return requetes, requetes_choix
+
+
+def test_commandes_personnage():
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        for requetes in await _creer_personnage(user_id, salon):
+            verifier(requetes)
+        personnage_db._cache.vider()
+        verifier(await compter(commande("mon_personnage", user_id, salon)))
+        personnage_db._cache.vider()
+        verifier(await compter(commande("choix_personnage", user_id, salon)))
+        personnage_db._cache.vider()
+        requetes = await compter(commande("reset_personnage", user_id, salon))
+        verifier(requetes)
+        assert requetes.get("reset_personnage") == 1
+        verifier(await compter(commande("reset_personnage", user_id, salon)))
+        verifier(await compter(commande("mon_personnage", user_id, salon)))
+
+    asyncio.run(scenario())
+
+
+def _trouver_vue(salon, type_vue):
+    for message in reversed(salon.messages):
+        vue = message.kwargs.get("view")
+        if isinstance(vue, type_vue):
+            return message, vue
+    return None, None
+
+
+def test_combat_et_shop(monkeypatch):
+    import moteur_combat
+    from shop import ShopView
+
+    # Deux régions quelles que soient celles actives dans json/regions.json : le shop entre les deux
+    region = moteur_combat.regions_disponibles()[0]
+    monkeypatch.setattr(moteur_combat, "regions_disponibles", lambda: (region, region))
+
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        await _creer_personnage(user_id, salon)
+        personnage_db._cache.vider()
+        verifier(await compter(commande("combat", user_id, salon, 2, 2)))
+        # Joueur invincible : le combat va jusqu'au shop puis jusqu'à la victoire finale
+        registre.get(str(user_id)).joueur["pv"] = 10 ** 6
+
+        # Attaques jusqu'au shop de fin de région, puis jusqu'à la fin de l'aventure
+        vu_shop = False
+        for _ in range(500):
+            vue = registre.get(str(user_id))
+            if vue is None:
+                break
+            if vue.en_shop:
+                message, shop = _trouver_vue(salon, ShopView)
+                if shop.shop_items:
+                    shop.shop_select._values = [shop.shop_select.options[0].value]
+                    verifier(await compter(shop.acheter_item(FausseInteraction(user_id, salon, message))))
+                personnage_db._cache.vider()
+                verifier(await compter(shop.continue_adventure(FausseInteraction(user_id, salon, message))))
+                vu_shop = True
+                continue
+            interaction = FausseInteraction(user_id, salon, vue.combat_message or salon.messages[-1])
+            verifier(await compter(vue.jouer_attaque(interaction, vue.joueur["attaques"][0]["nom"])))
+        assert vu_shop and registre.get(str(user_id)) is None
+
+    asyncio.run(scenario())
+
+
+def test_combat_automatique():
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        await _creer_personnage(user_id, salon)
+        personnage_db._cache.vider()
+        verifier(await compter(commande("combat", user_id, salon, 2, 2, "auto", "max")))
+
+    asyncio.run(scenario())
+
+
+def test_reprise_combat_evince():
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        await _creer_personnage(user_id, salon)
+        await commande("combat", user_id, salon, 1, 5)
+        vue = registre.get(str(user_id))
+        await registre.evincer(str(user_id))
+        assert registre.get(str(user_id)) is None
+
+        personnage_db._cache.vider()
+        interaction = FausseInteraction(
+            user_id, salon, salon.messages[-1],
+            data={"custom_id": custom_id_combat(str(user_id), vue.session_id),
+                  "values": [vue.joueur["attaques"][0]["nom"]]},
+        )
+        requetes = await compter(rehydrater_combat(interaction))
+        verifier(requetes)
+        assert requetes.get("combat:reprise") == 1
+        assert registre.get(str(user_id)) is not None
+
+    asyncio.run(scenario())
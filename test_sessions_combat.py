@@ -0,0 +1,126 @@
+"""Registre des combats en mémoire : shop, éviction et reprise.
+
+    python -m pytest -q test_sessions_combat.py
+"""
+import asyncio
+
+import pytest
+
+import moteur_combat
+from sessions_combat import registre
+from shop import ShopView
+from test_requetes import FauxSalon, FausseInteraction, _creer_personnage, _ids, _trouver_vue, commande
+
+
+async def _jusquau_shop(user_id, salon):
+    """Lance un combat de deux régions et attaque jusqu'au shop ; retourne (vue du combat, message, shop)."""
+    await _creer_personnage(user_id, salon)
+    await commande("combat", user_id, salon, 2, 2)
+    vue = registre.get(str(user_id))
+    # Joueur invincible : la première région se termine toujours
+    vue.joueur["pv"] = 10 ** 6
+    while not vue.en_shop:
+        interaction = FausseInteraction(user_id, salon, vue.combat_message or salon.messages[-1])
+        await vue.jouer_attaque(interaction, vue.joueur["attaques"][0]["nom"])
+    message, shop = _trouver_vue(salon, ShopView)
+    return vue, message, shop
+
+
+def _deux_regions(monkeypatch):
+    region = moteur_combat.regions_disponibles()[0]
+    monkeypatch.setattr(moteur_combat, "regions_disponibles", lambda: (region, region))
+
+
+def test_expiration_du_shop_apres_continuer(monkeypatch):
+    _deux_regions(monkeypatch)
+
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        vue, message, shop = await _jusquau_shop(user_id, salon)
+        await shop.continue_adventure(FausseInteraction(user_id, salon, message))
+        assert shop.is_finished()
+
+        # Le délai du shop expire après « Continuer » : le combat continue
+        await shop.on_timeout()
+        assert registre.get(str(user_id)) is vue
+        assert not vue.is_finished()
+
+    asyncio.run(scenario())
+
+
+def test_expiration_du_shop_abandonne_le_combat(monkeypatch):
+    _deux_regions(monkeypatch)
+
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        vue, _, shop = await _jusquau_shop(user_id, salon)
+        await shop.on_timeout()
+        assert registre.get(str(user_id)) is None
+        assert vue.is_finished()
+
+    asyncio.run(scenario())
+
+
+def test_eviction_en_echec_garde_le_combat(monkeypatch):
+    import sessions_combat
+    from sauvegarde_differee import sauvegarde
+
+    async def panne(user_id, etat):
+        raise ConnectionError("base indisponible")
+
+    async def scenario():
+        salon = FauxSalon()
+        user_id = next(_ids)
+        await _creer_personnage(user_id, salon)
+        await commande("combat", user_id, salon, 1, 5)
+        vue = registre.get(str(user_id))
+
+        monkeypatch.setattr(sessions_combat, "sauver_session_combat", panne)
+        with pytest.raises(ConnectionError):
+            await registre.evincer(str(user_id))
+        # Combat toujours en mémoire, jouable et suivi par la sauvegarde différée
+        assert registre.get(str(user_id)) is vue
+        assert not vue.is_finished() and not vue.en_eviction
+        assert sauvegarde.joueur(str(user_id)) is vue.joueur
+
+        monkeypatch.undo()
+        assert await registre.evincer(str(user_id))
+        assert registre.get(str(user_id)) is None and vue.is_finished()
+
+    asyncio.run(scenario())
+
+
+def test_eviction_du_surplus(monkeypatch, capsys):
+    import sessions_combat
+
+    ecrits = []
+
+    async def sauver(user_id, etat):
+        if user_id == str(premier):
+            raise ConnectionError("base indisponible")
+        ecrits.append(user_id)
+
+    monkeypatch.setattr(registre, "max_actifs", 1)
+    monkeypatch.setattr(sessions_combat, "sauver_session_combat", sauver)
+    premier, second, troisieme = next(_ids), next(_ids), next(_ids)
+
+    async def scenario():
+        salon = FauxSalon()
+        for user_id in (premier, second, troisieme):
+            await _creer_personnage(user_id, salon)
+        await commande("combat", premier, salon, 1, 5)
+        await commande("combat", second, salon, 1, 5)
+        # L'éviction du premier échoue : l'erreur est affichée, la tâche ne la laisse pas échapper
+        await asyncio.gather(*registre.taches_eviction)
+        assert not registre.taches_eviction
+        assert "Erreur éviction du combat" in capsys.readouterr().out
+        assert registre.get(str(premier)) is not None
+
+        await commande("combat", troisieme, salon, 1, 5)
+        await asyncio.gather(*registre.taches_eviction)
+        assert ecrits == [str(second)]
+        assert list(registre.sessions) == [str(premier), str(troisieme)]
+
+    asyncio.run(scenario())